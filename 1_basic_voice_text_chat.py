@@ -1,11 +1,39 @@
 #!/usr/bin/env python3
 import os
-import requests
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-import uvicorn
-
-app = FastAPI()
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
+
+import admission
+import assets
+import journal
+import logs
+import presets
+import resilience
+import serve
+import sessions
+import signaling
+import telemetry
+import token_pool
+import upstream
+
+SESSION_CONFIG = {
+    # You can adjust the model or voice as needed
+    "model": "gpt-4o-realtime-preview-2024-12-17",
+    "voice": "verse"
+}
+# Latency presets merged over SESSION_CONFIG, picked per request with ?preset=
+SESSION_PRESETS = presets.build(SESSION_CONFIG)
+
+@asynccontextmanager
+async def lifespan(app):
+    async with upstream.lifespan(app), token_pool.lifespan(app, SESSION_PRESETS[presets.DEFAULT]):
+        async with journal.lifespan(app), sessions.lifespan(app):
+            yield
+
+app = FastAPI(lifespan=lifespan)
+telemetry.install(app)
+logs.install(app)
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -13,11 +41,8 @@ HTML_TEMPLATE = """
 <head>
     <meta charset="UTF-8" />
     <title>Realtime Voice and Text Chat Demo</title>
-    <!-- Load Tailwind and DaisyUI properly -->
-    <script src="https://cdn.tailwindcss.com"></script>
-    <link href="https://cdn.jsdelivr.net/npm/daisyui@4.7.2/dist/full.min.css" rel="stylesheet" type="text/css" />
-    <script src="https://cdn.jsdelivr.net/npm/daisyui@4.7.2/dist/full.js"></script>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/animejs/3.2.1/anime.min.js"></script>
+    <!-- Self-hosted Tailwind/DaisyUI bundle (see build_assets.py) -->
+    <!-- ASSETS -->
     <style>
         .gradient-text {
             background: linear-gradient(45deg, #6366f1, #8b5cf6, #d946ef);
@@ -89,10 +114,18 @@ HTML_TEMPLATE = """
 
             <!-- Conversation Log -->
             <div class="mt-6">
-                <h2 class="font-bold mb-3 text-violet-300">Conversation Log</h2>
-                <div class="glass-morphism rounded-lg p-4 h-64 overflow-y-auto">
-                    <pre id="log" class="text-sm whitespace-pre-wrap"></pre>
+                <div class="flex items-center justify-between mb-3 gap-2">
+                    <h2 class="font-bold text-violet-300">Conversation Log</h2>
+                    <div class="flex gap-2">
+                        <input id="log-filter" type="text" placeholder="Filter by event type" class="input input-bordered input-xs w-40" />
+                        <select id="log-level" class="select select-bordered select-xs">
+                            <option value="quiet">Messages</option>
+                            <option value="events">Events</option>
+                            <option value="debug">Debug</option>
+                        </select>
+                    </div>
                 </div>
+                <div id="log" class="glass-morphism rounded-lg px-4 h-64 overflow-y-auto text-sm font-mono"></div>
             </div>
         </div>
     </div>
@@ -129,6 +162,9 @@ HTML_TEMPLATE = """
             }
             pc = null;
             dc = null;
+            rollover.stop();
+            Journal.flush();
+            SessionLease.close();
             startButton.textContent = "Connect & Start Chat";
             startButton.classList.remove("bg-gradient-to-r", "from-red-600", "to-red-700", "hover:from-red-700", "hover:to-red-800");
             startButton.classList.add("bg-gradient-to-r", "from-violet-600", "to-indigo-600", "hover:from-violet-700", "hover:to-indigo-700");
@@ -136,58 +172,53 @@ HTML_TEMPLATE = """
             logMessage("[INFO] Disconnected from chat.");
         }
 
+        // Connection modes, selected with ?connect=...
+        //   server  (default) mic grant and offer creation overlap, ICE gathering is
+        //           bounded, and our /connect endpoint mints the session and
+        //           exchanges SDP upstream in a single round trip
+        //   fast    as above, but the page fetches a token and talks to OpenAI itself
+        //   classic the original sequential flow
+        const connectParams = new URLSearchParams(window.location.search);
+        const CONNECT_MODE = connectParams.get("connect") || "server";
+        const ICE_DEADLINE_MS = Number(connectParams.get("ice_deadline") || 300);
+        // Session preset (presets.py) for /session and /connect, selected with
+        // ?preset=low-latency|balanced|text-only; the server default otherwise
+        const SESSION_PRESET = connectParams.get("preset") || "";
+        const SESSION_QUERY = SESSION_PRESET ? "?preset=" + encodeURIComponent(SESSION_PRESET) : "";
+
         async function startChat() {
             startButton.textContent = "Connecting...";
             startButton.classList.remove("bg-gradient-to-r", "from-violet-600", "to-indigo-600", "hover:from-violet-700", "hover:to-indigo-700");
             startButton.classList.add("bg-gradient-to-r", "from-red-600", "to-red-700", "hover:from-red-700", "hover:to-red-800");
-            
-            logMessage("[INFO] Requesting ephemeral token...");
-            document.getElementById("status").textContent = "Requesting ephemeral token from server...";
-
-            // Fetch ephemeral key from our FastAPI endpoint
-            const tokenResp = await fetch("/session");
-            const tokenData = await tokenResp.json();
-            if (tokenData.error) {
-                logMessage("[ERROR] " + JSON.stringify(tokenData, null, 2));
-                document.getElementById("status").textContent = "Failed to get ephemeral key.";
-                return;
-            }
 
-            // Extract ephemeral key
-            const EPHEMERAL_KEY = tokenData.client_secret.value;
-            document.getElementById("status").textContent = "Ephemeral key acquired. Creating RTCPeerConnection...";
+            const timer = new ConnectTimer(CONNECT_MODE);
+            Journal.start(crypto.randomUUID());
+            TurnLatency.start(CONNECT_MODE, SESSION_PRESET);
 
             // Create a new RTCPeerConnection
             pc = new RTCPeerConnection();
 
             // Handle remote audio track (model output)
             pc.ontrack = (event) => {
+                timer.mark("remote_track");
                 logMessage("[INFO] Received remote audio track from model.");
                 const audioEl = document.createElement("audio");
                 audioEl.autoplay = true;
                 audioEl.srcObject = event.streams[0];
             };
 
-            // Add local microphone audio track
-            try {
-                const mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
-                mediaStream.getTracks().forEach((track) => pc.addTrack(track, mediaStream));
-                logMessage("[INFO] Local microphone track acquired and added.");
-            } catch (err) {
-                logMessage("[ERROR] Unable to acquire microphone: " + err);
-                document.getElementById("status").textContent = "Could not access microphone.";
-                return;
-            }
-
             // Create data channel to send/receive Realtime events
             dc = pc.createDataChannel("oai-events");
             dc.addEventListener("open", () => {
+                timer.mark("datachannel_open");
                 logMessage("[INFO] Data channel opened.");
+                logMessage("[INFO] " + timer.summary());
                 document.getElementById("status").textContent = "Data channel open. You can chat now!";
+                if (ROLLOVER_ENABLED) rollover.arm();
             });
 
             // Listen for server -> client data channel messages (JSON events)
-            dc.addEventListener("message", (e) => {
+            const onServerMessage = (e) => {
                 let serverEvent;
                 try {
                     serverEvent = JSON.parse(e.data);
@@ -196,56 +227,212 @@ HTML_TEMPLATE = """
                     return;
                 }
 
+                if (serverEvent.type === "response.done") timer.mark("first_response_done");
+                Journal.record("in", serverEvent);
+                rollover.observe(serverEvent);
+                TurnLatency.observe(serverEvent);
+
                 // Log the raw event
-                logMessage("[SERVER EVENT] " + JSON.stringify(serverEvent, null, 2));
+                eventLog.event(serverEvent);
+            };
+            dc.addEventListener("message", onServerMessage);
+            rollover.stop();
+            rollover = newRollover(onServerMessage);
+
+            const prepared = CONNECT_MODE === "classic"
+                ? await prepareClassic(timer)
+                : await prepareFast(timer, CONNECT_MODE === "fast");
+            if (!prepared) {
+                // A token's lease is no use without an offer to go with it
+                SessionLease.close();
+                return;
+            }
+
+            // We have a local SDP to send to the Realtime API
+            document.getElementById("status").textContent = "Sending SDP offer to Realtime API...";
+            try {
+                const sdpResponse = await sendOffer(prepared);
+
+                if (!sdpResponse.ok) {
+                    const errText = await sdpResponse.text();
+                    SessionLease.close();
+                    if (retryLater(errText)) return;
+                    logMessage("[ERROR] Realtime API error: " + errText);
+                    document.getElementById("status").textContent = "Error from Realtime API (check console).";
+                    return;
+                }
+
+                const answerSdp = await sdpResponse.text();
+                const answer = { type: "answer", sdp: answerSdp };
+                await pc.setRemoteDescription(answer);
+                timer.mark("answer");
+                if (CONNECT_MODE === "server") SessionLease.open(sdpResponse.headers.get("X-Session-Lease"), connectionAlive);
+
+                document.getElementById("status").textContent = "Connected to Realtime API! Start chatting.";
+                logMessage("[INFO] WebRTC connection established.");
+            } catch (error) {
+                SessionLease.close();
+                logMessage("[ERROR] " + error);
+                document.getElementById("status").textContent = "Error sending SDP offer.";
+                return;
+            }
+
+            // Update button text after successful connection
+            startButton.textContent = "Disconnect";
+        }
+
+        // POST the offer to our /connect endpoint, or with the ephemeral key straight
+        // to the Realtime API URL that /session handed out (the server's API base and model)
+        function sendOffer(prepared, headers = SessionLease.headers()) {
+            if (CONNECT_MODE === "server") {
+                return fetch("/connect" + SESSION_QUERY, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/sdp", ...headers },
+                    body: prepared.sdp
+                });
+            }
+            return fetch(prepared.url, {
+                method: "POST",
+                headers: {
+                    "Authorization": `Bearer ${prepared.key}`,
+                    "Content-Type": "application/sdp"
+                },
+                body: prepared.sdp
             });
+        }
 
-            // Once ICE gathering finishes, we have a local SDP to send to the Realtime API
-            pc.onicecandidate = async (evt) => {
-                // We'll wait until there's no more candidates
-                if (!evt.candidate && pc.iceGatheringState === "complete") {
-                    document.getElementById("status").textContent = "Sending SDP offer to Realtime API...";
-                    const offer = pc.localDescription;
-
-                    const baseUrl = "https://api.openai.com/v1/realtime";
-                    const model = "gpt-4o-realtime-preview-2024-12-17";
-
-                    try {
-                        const sdpResponse = await fetch(`${baseUrl}?model=${model}`, {
-                            method: "POST",
-                            headers: {
-                                "Authorization": `Bearer ${EPHEMERAL_KEY}`,
-                                "Content-Type": "application/sdp"
-                            },
-                            body: offer.sdp
-                        });
-
-                        if (!sdpResponse.ok) {
-                            const errText = await sdpResponse.text();
-                            logMessage("[ERROR] Realtime API error: " + errText);
-                            document.getElementById("status").textContent = "Error from Realtime API (check console).";
-                            return;
-                        }
+        // Long calls roll over to a fresh session before the 30-minute limit
+        // (rollover.js); ?rollover_after=<s> and ?rollover_deadline=<s> move the
+        // schedule, ?rollover=0 turns it off
+        const ROLLOVER_ENABLED = connectParams.get("rollover") !== "0";
+        let rollover = newRollover(null);
+
+        function newRollover(onServerMessage) {
+            return new SessionRollover({
+                afterMs: Number(connectParams.get("rollover_after") || ROLLOVER_DEFAULTS.afterMs / 1000) * 1000,
+                deadlineMs: Number(connectParams.get("rollover_deadline") || ROLLOVER_DEFAULTS.deadlineMs / 1000) * 1000,
+                iceDeadlineMs: ICE_DEADLINE_MS,
+                mode: CONNECT_MODE,
+                tokenUrl: "/session" + SESSION_QUERY,
+                sendOffer,
+                live: () => ({ pc, dc }),
+                log: logMessage,
+                onSwitch: (newPc, newDc, idMap) => {
+                    pc = newPc;
+                    dc = newDc;
+                    dc.addEventListener("message", onServerMessage);
+                },
+            });
+        }
 
-                        const answerSdp = await sdpResponse.text();
-                        const answer = { type: "answer", sdp: answerSdp };
-                        await pc.setRemoteDescription(answer);
+        // Whether the call a lease belongs to is still up (heartbeats stop otherwise)
+        function connectionAlive() {
+            return pc !== null && pc.connectionState !== "failed" && pc.connectionState !== "closed";
+        }
 
-                        document.getElementById("status").textContent = "Connected to Realtime API! Start chatting.";
-                        logMessage("[INFO] WebRTC connection established.");
-                    } catch (error) {
-                        logMessage("[ERROR] " + error);
-                        document.getElementById("status").textContent = "Error sending SDP offer.";
-                    }
-                }
-            };
+        // /connect sheds load or queues us with {"retry_after_ms": ...}; start over after that delay
+        function retryLater(errText) {
+            let errData;
+            try {
+                errData = JSON.parse(errText);
+            } catch {
+                return false;
+            }
+            if (!errData.retry_after_ms) return false;
+            pc.getSenders().forEach((sender) => sender.track && sender.track.stop());
+            pc.close();
+            const status = SessionLease.queued(errData);
+            logMessage(`[WARN] ${status} (retrying in ${errData.retry_after_ms} ms)`);
+            document.getElementById("status").textContent = status;
+            setTimeout(startChat, errData.retry_after_ms);
+            return true;
+        }
 
-            // Create and set our local offer
-            const offer = await pc.createOffer();
+        // Fetch ephemeral key from our FastAPI endpoint; null on failure
+        async function fetchToken() {
+            logMessage("[INFO] Requesting ephemeral token...");
+            document.getElementById("status").textContent = "Requesting ephemeral token from server...";
+            let tokenData;
+            try {
+                const tokenResp = await fetch("/session" + SESSION_QUERY, { headers: SessionLease.headers() });
+                tokenData = await tokenResp.json();
+            } catch (err) {
+                tokenData = { error: String(err) };
+            }
+            if (tokenData.retry_after_ms) {
+                // Server is shedding load or has queued us; come back when it says to
+                const status = SessionLease.queued(tokenData);
+                logMessage(`[WARN] ${status} (retrying in ${tokenData.retry_after_ms} ms)`);
+                document.getElementById("status").textContent = status;
+                setTimeout(startChat, tokenData.retry_after_ms);
+                return null;
+            }
+            if (tokenData.error) {
+                logMessage("[ERROR] " + JSON.stringify(tokenData, null, 2));
+                document.getElementById("status").textContent = "Failed to get ephemeral key.";
+                return null;
+            }
+            SessionLease.open(tokenData.lease_id, connectionAlive);
+            document.getElementById("status").textContent = "Ephemeral key acquired. Creating RTCPeerConnection...";
+            return tokenData;
+        }
+
+        function microphoneError(err) {
+            logMessage("[ERROR] Unable to acquire microphone: " + err);
+            document.getElementById("status").textContent = "Could not access microphone.";
+        }
+
+        // Original flow: token, then mic, then offer, then wait for ICE "complete"
+        async function prepareClassic(timer) {
+            const tokenData = await timer.track("token", fetchToken());
+            if (!tokenData) return null;
+
+            // Add local microphone audio track
+            try {
+                const mediaStream = await timer.track("mic", navigator.mediaDevices.getUserMedia({ audio: true }));
+                mediaStream.getTracks().forEach((track) => pc.addTrack(track, mediaStream));
+                logMessage("[INFO] Local microphone track acquired and added.");
+            } catch (err) {
+                microphoneError(err);
+                return null;
+            }
+
+            // Create and set our local offer, then wait for all candidates
+            const offer = await timer.track("offer", pc.createOffer());
+            await pc.setLocalDescription(offer);
+            const sdp = await timer.track("ice", waitForIceGathering(pc));
+            return { key: tokenData.client_secret.value, url: tokenData.realtime_url, sdp };
+        }
+
+        // Fast flow: token, mic and offer run concurrently; ICE gathering is bounded
+        async function prepareFast(timer, withToken) {
+            const tokenPromise = withToken ? timer.track("token", fetchToken()) : null;
+            const micPromise = timer.track("mic", navigator.mediaDevices.getUserMedia({ audio: true }));
+
+            // Reserve the audio m-line now so the offer does not wait for the mic;
+            // the real track is attached with replaceTrack (no renegotiation).
+            const transceiver = pc.addTransceiver("audio", { direction: "sendrecv" });
+            const offer = await timer.track("offer", pc.createOffer());
             await pc.setLocalDescription(offer);
+            const icePromise = timer.track("ice", waitForIceGathering(pc, ICE_DEADLINE_MS));
 
-            // Update button text after successful connection
-            startButton.textContent = "Disconnect";
+            let mediaStream;
+            try {
+                mediaStream = await micPromise;
+                await transceiver.sender.replaceTrack(mediaStream.getAudioTracks()[0]);
+                logMessage("[INFO] Local microphone track acquired and added.");
+            } catch (err) {
+                microphoneError(err);
+                return null;
+            }
+
+            if (!withToken) return { key: null, sdp: await icePromise };
+            const tokenData = await tokenPromise;
+            if (!tokenData) {
+                mediaStream.getTracks().forEach((track) => track.stop());
+                return null;
+            }
+            return { key: tokenData.client_secret.value, url: tokenData.realtime_url, sdp: await icePromise };
         }
 
         // Send a text message from the user
@@ -273,16 +460,16 @@ HTML_TEMPLATE = """
                 }
             };
             dc.send(JSON.stringify(userEvent));
+            Journal.record("out", userEvent);
             logMessage("[YOU] " + textVal);
 
-            // 2) Ask model for a response (both text and audio)
+            // 2) Ask model for a response (in the session preset's modalities)
             const responseEvent = {
-                type: "response.create",
-                response: {
-                    modalities: ["text", "audio"]  // request text + audio reply
-                }
+                type: "response.create"
             };
             dc.send(JSON.stringify(responseEvent));
+            TurnLatency.turnEnded();
+            Journal.record("out", responseEvent);
             logMessage("[INFO] Requested a model response.");
 
             // Clear input
@@ -290,49 +477,180 @@ HTML_TEMPLATE = """
         }
 
         // Utility to add logs to the conversation area
+        // Bounded log: pick the verbosity with ?log=quiet|events|debug or the selector
+        const eventLog = new EventLog(document.getElementById("log"), {
+            level: new URLSearchParams(window.location.search).get("log") || "events",
+        });
+        const logLevelSelect = document.getElementById("log-level");
+        logLevelSelect.value = eventLog.level;
+        logLevelSelect.addEventListener("change", () => eventLog.setLevel(logLevelSelect.value));
+        document.getElementById("log-filter").addEventListener("input", (e) => eventLog.setFilter(e.target.value));
+
         function logMessage(message) {
-            const logEl = document.getElementById("log");
-            logEl.textContent += "\\n" + message;
-            logEl.scrollTop = logEl.scrollHeight;
-            console.log(message);
+            eventLog.message(message);
         }
     </script>
 </body>
 </html>
 """
 
+# Built once: identity, gzip and brotli bytes with strong ETags
+PAGE = assets.StaticAsset(assets.render_page(upstream.rebase_urls(HTML_TEMPLATE)), "text/html; charset=utf-8")
+
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
+    """
+    Serve the single-page HTML UI (precompressed, 304 on revalidation).
+    """
+    return assets.asset_response(request, PAGE)
+
+@app.get("/static/{name}")
+async def static_file(request: Request, name: str):
+    """
+    Serve the content-hashed CSS/JS bundle with immutable caching.
+    """
+    return assets.static_response(request, name)
+
+@app.get("/session/pool")
+async def session_pool():
     """
-    Serve the single-page HTML UI.
+    Pre-minted session pool, admission, upstream resilience and live
+    session counters.
     """
-    return HTML_TEMPLATE
+    return {
+        **token_pool.pool.stats(),
+        "admission": admission.gate.stats(),
+        "resilience": resilience.guard.stats(),
+        "sessions": sessions.registry.stats(),
+    }
 
 @app.get("/session")
-async def session():
+async def session(request: Request):
     """
     A simple endpoint to create an ephemeral Realtime key.
     Requires a standard API key (OPENAI_API_KEY) on the server side.
+    The payload adds the session lease and the realtime_url to post the SDP offer to.
     """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {"error": "No OPENAI_API_KEY found in environment variables."}
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    data = {
-        # You can adjust the model or voice as needed
-        "model": "gpt-4o-realtime-preview-2024-12-17",
-        "voice": "verse"  
-    }
-
-    resp = requests.post("https://api.openai.com/v1/realtime/sessions", headers=headers, json=data)
+    preset = presets.select(SESSION_PRESETS, request)
+    if preset is None:
+        return presets.unknown_response(SESSION_PRESETS)
+
+    # A slot in the session registry first: over capacity the page is queued
+    try:
+        lease = sessions.registry.admit(request)
+    except admission.Rejected as e:
+        return admission.rejected_response(e)
+
+    # Hand out a pre-minted session when one is ready
+    pooled = token_pool.pool.take(preset)
+    if pooled is not None:
+        return {**pooled, "lease_id": lease.id, "realtime_url": upstream.realtime_url(preset["model"])}
+
+    try:
+        resp = await resilience.guard.mint(api_key, preset)
+    except admission.Rejected as e:
+        sessions.registry.close(lease.id, "failed")
+        return admission.rejected_response(e)
+    except Exception as e:
+        logs.error(f"Session creation failed: {str(e)}")
+        sessions.registry.close(lease.id, "failed")
+        return {"error": f"Session creation failed: {str(e)}"}
     if resp.status_code != 200:
+        sessions.registry.close(lease.id, "failed")
         return {"error": f"Could not create ephemeral session: {resp.text}"}
 
-    return resp.json()
+    return {**resp.json(), "lease_id": lease.id, "realtime_url": upstream.realtime_url(preset["model"])}
+
+@app.post("/session/heartbeat")
+async def session_heartbeat(request: Request):
+    """
+    Keep the page's session lease alive; 404 once it has been closed or reaped.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid heartbeat payload"})
+    lease_id = payload.get("lease") if isinstance(payload, dict) else None
+    if not sessions.registry.heartbeat(lease_id):
+        return JSONResponse(status_code=404, content={"error": "Unknown session lease"})
+    return {"ok": True}
+
+@app.post("/session/close")
+async def session_close(request: Request):
+    """
+    Give the page's session lease back (sent as a beacon on disconnect).
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid close payload"})
+    lease_id = payload.get("lease") if isinstance(payload, dict) else None
+    return {"closed": sessions.registry.close(lease_id)}
+
+@app.post("/connect")
+async def connect(request: Request):
+    """
+    Mint a session and exchange the browser's SDP offer server-side,
+    returning the answer SDP. The ephemeral key never reaches the browser.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return JSONResponse(status_code=500, content={"error": "No OPENAI_API_KEY found in environment variables."})
+
+    offer_sdp = (await request.body()).decode("utf-8")
+    preset = presets.select(SESSION_PRESETS, request)
+    if preset is None:
+        return presets.unknown_response(SESSION_PRESETS)
+    try:
+        lease = sessions.registry.admit(request)
+    except admission.Rejected as e:
+        return admission.rejected_response(e)
+    try:
+        answer_sdp = await signaling.negotiate(api_key, preset, offer_sdp)
+    except admission.Rejected as e:
+        sessions.registry.close(lease.id, "failed")
+        return admission.rejected_response(e)
+    except signaling.NegotiationError as e:
+        sessions.registry.close(lease.id, "failed")
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except Exception as e:
+        logs.error(f"Connect failed: {str(e)}")
+        sessions.registry.close(lease.id, "failed")
+        return JSONResponse(status_code=500, content={"error": f"Connect failed: {str(e)}"})
+    return Response(content=answer_sdp, media_type="application/sdp", headers={sessions.LEASE_HEADER: lease.id})
+
+@app.post("/telemetry")
+async def telemetry_batch(request: Request):
+    """
+    Accept a batch of client connection-phase timings.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid telemetry payload"})
+    return {"accepted": telemetry.record_client_events(payload)}
+
+@app.post("/journal")
+async def journal_batch(request: Request):
+    """
+    Queue a batch of the page's data channel events for its session journal.
+    """
+    try:
+        accepted = journal.store.submit(await request.json())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid journal payload: {str(e)}"})
+    return {"accepted": accepted, "enabled": journal.store.enabled}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text format: connect-phase and request histograms plus
+    pool, admission and resilience gauges.
+    """
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    uvicorn.run("1_basic_voice_text_chat:app", host="127.0.0.1", port=8000, reload=True)
+    serve.main(variant="basic", reload=True)
@@ -1,12 +1,41 @@
 #!/usr/bin/env python3
 import os
-import requests
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-import uvicorn
-from termcolor import colored
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 
-app = FastAPI()
+import admission
+import assets
+import classifier
+import journal
+import logs
+import presets
+import resilience
+import serve
+import sessions
+import signaling
+import telemetry
+import token_pool
+import upstream
+
+SESSION_CONFIG = {
+    "model": "gpt-4o-realtime-preview-2024-12-17",
+    "voice": "verse",
+    # Transcripts let the local classifier handle spoken turns too
+    "input_audio_transcription": {"model": "whisper-1"}
+}
+# Latency presets merged over SESSION_CONFIG, picked per request with ?preset=
+SESSION_PRESETS = presets.build(SESSION_CONFIG, pinned=("input_audio_transcription",))
+
+@asynccontextmanager
+async def lifespan(app):
+    async with upstream.lifespan(app), token_pool.lifespan(app, SESSION_PRESETS[presets.DEFAULT]):
+        async with journal.lifespan(app), sessions.lifespan(app):
+            yield
+
+app = FastAPI(lifespan=lifespan)
+telemetry.install(app)
+logs.install(app)
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -14,10 +43,7 @@ HTML_TEMPLATE = """
 <head>
     <meta charset="UTF-8" />
     <title>Voice Chat with Real-time Classification</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <link href="https://cdn.jsdelivr.net/npm/daisyui@4.7.2/dist/full.min.css" rel="stylesheet" type="text/css" />
-    <script src="https://cdn.jsdelivr.net/npm/daisyui@4.7.2/dist/full.js"></script>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/animejs/3.2.1/anime.min.js"></script>
+    <!-- ASSETS -->
     <style>
         .gradient-text {
             background: linear-gradient(45deg, #6366f1, #8b5cf6, #d946ef);
@@ -106,10 +132,18 @@ HTML_TEMPLATE = """
 
                     <!-- Conversation Log -->
                     <div class="mt-6">
-                        <h2 class="font-bold mb-3 text-violet-300">Conversation Log</h2>
-                        <div class="glass-morphism rounded-lg p-4 h-64 overflow-y-auto">
-                            <pre id="log" class="text-sm whitespace-pre-wrap"></pre>
+                        <div class="flex items-center justify-between mb-3 gap-2">
+                            <h2 class="font-bold text-violet-300">Conversation Log</h2>
+                            <div class="flex gap-2">
+                                <input id="log-filter" type="text" placeholder="Filter by event type" class="input input-bordered input-xs w-40" />
+                                <select id="log-level" class="select select-bordered select-xs">
+                                    <option value="quiet">Messages</option>
+                                    <option value="events">Events</option>
+                                    <option value="debug">Debug</option>
+                                </select>
+                            </div>
                         </div>
+                        <div id="log" class="glass-morphism rounded-lg px-4 h-64 overflow-y-auto text-sm font-mono"></div>
                     </div>
                 </div>
             </div>
@@ -122,6 +156,10 @@ HTML_TEMPLATE = """
                         <!-- Classifications will be added here dynamically -->
                     </div>
                 </div>
+                <div id="insights" class="glass-morphism rounded-xl p-4 mt-4 hidden">
+                    <h2 class="text-xl font-bold mb-4 text-violet-300">Insights</h2>
+                    <div id="insight-list" class="space-y-2"></div>
+                </div>
             </div>
         </div>
     </div>
@@ -154,61 +192,71 @@ HTML_TEMPLATE = """
             }
             pc = null;
             dc = null;
+            rollover.stop();
+            Journal.flush();
+            SessionLease.close();
             startButton.textContent = "Connect & Start Chat";
             startButton.classList.remove("bg-gradient-to-r", "from-red-600", "to-red-700", "hover:from-red-700", "hover:to-red-800");
             startButton.classList.add("bg-gradient-to-r", "from-violet-600", "to-indigo-600", "hover:from-violet-700", "hover:to-indigo-700");
             document.getElementById("status").textContent = "Disconnected. Click Connect to start a new chat.";
+            const s = oob.stats;
+            logMessage(`[INFO] Classification scheduler: ${s.turns} turns, ${s.classifications} classifications, ` +
+                `${s.debounced} debounced, ${s.stale} stale results dropped.`);
+            logMessage("[INFO] Out-of-band tasks: " + (pipeline.summary() || "none"));
             logMessage("[INFO] Disconnected from chat.");
         }
 
+        // Connection modes, selected with ?connect=...
+        //   server  (default) mic grant and offer creation overlap, ICE gathering is
+        //           bounded, and our /connect endpoint mints the session and
+        //           exchanges SDP upstream in a single round trip
+        //   fast    as above, but the page fetches a token and talks to OpenAI itself
+        //   classic the original sequential flow
+        const connectParams = new URLSearchParams(window.location.search);
+        const CONNECT_MODE = connectParams.get("connect") || "server";
+        const ICE_DEADLINE_MS = Number(connectParams.get("ice_deadline") || 300);
+        // Session preset (presets.py) for /session and /connect, selected with
+        // ?preset=low-latency|balanced|text-only; the server default otherwise
+        const SESSION_PRESET = connectParams.get("preset") || "";
+        const SESSION_QUERY = SESSION_PRESET ? "?preset=" + encodeURIComponent(SESSION_PRESET) : "";
+
         async function startChat() {
             startButton.textContent = "Connecting...";
             startButton.classList.remove("bg-gradient-to-r", "from-violet-600", "to-indigo-600", "hover:from-violet-700", "hover:to-indigo-700");
             startButton.classList.add("bg-gradient-to-r", "from-red-600", "to-red-700", "hover:from-red-700", "hover:to-red-800");
-            
-            logMessage("[INFO] Requesting ephemeral token...");
-            document.getElementById("status").textContent = "Requesting ephemeral token from server...";
 
-            const tokenResp = await fetch("/session");
-            const tokenData = await tokenResp.json();
-            if (tokenData.error) {
-                logMessage("[ERROR] " + JSON.stringify(tokenData, null, 2));
-                document.getElementById("status").textContent = "Failed to get ephemeral key.";
-                startButton.textContent = "Connect & Start Chat";
-                return;
-            }
-
-            const EPHEMERAL_KEY = tokenData.client_secret.value;
-            document.getElementById("status").textContent = "Ephemeral key acquired. Creating RTCPeerConnection...";
+            const timer = new ConnectTimer(CONNECT_MODE);
+            conversationId = crypto.randomUUID();
+            Journal.start(conversationId);
+            TurnLatency.start(CONNECT_MODE, SESSION_PRESET);
+            assistantBacklog = [];
+            clearTimeout(oob.timer);
+            oob = newScheduler();
+            contextWindow = new ContextWindow(OOB_WINDOW_OPTIONS);
+            pipeline = newPipeline();
+            transcripts = new TranscriptAssembler();
 
             pc = new RTCPeerConnection();
 
             pc.ontrack = (event) => {
+                timer.mark("remote_track");
                 logMessage("[INFO] Received remote audio track from model.");
                 const audioEl = document.createElement("audio");
                 audioEl.autoplay = true;
                 audioEl.srcObject = event.streams[0];
             };
 
-            try {
-                const mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
-                mediaStream.getTracks().forEach((track) => pc.addTrack(track, mediaStream));
-                logMessage("[INFO] Local microphone track acquired and added.");
-            } catch (err) {
-                logMessage("[ERROR] Unable to acquire microphone: " + err);
-                document.getElementById("status").textContent = "Could not access microphone.";
-                startButton.textContent = "Connect & Start Chat";
-                return;
-            }
-
             dc = pc.createDataChannel("oai-events");
             dc.addEventListener("open", () => {
+                timer.mark("datachannel_open");
                 logMessage("[INFO] Data channel opened.");
+                logMessage("[INFO] " + timer.summary());
                 document.getElementById("status").textContent = "Connected! You can chat now.";
                 startButton.textContent = "Disconnect";
+                if (ROLLOVER_ENABLED) rollover.arm();
             });
 
-            dc.addEventListener("message", (e) => {
+            const onServerMessage = (e) => {
                 let serverEvent;
                 try {
                     serverEvent = JSON.parse(e.data);
@@ -216,77 +264,245 @@ HTML_TEMPLATE = """
                     logMessage("[WARN] Received non-JSON data from server: " + e.data);
                     return;
                 }
+                Journal.record("in", serverEvent);
+                rollover.observe(serverEvent);
 
-                // Handle classification responses
-                if (serverEvent.type === "response.done" && 
-                    serverEvent.response.metadata?.type === "classification") {
-                    addClassification(serverEvent.response.output[0].content[0].text);
-                    return;
+                // Track main-conversation items for the out-of-band context window
+                if (serverEvent.type === "conversation.item.created") {
+                    contextWindow.add(serverEvent.item);
                 }
+                if (serverEvent.type === "conversation.item.deleted") {
+                    contextWindow.remove(serverEvent.item_id);
+                }
+
+                // Assemble main-conversation transcripts from their deltas
+                // (out-of-band task output is left to the task handlers)
+                const mainResponse = !pipeline.owns(serverEvent.response_id ?? serverEvent.response?.id);
+                if (mainResponse) {
+                    for (const turn of transcripts.feed(serverEvent)) transcriptTurn(turn);
+                }
+                TurnLatency.observe(serverEvent, mainResponse);
+
+                // Out-of-band task responses are routed to their handlers by metadata.type
+                if (pipeline.handle(serverEvent)) return;
 
-                // Monitor for new conversation items (both text and audio)
+                if (serverEvent.type === "response.done") {
+                    timer.mark("first_response_done");
+                    requestSummary();
+                }
+
+                // Classify every new user input: typed text right away,
+                // speech once its transcription has completed (transcriptTurn)
                 if (serverEvent.type === "conversation.item.created" && 
                     serverEvent.item.role === "user") {
-                    // Request classification for any new user input
-                    const classificationEvent = {
-                        type: "response.create",
-                        response: {
-                            conversation: "none",
-                            metadata: { type: "classification" },
-                            modalities: ["text"],
-                            instructions: `Analyze the conversation so far and classify it into exactly one of these categories: "general", "philosophical", "math", or "technology". Consider the overall theme and context of the entire conversation, not just the latest message. Output only the category name, nothing else. Do not respond like normal conversation or with question but only and only the category name.`,
-                        }
-                    };
-                    dc.send(JSON.stringify(classificationEvent));
+                    const text = itemText(serverEvent.item);
+                    if (text) scheduleClassification(text);
+                }
+                if (serverEvent.type === "conversation.item.input_audio_transcription.failed") {
+                    scheduleClassification(null);
                 }
 
                 // Log other events
-                logMessage("[SERVER EVENT] " + JSON.stringify(serverEvent, null, 2));
-            });
+                eventLog.event(serverEvent);
+            };
+            dc.addEventListener("message", onServerMessage);
+            rollover.stop();
+            rollover = newRollover(onServerMessage);
 
-            pc.onicecandidate = async (evt) => {
-                if (!evt.candidate && pc.iceGatheringState === "complete") {
-                    document.getElementById("status").textContent = "Sending SDP offer to Realtime API...";
-                    const offer = pc.localDescription;
-
-                    const baseUrl = "https://api.openai.com/v1/realtime";
-                    const model = "gpt-4o-realtime-preview-2024-12-17";
-
-                    try {
-                        const sdpResponse = await fetch(`${baseUrl}?model=${model}`, {
-                            method: "POST",
-                            headers: {
-                                "Authorization": `Bearer ${EPHEMERAL_KEY}`,
-                                "Content-Type": "application/sdp"
-                            },
-                            body: offer.sdp
-                        });
-
-                        if (!sdpResponse.ok) {
-                            const errText = await sdpResponse.text();
-                            logMessage("[ERROR] Realtime API error: " + errText);
-                            document.getElementById("status").textContent = "Error from Realtime API (check console).";
-                            startButton.textContent = "Connect & Start Chat";
-                            return;
-                        }
+            const prepared = CONNECT_MODE === "classic"
+                ? await prepareClassic(timer)
+                : await prepareFast(timer, CONNECT_MODE === "fast");
+            if (!prepared) {
+                // A token's lease is no use without an offer to go with it
+                SessionLease.close();
+                startButton.textContent = "Connect & Start Chat";
+                return;
+            }
+
+            document.getElementById("status").textContent = "Sending SDP offer to Realtime API...";
+            try {
+                const sdpResponse = await sendOffer(prepared);
 
-                        const answerSdp = await sdpResponse.text();
-                        const answer = { type: "answer", sdp: answerSdp };
-                        await pc.setRemoteDescription(answer);
-
-                        document.getElementById("status").textContent = "Connected! You can chat now.";
-                        startButton.textContent = "Disconnect";
-                        logMessage("[INFO] WebRTC connection established.");
-                    } catch (error) {
-                        logMessage("[ERROR] " + error);
-                        document.getElementById("status").textContent = "Error sending SDP offer.";
-                        startButton.textContent = "Connect & Start Chat";
-                    }
+                if (!sdpResponse.ok) {
+                    const errText = await sdpResponse.text();
+                    SessionLease.close();
+                    if (retryLater(errText)) return;
+                    logMessage("[ERROR] Realtime API error: " + errText);
+                    document.getElementById("status").textContent = "Error from Realtime API (check console).";
+                    startButton.textContent = "Connect & Start Chat";
+                    return;
                 }
-            };
 
-            const offer = await pc.createOffer();
+                const answerSdp = await sdpResponse.text();
+                const answer = { type: "answer", sdp: answerSdp };
+                await pc.setRemoteDescription(answer);
+                timer.mark("answer");
+                if (CONNECT_MODE === "server") SessionLease.open(sdpResponse.headers.get("X-Session-Lease"), connectionAlive);
+
+                document.getElementById("status").textContent = "Connected! You can chat now.";
+                startButton.textContent = "Disconnect";
+                logMessage("[INFO] WebRTC connection established.");
+            } catch (error) {
+                SessionLease.close();
+                logMessage("[ERROR] " + error);
+                document.getElementById("status").textContent = "Error sending SDP offer.";
+                startButton.textContent = "Connect & Start Chat";
+            }
+        }
+
+        // POST the offer to our /connect endpoint, or with the ephemeral key straight
+        // to the Realtime API URL that /session handed out (the server's API base and model)
+        function sendOffer(prepared, headers = SessionLease.headers()) {
+            if (CONNECT_MODE === "server") {
+                return fetch("/connect" + SESSION_QUERY, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/sdp", ...headers },
+                    body: prepared.sdp
+                });
+            }
+            return fetch(prepared.url, {
+                method: "POST",
+                headers: {
+                    "Authorization": `Bearer ${prepared.key}`,
+                    "Content-Type": "application/sdp"
+                },
+                body: prepared.sdp
+            });
+        }
+
+        // Long calls roll over to a fresh session before the 30-minute limit
+        // (rollover.js); ?rollover_after=<s> and ?rollover_deadline=<s> move the
+        // schedule, ?rollover=0 turns it off
+        const ROLLOVER_ENABLED = connectParams.get("rollover") !== "0";
+        let rollover = newRollover(null);
+
+        function newRollover(onServerMessage) {
+            return new SessionRollover({
+                afterMs: Number(connectParams.get("rollover_after") || ROLLOVER_DEFAULTS.afterMs / 1000) * 1000,
+                deadlineMs: Number(connectParams.get("rollover_deadline") || ROLLOVER_DEFAULTS.deadlineMs / 1000) * 1000,
+                iceDeadlineMs: ICE_DEADLINE_MS,
+                mode: CONNECT_MODE,
+                tokenUrl: "/session" + SESSION_QUERY,
+                sendOffer,
+                live: () => ({ pc, dc }),
+                summary: () => contextWindow.summary,
+                log: logMessage,
+                onSwitch: (newPc, newDc, idMap) => {
+                    pc = newPc;
+                    dc = newDc;
+                    dc.addEventListener("message", onServerMessage);
+                    contextWindow.rebase(idMap);
+                    pipeline.abandon();
+                    transcripts = new TranscriptAssembler();
+                },
+            });
+        }
+
+        // Whether the call a lease belongs to is still up (heartbeats stop otherwise)
+        function connectionAlive() {
+            return pc !== null && pc.connectionState !== "failed" && pc.connectionState !== "closed";
+        }
+
+        // /connect sheds load or queues us with {"retry_after_ms": ...}; start over after that delay
+        function retryLater(errText) {
+            let errData;
+            try {
+                errData = JSON.parse(errText);
+            } catch {
+                return false;
+            }
+            if (!errData.retry_after_ms) return false;
+            pc.getSenders().forEach((sender) => sender.track && sender.track.stop());
+            pc.close();
+            const status = SessionLease.queued(errData);
+            logMessage(`[WARN] ${status} (retrying in ${errData.retry_after_ms} ms)`);
+            document.getElementById("status").textContent = status;
+            setTimeout(startChat, errData.retry_after_ms);
+            return true;
+        }
+
+        async function fetchToken() {
+            logMessage("[INFO] Requesting ephemeral token...");
+            document.getElementById("status").textContent = "Requesting ephemeral token from server...";
+            let tokenData;
+            try {
+                const tokenResp = await fetch("/session" + SESSION_QUERY, { headers: SessionLease.headers() });
+                tokenData = await tokenResp.json();
+            } catch (err) {
+                tokenData = { error: String(err) };
+            }
+            if (tokenData.retry_after_ms) {
+                // Server is shedding load or has queued us; come back when it says to
+                const status = SessionLease.queued(tokenData);
+                logMessage(`[WARN] ${status} (retrying in ${tokenData.retry_after_ms} ms)`);
+                document.getElementById("status").textContent = status;
+                setTimeout(startChat, tokenData.retry_after_ms);
+                return null;
+            }
+            if (tokenData.error) {
+                logMessage("[ERROR] " + JSON.stringify(tokenData, null, 2));
+                document.getElementById("status").textContent = "Failed to get ephemeral key.";
+                return null;
+            }
+            SessionLease.open(tokenData.lease_id, connectionAlive);
+            document.getElementById("status").textContent = "Ephemeral key acquired. Creating RTCPeerConnection...";
+            return tokenData;
+        }
+
+        function microphoneError(err) {
+            logMessage("[ERROR] Unable to acquire microphone: " + err);
+            document.getElementById("status").textContent = "Could not access microphone.";
+        }
+
+        // Original flow: token, then mic, then offer, then wait for ICE "complete"
+        async function prepareClassic(timer) {
+            const tokenData = await timer.track("token", fetchToken());
+            if (!tokenData) return null;
+
+            try {
+                const mediaStream = await timer.track("mic", navigator.mediaDevices.getUserMedia({ audio: true }));
+                mediaStream.getTracks().forEach((track) => pc.addTrack(track, mediaStream));
+                logMessage("[INFO] Local microphone track acquired and added.");
+            } catch (err) {
+                microphoneError(err);
+                return null;
+            }
+
+            const offer = await timer.track("offer", pc.createOffer());
             await pc.setLocalDescription(offer);
+            const sdp = await timer.track("ice", waitForIceGathering(pc));
+            return { key: tokenData.client_secret.value, url: tokenData.realtime_url, sdp };
+        }
+
+        // Fast flow: token, mic and offer run concurrently; ICE gathering is bounded
+        async function prepareFast(timer, withToken) {
+            const tokenPromise = withToken ? timer.track("token", fetchToken()) : null;
+            const micPromise = timer.track("mic", navigator.mediaDevices.getUserMedia({ audio: true }));
+
+            // Reserve the audio m-line now so the offer does not wait for the mic;
+            // the real track is attached with replaceTrack (no renegotiation).
+            const transceiver = pc.addTransceiver("audio", { direction: "sendrecv" });
+            const offer = await timer.track("offer", pc.createOffer());
+            await pc.setLocalDescription(offer);
+            const icePromise = timer.track("ice", waitForIceGathering(pc, ICE_DEADLINE_MS));
+
+            let mediaStream;
+            try {
+                mediaStream = await micPromise;
+                await transceiver.sender.replaceTrack(mediaStream.getAudioTracks()[0]);
+                logMessage("[INFO] Local microphone track acquired and added.");
+            } catch (err) {
+                microphoneError(err);
+                return null;
+            }
+
+            if (!withToken) return { key: null, sdp: await icePromise };
+            const tokenData = await tokenPromise;
+            if (!tokenData) {
+                mediaStream.getTracks().forEach((track) => track.stop());
+                return null;
+            }
+            return { key: tokenData.client_secret.value, url: tokenData.realtime_url, sdp: await icePromise };
         }
 
         function sendTextMessage() {
@@ -313,22 +529,259 @@ HTML_TEMPLATE = """
                 }
             };
             dc.send(JSON.stringify(userEvent));
+            Journal.record("out", userEvent);
             logMessage("[YOU] " + textVal);
 
-            // Request normal response
+            // Request normal response, in the session preset's modalities
             const responseEvent = {
-                type: "response.create",
-                response: {
-                    modalities: ["text", "audio"]
-                }
+                type: "response.create"
             };
             dc.send(JSON.stringify(responseEvent));
+            TurnLatency.turnEnded();
+            Journal.record("out", responseEvent);
 
             // Clear input
             document.getElementById("text-input").value = "";
         }
 
-        function addClassification(category) {
+        // Classification: our server's local classifier answers first, and the
+        // model out-of-band response is only requested when it is not confident
+        // (or for an occasional shadow check that keeps agreement measured).
+        const CLASSIFICATION_INSTRUCTIONS = `Analyze the conversation so far and classify it into exactly one of these categories: "general", "philosophical", "math", or "technology". Consider the overall theme and context of the entire conversation, not just the latest message. Output only the category name, nothing else. Do not respond like normal conversation or with question but only and only the category name.`;
+        let conversationId = null;
+        let assistantBacklog = [];
+
+        // Out-of-band context: classifications see only the newest
+        // ?oob_window=<items> (default 8; 0 = whole conversation), capped at
+        // ?oob_window_tokens=<estimated tokens> if set. With ?oob_summary=<n>,
+        // every n items that leave the window are folded into a rolling summary
+        // that is passed in front of the window.
+        const SUMMARY_INSTRUCTIONS = `Update the summary of this conversation with the new messages. Keep the topics discussed and their order, in at most five sentences. Output only the summary.`;
+        const OOB_WINDOW_OPTIONS = {
+            maxItems: Number(connectParams.get("oob_window") ?? 8),
+            maxTokens: Number(connectParams.get("oob_window_tokens") || 0),
+            summaryEvery: Number(connectParams.get("oob_summary") || 0),
+        };
+        let contextWindow = new ContextWindow(OOB_WINDOW_OPTIONS);
+
+        function requestSummary() {
+            const input = contextWindow.pendingSummary();
+            if (input) pipeline.request("summary", { input });
+        }
+
+        // Out-of-band tasks, dispatched through OobPipeline. Classification always
+        // runs; ?oob_tasks=sentiment,intent,moderation enables the others. Low
+        // priority tasks wait while the assistant is responding and are cancelled
+        // as soon as the user starts speaking.
+        const INSIGHT_TASKS = {
+            sentiment: {
+                instructions: `Judge the sentiment of the user's most recent message. Output only one word: "positive", "neutral" or "negative".`,
+                priority: OOB_PRIORITY.LOW,
+            },
+            intent: {
+                instructions: `Identify the intent of the user's most recent message. Output only one of: "question", "request", "opinion", "small_talk", "feedback".`,
+                priority: OOB_PRIORITY.LOW,
+            },
+            moderation: {
+                instructions: `Check the user's most recent message for harassment, hate, self-harm, sexual or violent content. Output only "safe", or "flagged: " followed by the category.`,
+                priority: OOB_PRIORITY.NORMAL,
+            },
+        };
+        const OOB_TASKS = (connectParams.get("oob_tasks") || "").split(",").filter((name) => name in INSIGHT_TASKS);
+        let pipeline = newPipeline();
+
+        function newPipeline() {
+            const pipeline = new OobPipeline((event) => {
+                if (!dc || dc.readyState !== "open") return false;
+                dc.send(JSON.stringify(event));
+                Journal.record("out", event);
+                return true;
+            });
+            pipeline.register({
+                type: "classification",
+                instructions: CLASSIFICATION_INSTRUCTIONS,
+                priority: OOB_PRIORITY.HIGH,
+                // A superseded classification may still be winding down
+                maxConcurrent: 2,
+                input: () => contextWindow.input(),
+                onDone: modelClassified,
+                onDropped: (request) => sendClassificationFeedback(request.options, { cancelled: true }),
+            });
+            pipeline.register({
+                type: "summary",
+                instructions: SUMMARY_INSTRUCTIONS,
+                priority: OOB_PRIORITY.LOW,
+                onDone: (response) => contextWindow.summaryDone(responseText(response)),
+                onDropped: () => contextWindow.summaryDone(null),
+            });
+            for (const name of OOB_TASKS) {
+                pipeline.register({
+                    type: name,
+                    ...INSIGHT_TASKS[name],
+                    triggers: ["conversation.item.created"],
+                    when: (event) => event.item.role === "user",
+                    input: () => contextWindow.input(),
+                    onDone: (response) => showInsight(name, responseText(response)),
+                });
+            }
+            return pipeline;
+        }
+
+        // Text of a completed out-of-band response, or null
+        function responseText(response) {
+            if (response.status !== "completed") return null;
+            return response.output?.[0]?.content?.[0]?.text || null;
+        }
+
+        function showInsight(name, text) {
+            if (!text) return;
+            document.getElementById("insights").classList.remove("hidden");
+            let row = document.getElementById("insight-" + name);
+            if (!row) {
+                row = document.createElement("div");
+                row.id = "insight-" + name;
+                row.className = "flex items-center justify-between p-2 glass-morphism rounded-lg";
+                row.innerHTML = `<span class="text-sm capitalize"></span><span class="font-semibold text-violet-300"></span>`;
+                row.children[0].textContent = name;
+                document.getElementById("insight-list").appendChild(row);
+            }
+            row.children[1].textContent = text.trim();
+        }
+
+        // Out-of-band scheduling: a burst of user turns is debounced into one
+        // classification, newer input cancels the model classification in flight,
+        // and every request carries a sequence number so late results are dropped.
+        // Tune the debounce window with ?oob_debounce=<ms>.
+        const OOB_DEBOUNCE_MS = Number(connectParams.get("oob_debounce") || 250);
+        let oob = newScheduler();
+
+        function newScheduler() {
+            return {
+                seq: 0,
+                timer: null,
+                queued: [],
+                stats: { turns: 0, classifications: 0, debounced: 0, stale: 0 },
+            };
+        }
+
+        function itemText(item) {
+            return (item.content || [])
+                .map((part) => part.text || part.transcript || "")
+                .filter(Boolean)
+                .join(" ");
+        }
+
+        // Completed transcripts: assistant replies are sent along with the next
+        // user turn as classifier context; spoken user turns get classified
+        let transcripts = new TranscriptAssembler();
+
+        function transcriptTurn(turn) {
+            if (turn.role === "assistant") {
+                if (turn.text) assistantBacklog.push({ role: "assistant", text: turn.text });
+                return;
+            }
+            contextWindow.update(turn.item_id, turn.text);
+            scheduleClassification(turn.text);
+        }
+
+        // text is null when a spoken turn could not be transcribed
+        function scheduleClassification(text) {
+            oob.queued.push(text);
+            oob.stats.turns++;
+            cancelInflightClassifications();
+            clearTimeout(oob.timer);
+            oob.timer = setTimeout(flushClassification, OOB_DEBOUNCE_MS);
+        }
+
+        function flushClassification() {
+            const queued = oob.queued;
+            oob.queued = [];
+            if (!queued.length) return;
+            const seq = ++oob.seq;
+            oob.stats.classifications++;
+            oob.stats.debounced += queued.length - 1;
+            classifyTurn(queued.filter((text) => text), seq, queued.length - 1);
+        }
+
+        function cancelInflightClassifications() {
+            pipeline.cancel((request) => request.type === "classification");
+        }
+
+        async function classifyTurn(texts, seq, merged) {
+            let result = null;
+            if (texts.length) {
+                const items = assistantBacklog.concat(texts.map((text) => ({ role: "user", text })));
+                assistantBacklog = [];
+                try {
+                    const resp = await fetch("/classify", {
+                        method: "POST",
+                        headers: { "Content-Type": "application/json" },
+                        body: JSON.stringify({ conversation: conversationId, items, merged }),
+                    });
+                    if (resp.ok) result = await resp.json();
+                } catch (err) {
+                    logMessage("[WARN] Local classifier unavailable: " + err);
+                }
+            }
+            // Newer input arrived while /classify was in flight
+            if (seq !== oob.seq) return;
+            if (!result) {
+                requestModelClassification(null, seq);
+                return;
+            }
+            if (result.label) addClassification(result.label, seq);
+            if (result.escalate || result.verify) requestModelClassification(result, seq);
+        }
+
+        function requestModelClassification(local, seq) {
+            pipeline.request("classification", {
+                metadata: { request_id: local ? local.request_id : "", seq: String(seq) },
+                requestId: local ? local.request_id : "",
+                guess: local ? local.guess : null,
+                display: !local || local.escalate,
+            });
+        }
+
+        // Show the model's label unless it only confirmed a label already shown,
+        // and report it back so the server can track agreement and latency saved
+        function modelClassified(response, request) {
+            const seq = Number(response.metadata.seq);
+            const options = request ? request.options : null;
+            if (response.status === "cancelled") {
+                sendClassificationFeedback(options, { cancelled: true });
+                return;
+            }
+            const label = response.output?.[0]?.content?.[0]?.text;
+            if (!label) return;
+            let stale = false;
+            if (!options || options.display || label.trim().toLowerCase() !== options.guess) {
+                stale = !addClassification(label, seq);
+            }
+            if (options) {
+                sendClassificationFeedback(options, {
+                    label,
+                    ms: Math.round(performance.now() - request.started),
+                    stale,
+                });
+            }
+        }
+
+        function sendClassificationFeedback(options, body) {
+            if (!options || !options.requestId) return;
+            fetch("/classify/feedback", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ request_id: options.requestId, ...body }),
+            }).catch(() => {});
+        }
+
+        // Returns false (and shows nothing) for a result overtaken by newer input
+        function addClassification(category, seq) {
+            if (seq < oob.seq) {
+                oob.stats.stale++;
+                logMessage("[INFO] Dropped stale classification: " + category);
+                return false;
+            }
             const div = document.createElement("div");
             div.className = "classification-badge flex items-center justify-between p-2 glass-morphism rounded-lg";
             
@@ -353,69 +806,239 @@ HTML_TEMPLATE = """
             `;
             
             classificationsContainer.insertBefore(div, classificationsContainer.firstChild);
+            return true;
         }
 
+        // Bounded log: pick the verbosity with ?log=quiet|events|debug or the selector
+        const eventLog = new EventLog(document.getElementById("log"), {
+            level: new URLSearchParams(window.location.search).get("log") || "events",
+        });
+        const logLevelSelect = document.getElementById("log-level");
+        logLevelSelect.value = eventLog.level;
+        logLevelSelect.addEventListener("change", () => eventLog.setLevel(logLevelSelect.value));
+        document.getElementById("log-filter").addEventListener("input", (e) => eventLog.setFilter(e.target.value));
+
         function logMessage(message) {
-            const logEl = document.getElementById("log");
-            logEl.textContent += "\\n" + message;
-            logEl.scrollTop = logEl.scrollHeight;
-            console.log(message);
+            eventLog.message(message);
         }
     </script>
 </body>
 </html>
 """
 
+# Built once: identity, gzip and brotli bytes with strong ETags
+PAGE = assets.StaticAsset(assets.render_page(upstream.rebase_urls(HTML_TEMPLATE)), "text/html; charset=utf-8")
+
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
     """
-    Serve the single-page HTML UI.
+    Serve the single-page HTML UI (precompressed, 304 on revalidation).
     """
     try:
-        print(colored("[INFO] Serving HTML template", "green"))
-        return HTML_TEMPLATE
+        return assets.asset_response(request, PAGE)
     except Exception as e:
-        print(colored(f"[ERROR] Failed to serve HTML template: {str(e)}", "red"))
+        logs.error(f"Failed to serve HTML template: {str(e)}")
         raise
 
+@app.get("/static/{name}")
+async def static_file(request: Request, name: str):
+    """
+    Serve the content-hashed CSS/JS bundle with immutable caching.
+    """
+    return assets.static_response(request, name)
+
+@app.get("/session/pool")
+async def session_pool():
+    """
+    Pre-minted session pool, admission, upstream resilience and live
+    session counters.
+    """
+    return {
+        **token_pool.pool.stats(),
+        "admission": admission.gate.stats(),
+        "resilience": resilience.guard.stats(),
+        "sessions": sessions.registry.stats(),
+    }
+
 @app.get("/session")
-async def session():
+async def session(request: Request):
     """
     Create an ephemeral Realtime key.
     Requires a standard API key (OPENAI_API_KEY) on the server side.
+    The payload adds the session lease and the realtime_url to post the SDP offer to.
     """
+    lease = None
     try:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
-            print(colored("[ERROR] No OPENAI_API_KEY found in environment variables", "red"))
+            logs.error("No OPENAI_API_KEY found in environment variables")
             return {"error": "No OPENAI_API_KEY found in environment variables."}
+        preset = presets.select(SESSION_PRESETS, request)
+        if preset is None:
+            logs.warning("Unknown session preset requested")
+            return presets.unknown_response(SESSION_PRESETS)
 
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": "gpt-4o-realtime-preview-2024-12-17",
-            "voice": "verse"
-        }
+        # A slot in the session registry first: over capacity the page is queued
+        try:
+            lease = sessions.registry.admit(request)
+        except admission.Rejected as e:
+            logs.warning(f"Session request not admitted, retry in {e.retry_after_ms} ms: {e.reason}", retry_after_ms=e.retry_after_ms)
+            return admission.rejected_response(e)
+
+        pooled = token_pool.pool.take(preset)
+        if pooled is not None:
+            logs.success("Served pre-minted session token from pool")
+            return {**pooled, "lease_id": lease.id, "realtime_url": upstream.realtime_url(preset["model"])}
 
-        print(colored("[INFO] Requesting ephemeral session token", "cyan"))
-        resp = requests.post(
-            "https://api.openai.com/v1/realtime/sessions", 
-            headers=headers, 
-            json=data
-        )
+        logs.info("Requesting ephemeral session token")
+        try:
+            resp = await resilience.guard.mint(api_key, preset)
+        except admission.Rejected as e:
+            logs.warning(f"Session request rejected, retry in {e.retry_after_ms} ms: {e.reason}", retry_after_ms=e.retry_after_ms)
+            sessions.registry.close(lease.id, "failed")
+            return admission.rejected_response(e)
         
         if resp.status_code != 200:
-            print(colored(f"[ERROR] Failed to create ephemeral session: {resp.text}", "red"))
+            logs.error(f"Failed to create ephemeral session: {resp.text}", upstream_status=resp.status_code)
+            sessions.registry.close(lease.id, "failed")
             return {"error": f"Could not create ephemeral session: {resp.text}"}
 
-        print(colored("[SUCCESS] Ephemeral session token created", "green"))
-        return resp.json()
+        logs.success("Ephemeral session token created")
+        return {**resp.json(), "lease_id": lease.id, "realtime_url": upstream.realtime_url(preset["model"])}
     except Exception as e:
-        print(colored(f"[ERROR] Session creation failed: {str(e)}", "red"))
+        logs.error(f"Session creation failed: {str(e)}")
+        if lease is not None:
+            sessions.registry.close(lease.id, "failed")
         return {"error": f"Session creation failed: {str(e)}"}
 
+@app.post("/session/heartbeat")
+async def session_heartbeat(request: Request):
+    """
+    Keep the page's session lease alive; 404 once it has been closed or reaped.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid heartbeat payload"})
+    lease_id = payload.get("lease") if isinstance(payload, dict) else None
+    if not sessions.registry.heartbeat(lease_id):
+        return JSONResponse(status_code=404, content={"error": "Unknown session lease"})
+    return {"ok": True}
+
+@app.post("/session/close")
+async def session_close(request: Request):
+    """
+    Give the page's session lease back (sent as a beacon on disconnect).
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid close payload"})
+    lease_id = payload.get("lease") if isinstance(payload, dict) else None
+    closed = sessions.registry.close(lease_id)
+    if closed:
+        logs.info("Session lease returned by the page")
+    return {"closed": closed}
+
+@app.post("/connect")
+async def connect(request: Request):
+    """
+    Mint a session and exchange the browser's SDP offer server-side,
+    returning the answer SDP. The ephemeral key never reaches the browser.
+    """
+    lease = None
+    try:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            logs.error("No OPENAI_API_KEY found in environment variables")
+            return JSONResponse(status_code=500, content={"error": "No OPENAI_API_KEY found in environment variables."})
+
+        offer_sdp = (await request.body()).decode("utf-8")
+        preset = presets.select(SESSION_PRESETS, request)
+        if preset is None:
+            logs.warning("Unknown session preset requested")
+            return presets.unknown_response(SESSION_PRESETS)
+        lease = sessions.registry.admit(request)
+        logs.info("Negotiating WebRTC session server-side")
+        answer_sdp = await signaling.negotiate(api_key, preset, offer_sdp)
+        logs.success("SDP answer received")
+        return Response(content=answer_sdp, media_type="application/sdp", headers={sessions.LEASE_HEADER: lease.id})
+    except admission.Rejected as e:
+        logs.warning(f"Connect request rejected, retry in {e.retry_after_ms} ms: {e.reason}", retry_after_ms=e.retry_after_ms)
+        if lease is not None:
+            sessions.registry.close(lease.id, "failed")
+        return admission.rejected_response(e)
+    except signaling.NegotiationError as e:
+        logs.error(str(e))
+        sessions.registry.close(lease.id, "failed")
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except Exception as e:
+        logs.error(f"Connect failed: {str(e)}")
+        if lease is not None:
+            sessions.registry.close(lease.id, "failed")
+        return JSONResponse(status_code=500, content={"error": f"Connect failed: {str(e)}"})
+
+@app.post("/classify")
+async def classify(request: Request):
+    """
+    Classify the conversation with the local fast-path classifier.
+    Replies with the label, or escalate=true when the page should ask the model.
+    """
+    try:
+        return classifier.service.classify(await request.json())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid classification payload: {str(e)}"})
+
+@app.post("/classify/feedback")
+async def classify_feedback(request: Request):
+    """
+    Record the model's label, or its cancellation, for an escalated or
+    shadow-checked classification.
+    """
+    try:
+        result = classifier.service.feedback(await request.json())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid feedback payload: {str(e)}"})
+    if result is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown classification request"})
+    return result
+
+@app.get("/classify/stats")
+async def classify_stats():
+    """
+    Fast-path ratio, agreement rate, latency saved and responses avoided.
+    """
+    return classifier.service.stats()
+
+@app.post("/telemetry")
+async def telemetry_batch(request: Request):
+    """
+    Accept a batch of client connection-phase timings.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid telemetry payload"})
+    return {"accepted": telemetry.record_client_events(payload)}
+
+@app.post("/journal")
+async def journal_batch(request: Request):
+    """
+    Queue a batch of the page's data channel events for its session journal.
+    """
+    try:
+        accepted = journal.store.submit(await request.json())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid journal payload: {str(e)}"})
+    return {"accepted": accepted, "enabled": journal.store.enabled}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text format: connect-phase and request histograms plus
+    pool, admission and resilience gauges.
+    """
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    print(colored("[INFO] Starting server...", "cyan"))
-    uvicorn.run("2_out_of_band_responses:app", host="127.0.0.1", port=8000, reload=True)
+    serve.main(variant="oob", reload=True)
@@ -0,0 +1,234 @@
+"""
+Admission control for upstream session minting.
+
+Every call to /realtime/sessions passes through one gate that:
+    - bounds the number of concurrent upstream calls,
+    - queues excess callers for at most a deadline, rejecting beyond a bounded
+      waiting-room size,
+    - rate limits with a token bucket matched to the account's limits,
+    - retries 429 / 5xx / transport errors with jittered exponential backoff
+      (honouring an upstream Retry-After).
+
+Callers that cannot be admitted get a Rejected exception carrying a
+retry-after hint, which the /session handlers turn into a fast 429 instead of
+an expensive failed round trip.
+
+Tunables are read from the environment:
+    ADMISSION_MAX_CONCURRENCY  concurrent upstream mint calls (default 16)
+    ADMISSION_MAX_WAITING      callers allowed to queue for a slot (default 256)
+    ADMISSION_QUEUE_DEADLINE   seconds a caller may wait before rejection (default 2)
+    ADMISSION_RATE             sustained mints per second (default 10)
+    ADMISSION_BURST            token bucket capacity (default 20)
+    ADMISSION_MAX_RETRIES      retries on 429/5xx/transport errors (default 2)
+    ADMISSION_BACKOFF_BASE     first backoff step in seconds (default 0.2)
+    ADMISSION_BACKOFF_CAP      largest backoff in seconds (default 2)
+"""
+import asyncio
+import math
+import os
+import random
+import time
+
+import httpx
+from fastapi.responses import JSONResponse
+
+MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+MAX_WAITING = int(os.getenv("ADMISSION_MAX_WAITING", "256"))
+QUEUE_DEADLINE = float(os.getenv("ADMISSION_QUEUE_DEADLINE", "2"))
+RATE = float(os.getenv("ADMISSION_RATE", "10"))
+BURST = float(os.getenv("ADMISSION_BURST", "20"))
+MAX_RETRIES = int(os.getenv("ADMISSION_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("ADMISSION_BACKOFF_BASE", "0.2"))
+BACKOFF_CAP = float(os.getenv("ADMISSION_BACKOFF_CAP", "2"))
+
+RETRIABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class Rejected(Exception):
+    """
+    The call was not admitted; try again after retry_after_ms.
+    """
+
+    def __init__(self, reason, retry_after_ms, status_code=429, details=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_ms = max(1, int(retry_after_ms))
+        self.status_code = status_code
+        self.details = details or {}
+
+
+def rejected_response(exc):
+    """
+    Fast 429/503 telling the page how long to back off.
+    """
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": exc.reason, "retry_after_ms": exc.retry_after_ms, **exc.details},
+        headers={"Retry-After": str(math.ceil(exc.retry_after_ms / 1000))},
+    )
+
+
+class TokenBucket:
+    """
+    Classic token bucket. Tokens may go negative to hold a reservation for a
+    caller that is willing to wait.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """
+        Seconds until a token would be available, without taking it.
+        """
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self):
+        """
+        Take a token (possibly going into debt) and return how long to wait.
+        """
+        wait = self.wait_time()
+        self.tokens -= 1
+        return wait
+
+
+def _retry_after_seconds(resp):
+    value = resp.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff for the given retry attempt (0-based).
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class AdmissionGate:
+    """
+    Concurrency limiter + bounded waiting room + token bucket + retries.
+    """
+
+    def __init__(self):
+        self._slots = asyncio.Semaphore(MAX_CONCURRENCY)
+        self._bucket = TokenBucket(RATE, BURST)
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.retries = 0
+        self._avg_call_seconds = 0.5
+
+    def _estimate_wait(self):
+        queued = self.waiting + self.in_flight
+        return max(self._bucket.wait_time(), queued * self._avg_call_seconds / MAX_CONCURRENCY)
+
+    def _reject(self, reason, retry_after):
+        self.rejected += 1
+        raise Rejected(reason, retry_after * 1000)
+
+    async def _acquire_slot(self, deadline, background):
+        if background:
+            if self._slots.locked():
+                self._reject("Upstream busy", self._estimate_wait())
+            await self._slots.acquire()
+            return
+        if self.waiting >= MAX_WAITING:
+            self._reject("Too many queued session requests", self._estimate_wait())
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._reject("Timed out waiting for an upstream slot", self._estimate_wait())
+        finally:
+            self.waiting -= 1
+
+    async def _rate_limit(self, deadline, background):
+        wait = self._bucket.wait_time()
+        if wait > 0 and (background or time.monotonic() + wait > deadline):
+            self._reject("Session mint rate limit reached", wait)
+        await asyncio.sleep(self._bucket.reserve())
+
+    def try_reserve(self):
+        """
+        Take a rate token for an extra upstream call inside an admitted one
+        (a hedge), only if one is available right now.
+        """
+        if self._bucket.wait_time() > 0:
+            return False
+        self._bucket.reserve()
+        return True
+
+    async def run(self, call, deadline=None, background=False):
+        """
+        Admit and execute `call` (an async function returning an httpx.Response).
+
+        Background callers (pool refills) never wait: they are rejected as soon
+        as a slot or rate token is not immediately available, leaving capacity
+        to foreground /session requests.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + QUEUE_DEADLINE
+        await self._acquire_slot(deadline, background)
+        self.in_flight += 1
+        try:
+            await self._rate_limit(deadline, background)
+            self.admitted += 1
+            return await self._call_with_retries(call)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _call_with_retries(self, call):
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                resp = await call()
+            except httpx.TransportError:
+                if attempt >= MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                self._avg_call_seconds = 0.8 * self._avg_call_seconds + 0.2 * (time.monotonic() - started)
+                if resp.status_code not in RETRIABLE_STATUS:
+                    return resp
+                upstream_hint = _retry_after_seconds(resp)
+                if attempt >= MAX_RETRIES:
+                    if resp.status_code == 429:
+                        self._reject("Upstream rate limit reached", upstream_hint or backoff_delay(attempt))
+                    return resp
+                delay = upstream_hint if upstream_hint is not None else backoff_delay(attempt)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+            # Retries spend rate budget like any other call.
+            await asyncio.sleep(self._bucket.reserve())
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "retries": self.retries,
+        }
+
+
+gate = AdmissionGate()
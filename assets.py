@@ -0,0 +1,240 @@
+"""
+Precompressed, cacheable in-memory assets.
+
+A StaticAsset is built once (at import/startup) from a string or bytes and keeps
+identity, gzip and - when the optional `brotli` package is installed - brotli
+encodings side by side, each with its own strong ETag. asset_response() picks
+the best encoding the client accepts and answers conditional requests with a
+304, so reloads and reconnects cost a few hundred bytes instead of the page.
+
+Compressed encodings are also kept on disk under ASSET_CACHE_DIR (default
+static/.cache), keyed by the content digest, so a restart or every extra worker
+process reads them back instead of spending ~100 ms on brotli quality 11 per
+asset. Set ASSET_CACHE_DIR to an empty string to disable the cache.
+
+The CSS/JS bundle produced by build_assets.py (static/manifest.json) is loaded
+the same way and served under /static with immutable caching. Without a build,
+pages fall back to the CDN stylesheet tags (Tailwind compiled in the browser),
+so they need network access; a warning says so at startup. Shared scripts are
+then served unminified straight from frontend/js.
+"""
+import functools
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+from fastapi import HTTPException, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import logs
+
+# HTML is revalidated on every load (cheap 304s); content-hashed files never change.
+REVALIDATE = "no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+FRONTEND_JS_DIR = os.path.join(ROOT, "frontend", "js")
+CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(STATIC_DIR, ".cache"))
+
+# Templates carry this marker where stylesheet/script tags belong.
+ASSET_TAGS_MARKER = "<!-- ASSETS -->"
+
+CDN_CSS_TAGS = (
+    '<script src="https://cdn.tailwindcss.com"></script>\n'
+    '    <link href="https://cdn.jsdelivr.net/npm/daisyui@4.7.2/dist/full.min.css" rel="stylesheet" type="text/css" />'
+)
+
+
+def _accepted_encodings(header):
+    """
+    Parse Accept-Encoding into {coding: q}.
+    """
+    accepted = {}
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _cached(digest, suffix, compress):
+    """
+    Compressed bytes from the disk cache, compressing (and storing) on a miss.
+    The cache is best effort: an unwritable directory only costs the compression.
+    """
+    if not CACHE_DIR:
+        return compress()
+    path = os.path.join(CACHE_DIR, f"{digest}.{suffix}")
+    try:
+        return _read(path)
+    except OSError:
+        pass
+    data = compress()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Workers starting together may race; the rename makes the last one win whole
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+    except OSError:
+        pass
+    return data
+
+
+class StaticAsset:
+    """
+    One asset held in every encoding we serve.
+    """
+
+    def __init__(self, content, media_type, cache_control=REVALIDATE):
+        body = content.encode("utf-8") if isinstance(content, str) else content
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+        # encoding -> (bytes, etag); strong ETags must differ per encoding.
+        self.variants = {"identity": (body, f'"{self.digest[:32]}"')}
+        gzipped = _cached(self.digest, "gz", lambda: gzip.compress(body, 9, mtime=0))
+        self.variants["gzip"] = (gzipped, f'"{self.digest[:32]}-gz"')
+        if brotli is not None:
+            compressed = _cached(self.digest, "br", lambda: brotli.compress(body, quality=11))
+            self.variants["br"] = (compressed, f'"{self.digest[:32]}-br"')
+
+    def negotiate(self, accept_encoding):
+        """
+        Return the encoding to send for this Accept-Encoding header.
+        """
+        accepted = _accepted_encodings(accept_encoding)
+        for coding in ("br", "gzip"):
+            q = accepted.get(coding, accepted.get("*", 0.0))
+            if coding in self.variants and q > 0:
+                return coding
+        return "identity"
+
+    def etags(self):
+        return {etag for _, etag in self.variants.values()}
+
+
+def _not_modified(if_none_match, asset):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    known = asset.etags()
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in known:
+            return True
+    return False
+
+
+def asset_response(request, asset):
+    """
+    Serve `asset` with content negotiation, ETag, Cache-Control and 304s.
+    """
+    encoding = asset.negotiate(request.headers.get("accept-encoding"))
+    body, etag = asset.variants[encoding]
+    headers = {
+        "ETag": etag,
+        "Cache-Control": asset.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(request.headers.get("if-none-match"), asset):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=asset.media_type, headers=headers)
+
+
+class Bundle:
+    """
+    Content-hashed static files plus the <head> tags that reference them.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.css_tags = CDN_CSS_TAGS
+        self.js_tags = ""
+
+    def add(self, name, content, media_type):
+        self.files[name] = StaticAsset(content, media_type, cache_control=IMMUTABLE)
+
+    def head_tags(self):
+        return "\n    ".join(tag for tag in (self.css_tags, self.js_tags) if tag)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def load_bundle():
+    """
+    Load the built bundle once, or assemble the development fallback.
+    """
+    bundle = Bundle()
+    manifest_path = os.path.join(STATIC_DIR, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    if "css" in manifest:
+        name = manifest["css"]
+        bundle.add(name, _read(os.path.join(STATIC_DIR, name)), "text/css; charset=utf-8")
+        bundle.css_tags = f'<link href="/static/{name}" rel="stylesheet" type="text/css" />'
+    else:
+        logs.warning(
+            "No built CSS bundle in static/manifest.json: pages load Tailwind and DaisyUI from their CDNs "
+            "and will not work offline. Run `python build_assets.py` to self-host them."
+        )
+
+    js_name = manifest.get("js")
+    if js_name:
+        bundle.add(js_name, _read(os.path.join(STATIC_DIR, js_name)), "text/javascript; charset=utf-8")
+    else:
+        sources = sorted(glob.glob(os.path.join(FRONTEND_JS_DIR, "*.js")))
+        if sources:
+            content = b"\n".join(_read(path) for path in sources)
+            js_name = f"app.{hashlib.sha256(content).hexdigest()[:12]}.js"
+            bundle.add(js_name, content, "text/javascript; charset=utf-8")
+    if js_name:
+        bundle.js_tags = f'<script src="/static/{js_name}"></script>'
+    return bundle
+
+
+def render_page(template):
+    """
+    Substitute the bundle's <head> tags into a page template.
+    """
+    return template.replace(ASSET_TAGS_MARKER, load_bundle().head_tags())
+
+
+def static_response(request, name):
+    """
+    Serve one bundled file by its content-hashed name.
+    """
+    asset = load_bundle().files.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return asset_response(request, asset)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Run one of the chat apps under uvicorn with benchmark probes attached.
+
+Adds GET /__bench__/stats (event-loop lag and RSS of this process) without
+touching the app modules themselves. Started by load_test.py:
+    python benchmarks/bench_target.py 2_out_of_band_responses 8100
+"""
+import asyncio
+import importlib
+import os
+import sys
+from collections import deque
+
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROBE_INTERVAL = 0.01
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LagProbe:
+    """
+    Measures how late a short sleep wakes up: the event loop's scheduling lag.
+    """
+
+    def __init__(self):
+        self.samples = deque(maxlen=10000)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(PROBE_INTERVAL)
+            self.samples.append(max(0.0, loop.time() - started - PROBE_INTERVAL))
+
+    def snapshot(self, reset):
+        ordered = sorted(self.samples)
+        if reset:
+            self.samples.clear()
+        if not ordered:
+            return {"count": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "count": len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p99": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))],
+            "max": ordered[-1],
+        }
+
+
+async def main(module_name, port):
+    app = importlib.import_module(module_name).app
+    probe = LagProbe()
+
+    @app.get("/__bench__/stats")
+    async def bench_stats(reset: bool = False):
+        return {"event_loop_lag": probe.snapshot(reset), "rss_bytes": rss_bytes()}
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    probe_task = asyncio.create_task(probe.run())
+    try:
+        await server.serve()
+    finally:
+        probe_task.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1], int(sys.argv[2])))
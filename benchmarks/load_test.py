@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Load-generation benchmark for the chat servers.
+
+Starts the mock Realtime API and the target app (via bench_target.py) as
+subprocesses, drives each scenario at a fixed concurrency for a fixed duration,
+and reports throughput, p50/p95/p99 latency, status codes, event-loop lag and
+RSS growth per open connection. Results are written as JSON so they can be
+kept as baselines and compared on later runs:
+
+    python benchmarks/load_test.py --concurrency 50 --duration 10 --save benchmarks/results/baseline.json
+    python benchmarks/load_test.py --compare benchmarks/results/baseline.json
+
+--compare exits non-zero when throughput drops or p95 grows by more than
+--tolerance (default 20%) for any scenario.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from termcolor import colored
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SDP_OFFER = "v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\ns=-\r\nt=0 0\r\nm=audio 9 UDP/TLS/RTP/SAVPF 111\r\n"
+TELEMETRY_BATCH = {"events": [
+    {"phase": "token", "ms": 120, "mode": "server"},
+    {"phase": "answer", "ms": 480, "mode": "server"},
+    {"phase": "datachannel_open", "ms": 650, "mode": "server"},
+]}
+
+# name -> (method, path, request kwargs)
+SCENARIOS = {
+    "index": ("GET", "/", {"headers": {"Accept-Encoding": "br, gzip"}}),
+    "index_revalidate": ("GET", "/", {"headers": {"Accept-Encoding": "br, gzip"}, "etag": True}),
+    "session": ("GET", "/session", {}),
+    "connect": ("POST", "/connect", {"content": SDP_OFFER, "headers": {"Content-Type": "application/sdp"}}),
+    "telemetry": ("POST", "/telemetry", {"json": TELEMETRY_BATCH}),
+}
+
+# Benchmarks measure our server path, not the account's rate limits.
+DEFAULT_TARGET_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "ADMISSION_RATE": "100000",
+    "ADMISSION_BURST": "100000",
+    "ADMISSION_MAX_WAITING": "100000",
+    # Every benchmark request comes from one address, i.e. one user to the session registry
+    "SESSIONS_MAX_PER_USER": "100000",
+    "SESSIONS_MAX_ACTIVE": "100000",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scenario(base_url, name, concurrency, duration):
+    method, path, spec = SCENARIOS[name]
+    spec = dict(spec)
+    use_etag = spec.pop("etag", False)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if use_etag:
+            first = await client.get(path, headers=spec["headers"])
+            spec["headers"] = {**spec["headers"], "If-None-Match": first.headers["etag"]}
+
+        before = (await client.get("/__bench__/stats", params={"reset": True})).json()
+        latencies = []
+        statuses = {}
+        errors = 0
+        stop_at = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, **spec)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        after = (await client.get("/__bench__/stats", params={"reset": True})).json()
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50_ms": _ms(percentile(ordered, 0.50)),
+        "latency_p95_ms": _ms(percentile(ordered, 0.95)),
+        "latency_p99_ms": _ms(percentile(ordered, 0.99)),
+        "event_loop_lag_p99_ms": _ms(after["event_loop_lag"]["p99"]),
+        "event_loop_lag_max_ms": _ms(after["event_loop_lag"]["max"]),
+        "rss_bytes": after["rss_bytes"],
+        "rss_per_connection_bytes": max(0, after["rss_bytes"] - before["rss_bytes"]) / concurrency,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print per-scenario deltas against a baseline; return True if any regressed.
+    """
+    regressed = False
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        checks = [
+            ("throughput_rps", -1),
+            ("latency_p95_ms", 1),
+            ("latency_p99_ms", 1),
+        ]
+        for metric, direction in checks:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            bad = change * direction > tolerance
+            regressed |= bad
+            color = "red" if bad else "green"
+            print(colored(f"  {name:18} {metric:18} {old:10.2f} -> {new:10.2f} ({change:+.1%})", color))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat server's HTTP paths.")
+    parser.add_argument("--app", default="2_out_of_band_responses", help="module exposing `app`")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the target app")
+    parser.add_argument("--save", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    mock_port, app_port = free_port(), free_port()
+    env = {**os.environ, **DEFAULT_TARGET_ENV, "OPENAI_API_BASE": f"http://127.0.0.1:{mock_port}/v1"}
+    env.update(item.split("=", 1) for item in args.env)
+
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "mock_realtime_server.py"), "--port", str(mock_port),
+             "--latency-ms", str(args.upstream_latency_ms)],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+        subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "bench_target.py"), args.app, str(app_port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+    ]
+    try:
+        wait_for(f"http://127.0.0.1:{mock_port}/docs")
+        base_url = f"http://127.0.0.1:{app_port}"
+        wait_for(base_url + "/__bench__/stats")
+
+        results = {
+            "app": args.app,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+            "scenarios": {},
+        }
+        for name in args.scenarios.split(","):
+            print(colored(f"[INFO] {name}: {args.concurrency} concurrent for {args.duration}s", "cyan"))
+            stats = asyncio.run(run_scenario(base_url, name, args.concurrency, args.duration))
+            results["scenarios"][name] = stats
+            print(
+                f"  {stats['throughput_rps']:.0f} req/s  p50={stats['latency_p50_ms']}ms "
+                f"p95={stats['latency_p95_ms']}ms p99={stats['latency_p99_ms']}ms  "
+                f"loop lag p99={stats['event_loop_lag_p99_ms']}ms  statuses={stats['statuses']}"
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(colored(f"[SUCCESS] Results saved to {args.save}", "green"))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(colored(f"[INFO] Comparing against {args.compare}", "cyan"))
+        if compare(results, baseline, args.tolerance):
+            print(colored("[ERROR] Regression beyond tolerance", "red"))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Measure what logging costs the event loop: the old print(colored(...)) calls
+against the queue-backed logs module.
+
+    per call     time a single log call holds the calling thread, with stdout
+                 going to a file and to a slowly drained pipe (a terminal or log
+                 shipper that cannot keep up)
+    per request  time per request through a FastAPI handler that logs like
+                 /session does (three lines), in-process over ASGI: no logging,
+                 print(colored(...)), and logs.install() plus logs calls
+
+    python benchmarks/logging_overhead.py --calls 5000 --requests 2000 --save benchmarks/results/logging.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from termcolor import colored
+
+from load_test import ROOT
+
+sys.path.insert(0, ROOT)
+import logs  # noqa: E402
+
+# Reads the pipe at roughly 40 KB/s
+SLOW_READER = "import sys, time\nwhile sys.stdin.buffer.read(4096):\n    time.sleep(0.1)\n"
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)] * 1e6, 2),
+        "max_us": round(ordered[-1] * 1e6, 2),
+        "total_ms": round(sum(ordered) * 1000, 2),
+    }
+
+
+@contextlib.contextmanager
+def sink(kind):
+    """
+    A text stream standing in for stdout.
+    """
+    if kind == "file":
+        with tempfile.TemporaryFile("w+") as f:
+            yield f
+        return
+    reader = subprocess.Popen([sys.executable, "-c", SLOW_READER], stdin=subprocess.PIPE)
+    stream = open(reader.stdin.fileno(), "w", closefd=False)
+    try:
+        yield stream
+    finally:
+        with contextlib.suppress(OSError):
+            stream.close()
+        reader.stdin.close()
+        reader.kill()
+        reader.wait()
+
+
+@contextlib.contextmanager
+def logging_to(stream, mode):
+    """
+    Point print() or the logs module at `stream` for the duration.
+    """
+    saved_stdout, saved_logger = sys.stdout, logs.logger
+    if mode == "print":
+        sys.stdout = stream
+    elif mode == "logs":
+        logs.logger = logs.Logger(stream=stream, fmt="json")
+    try:
+        yield
+    finally:
+        if mode == "logs":
+            logs.logger.close()
+        sys.stdout, logs.logger = saved_stdout, saved_logger
+
+
+def per_call(mode, kind, calls):
+    samples = []
+    with sink(kind) as stream, logging_to(stream, mode):
+        if mode == "logs":
+            # Start the writer thread outside the measurement
+            logs.info("warm-up")
+        for i in range(calls):
+            started = time.perf_counter()
+            if mode == "print":
+                print(colored(f"[INFO] Requesting ephemeral session token {i}", "cyan"))
+            else:
+                logs.info(f"Requesting ephemeral session token {i}")
+            samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def build_app(mode):
+    app = FastAPI()
+    if mode == "logs":
+        logs.install(app)
+
+    @app.get("/session")
+    async def session():
+        if mode == "print":
+            print(colored("[INFO] Requesting ephemeral session token", "cyan"))
+            print(colored("[SUCCESS] Ephemeral session token created", "green"))
+        elif mode == "logs":
+            logs.info("Requesting ephemeral session token")
+            logs.annotate(upstream_ms=12.5, upstream_status=200)
+            logs.success("Ephemeral session token created")
+        return {"ok": True}
+
+    return app
+
+
+async def drive(app, requests):
+    samples = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/session")
+        for _ in range(requests):
+            started = time.perf_counter()
+            await client.get("/session")
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def per_request(mode, kind, requests):
+    with sink(kind) as stream, logging_to(stream, mode):
+        samples = asyncio.run(drive(build_app(mode), requests))
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead: print(colored(...)) vs. the logs module.")
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--save", help="write results JSON here")
+    args = parser.parse_args()
+
+    results = {"per_call": {}, "per_request": {}}
+    for kind in ("file", "slow_pipe"):
+        for mode in ("print", "logs"):
+            summary = per_call(mode, kind, args.calls)
+            results["per_call"][f"{mode}/{kind}"] = summary
+            print(f"  per call    {mode:5} -> {kind:9}  p50 {summary['p50_us']:>8} us  p99 {summary['p99_us']:>9} us  "
+                  f"max {summary['max_us']:>10} us")
+    for kind in ("file", "slow_pipe"):
+        for mode in ("none", "print", "logs"):
+            summary = per_request(mode, kind, args.requests)
+            results["per_request"][f"{mode}/{kind}"] = summary
+            print(f"  per request {mode:5} -> {kind:9}  p50 {summary['p50_us']:>8} us  p99 {summary['p99_us']:>9} us  "
+                  f"max {summary['max_us']:>10} us")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(colored(f"[SUCCESS] Results saved to {args.save}", "green"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark out-of-band classification cost against conversation length.
+
+Runs headless sessions with many turns against the mock Realtime API, once per
+context window size (0 = whole conversation), with the mock charging latency
+per input token (--prefill-us-per-token) the way a real model's prefill does.
+The local fast path is disabled so every turn is classified by the model.
+Reports classification latency and input tokens for the first and last turns:
+with a bounded window both stay flat as the conversation grows.
+
+    python benchmarks/oob_window.py --windows 0,4,8,16 --turns 30 --sessions 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from termcolor import colored
+
+from load_test import BENCH_DIR, DEFAULT_TARGET_ENV, ROOT, free_port, wait_for
+
+sys.path.insert(0, ROOT)
+import headless_client  # noqa: E402
+
+EDGE_TURNS = 5
+
+
+def summarize(turns, first):
+    selected = [t for t in turns if (t.index < EDGE_TURNS) == first and t.source == "model"]
+    latencies = sorted(t.classified * 1000 for t in selected if t.classified is not None)
+    tokens = [t.classification_tokens for t in selected if t.classification_tokens is not None]
+    return {
+        "classification_p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+        "input_tokens_avg": round(sum(tokens) / len(tokens), 1) if tokens else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classification latency vs. out-of-band context window.")
+    parser.add_argument("--windows", default="0,4,8,16", help="comma-separated item windows; 0 = whole conversation")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--prefill-us-per-token", type=float, default=200.0)
+    parser.add_argument("--save", help="write results JSON here")
+    args = parser.parse_args()
+
+    mock_port, app_port = free_port(), free_port()
+    api_base = f"http://127.0.0.1:{mock_port}/v1"
+    # Every turn goes to the model: no local answers, and no cached labels carried from one window's run to the next
+    env = {
+        **os.environ,
+        **DEFAULT_TARGET_ENV,
+        "OPENAI_API_BASE": api_base,
+        "CLASSIFIER_MIN_SCORE": "1e9",
+        "CLASSIFIER_CACHE_MAX_BYTES": "0",
+    }
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "mock_realtime_server.py"), "--port", str(mock_port),
+             "--latency-ms", "20", "--jitter-ms", "0",
+             "--prefill-us-per-token", str(args.prefill_us_per_token)],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+        subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "bench_target.py"), "2_out_of_band_responses", str(app_port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+    ]
+    results = {"turns": args.turns, "prefill_us_per_token": args.prefill_us_per_token, "windows": {}}
+    try:
+        wait_for(f"http://127.0.0.1:{mock_port}/docs")
+        server = f"http://127.0.0.1:{app_port}"
+        wait_for(server + "/__bench__/stats")
+        ws_url = headless_client.realtime_ws_url(api_base, headless_client.DEFAULT_MODEL)
+
+        for window in (int(w) for w in args.windows.split(",")):
+            run = asyncio.run(headless_client.run_load(
+                server, ws_url, args.sessions, args.sessions, args.turns, oob_window=window,
+            ))
+            first, last = summarize(run["turns"], True), summarize(run["turns"], False)
+            results["windows"][str(window)] = {"first_turns": first, "later_turns": last, "errors": len(run["errors"])}
+            label = "whole conversation" if window == 0 else f"last {window} items"
+            print(colored(f"[INFO] {label}", "cyan"))
+            print(f"  first {EDGE_TURNS} turns: p50={first['classification_p50_ms']}ms  input tokens={first['input_tokens_avg']}")
+            print(f"  later turns:   p50={last['classification_p50_ms']}ms  input tokens={last['input_tokens_avg']}")
+            if run["errors"]:
+                print(colored(f"[ERROR] {len(run['errors'])} sessions failed, e.g. {run['errors'][0]}", "red"))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(colored(f"[SUCCESS] Results saved to {args.save}", "green"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Measure import and startup time of both variants against the startup budget.
+
+For each variant, every run uses a fresh interpreter:
+    import     time to import FastAPI, then the rest of the app (serve.create_app),
+               with an empty asset cache (cold) and a populated one (warm)
+    ready      time from launching `serve.py --workers 1` to the first 200 from /
+    shutdown   time from SIGTERM to exit with no requests in flight
+
+Exits non-zero when the warm import p50 of any variant exceeds --budget-ms
+(default STARTUP_BUDGET_MS or 1000), so it can guard against import-time
+regressions:
+
+    python benchmarks/startup.py --runs 5 --save benchmarks/results/startup.json
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from termcolor import colored
+
+from load_test import DEFAULT_TARGET_ENV, ROOT, free_port
+
+# Runs in a fresh interpreter; prints {"fastapi_ms": ..., "app_ms": ...}
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import fastapi
+fastapi_ms = (time.perf_counter() - started) * 1000
+import serve
+started = time.perf_counter()
+serve.create_app(sys.argv[1])
+app_ms = (time.perf_counter() - started) * 1000
+# Let the app's own log records out first so the result is the last line
+import logs
+logs.logger.close()
+print(json.dumps({"fastapi_ms": fastapi_ms, "app_ms": app_ms}))
+"""
+
+
+def measure_import(variant, env):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE, variant],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["total_ms"] = timings["fastapi_ms"] + timings["app_ms"]
+    return timings
+
+
+def responds(port):
+    # http.client rather than httpx: no client or TLS context built per poll
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        connection.request("GET", "/")
+        return connection.getresponse().status == 200
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+
+def measure_ready(variant, env, timeout=30):
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--app", variant, "--port", str(port), "--workers", "1"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while not responds(port):
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"{variant} did not become ready within {timeout}s")
+            time.sleep(0.01)
+        ready_ms = (time.perf_counter() - started) * 1000
+        stopping = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout)
+        return ready_ms, (time.perf_counter() - stopping) * 1000
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def p50(values):
+    ordered = sorted(values)
+    return round(ordered[len(ordered) // 2], 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time of the chat apps.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--variants", default="basic,oob")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1000")))
+    parser.add_argument("--save", help="write results JSON here")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="asset-cache-")
+    env = {
+        **os.environ,
+        **DEFAULT_TARGET_ENV,
+        "ASSET_CACHE_DIR": cache_dir,
+        "TOKEN_POOL_MAX_SIZE": "0",
+    }
+    results = {"budget_ms": args.budget_ms, "runs": args.runs, "variants": {}}
+    over_budget = []
+    try:
+        for variant in args.variants.split(","):
+            cold, warm, ready, shutdown = [], [], [], []
+            for _ in range(args.runs):
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                cold.append(measure_import(variant, env))
+                warm.append(measure_import(variant, env))
+                ready_ms, shutdown_ms = measure_ready(variant, env)
+                ready.append(ready_ms)
+                shutdown.append(shutdown_ms)
+            summary = {
+                "fastapi_import_ms": p50(t["fastapi_ms"] for t in warm),
+                "cold_import_ms": p50(t["total_ms"] for t in cold),
+                "warm_import_ms": p50(t["total_ms"] for t in warm),
+                "ready_ms": p50(ready),
+                "shutdown_ms": p50(shutdown),
+            }
+            results["variants"][variant] = summary
+            within = summary["warm_import_ms"] <= args.budget_ms
+            if not within:
+                over_budget.append(variant)
+            print(colored(f"[INFO] {variant}", "cyan"))
+            print(f"  import (cold cache): {summary['cold_import_ms']} ms")
+            print(f"  import (warm cache): {summary['warm_import_ms']} ms, of which FastAPI {summary['fastapi_import_ms']} ms")
+            print(f"  ready (process start to first 200): {summary['ready_ms']} ms")
+            print(f"  graceful shutdown: {summary['shutdown_ms']} ms")
+            status = colored("within", "green") if within else colored("OVER", "red")
+            print(f"  budget {args.budget_ms:.0f} ms: {status}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(colored(f"[SUCCESS] Results saved to {args.save}", "green"))
+    if over_budget:
+        print(colored(f"[ERROR] Import over budget: {', '.join(over_budget)}", "red"))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
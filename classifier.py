@@ -0,0 +1,365 @@
+"""
+Local fast-path topic classifier for the out-of-band classification.
+
+The enhanced page used to send a model response.create for every user item
+just to pick one of four labels. The page now POSTs the new conversation text
+to /classify first. A TF-IDF scorer over per-label seed vocabularies answers
+in microseconds. Only when it is not confident does the page escalate to the
+model-based out-of-band response. The model's answer is reported back to
+/classify/feedback, which yields the agreement rate and how much model latency
+the fast path saved. A small share of confident answers is also escalated
+("shadow" checks) so agreement on confident answers stays measured.
+
+The page also debounces bursts of turns into one request and cancels model
+classifications overtaken by newer input; both are reported here as upstream
+responses avoided.
+
+Model labels are cached by a digest of the normalized context window they were
+computed for. Before escalating, /classify consults that cache, so reconnects,
+retries and repeated short utterances ("ok", "yes") over identical context
+do not trigger fresh model classifications.
+"""
+import hashlib
+import itertools
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+
+LABELS = ("general", "philosophical", "math", "technology")
+
+# Seed documents per label; idf is computed across them, so words shared by
+# several labels carry little weight.
+SEED_VOCABULARY = {
+    "general": """
+        hello hi hey thanks thank weather weekend food cooking recipe movie movies music song
+        travel trip holiday family friend friends sport sports game football weather today
+        tomorrow dinner lunch breakfast shopping pet dog cat book books news favorite fun
+    """,
+    "philosophical": """
+        meaning life purpose existence exist consciousness conscious mind free will ethics ethical
+        moral morality truth reality soul death god belief believe knowledge wisdom virtue
+        happiness suffering philosophy philosopher plato aristotle kant nietzsche socrates
+        existential metaphysics metaphysical identity self justice universe why deterministic
+    """,
+    "math": """
+        math mathematics number numbers sum add addition subtract multiply multiplication divide
+        division equation equations solve algebra geometry calculus integral derivative
+        probability statistics prime primes fraction fractions percent percentage square root
+        matrix vector theorem proof formula angle triangle circle area volume calculate plus minus
+    """,
+    "technology": """
+        computer computers software hardware code coding program programming python javascript
+        compile compiler api app apps internet web website server database cloud network
+        algorithm ai artificial intelligence machine learning model robot robots phone smartphone
+        laptop chip processor gpu cpu linux windows browser data encryption technology tech
+    """,
+}
+
+CLASSIFIER_MIN_SCORE = float(os.getenv("CLASSIFIER_MIN_SCORE", "1.0"))
+CLASSIFIER_MIN_SHARE = float(os.getenv("CLASSIFIER_MIN_SHARE", "0.6"))
+CLASSIFIER_SHADOW_RATE = float(os.getenv("CLASSIFIER_SHADOW_RATE", "0.1"))
+CLASSIFIER_HISTORY = int(os.getenv("CLASSIFIER_HISTORY", "12"))
+CLASSIFIER_DECAY = float(os.getenv("CLASSIFIER_DECAY", "0.8"))
+CLASSIFIER_MAX_CONVERSATIONS = int(os.getenv("CLASSIFIER_MAX_CONVERSATIONS", "1000"))
+CLASSIFIER_CACHE_WINDOW = int(os.getenv("CLASSIFIER_CACHE_WINDOW", "8"))
+CLASSIFIER_CACHE_TTL = float(os.getenv("CLASSIFIER_CACHE_TTL", "600"))
+CLASSIFIER_CACHE_MAX_BYTES = int(os.getenv("CLASSIFIER_CACHE_MAX_BYTES", str(1024 * 1024)))
+MAX_PENDING = 10000
+MAX_MERGED = 100
+MAX_TEXT = 4000
+
+_TOKEN = re.compile(r"[a-z]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class KeywordClassifier:
+    """
+    TF-IDF scorer: each token maps to one precomputed weight per label, so
+    scoring is a sparse sum of small vectors.
+    """
+
+    def __init__(self, vocabulary=SEED_VOCABULARY):
+        self.labels = tuple(vocabulary)
+        documents = {label: Counter(tokenize(text)) for label, text in vocabulary.items()}
+        document_frequency = Counter()
+        for counts in documents.values():
+            document_frequency.update(counts.keys())
+        total = len(documents)
+
+        weights = {}
+        for index, label in enumerate(self.labels):
+            counts = documents[label]
+            norm = math.sqrt(sum((1 + math.log(total / document_frequency[token])) ** 2 for token in counts))
+            for token in counts:
+                vector = weights.setdefault(token, [0.0] * total)
+                vector[index] = (1 + math.log(total / document_frequency[token])) / norm
+        # Cheap plural folding: "primes" -> "prime" when only the stem is seeded.
+        for token in list(weights):
+            weights.setdefault(token + "s", weights[token])
+        self.weights = {token: tuple(vector) for token, vector in weights.items()}
+
+    def scores(self, weighted_tokens):
+        """
+        Sum label weights over (tokens, weight) pairs; scaled so one strong
+        keyword scores about 1.
+        """
+        totals = [0.0] * len(self.labels)
+        for tokens, weight in weighted_tokens:
+            for token in tokens:
+                vector = self.weights.get(token)
+                if vector is not None:
+                    for index, value in enumerate(vector):
+                        totals[index] += value * weight
+        scale = math.sqrt(len(self.weights) / len(self.labels))
+        return {label: total * scale for label, total in zip(self.labels, totals)}
+
+    def predict(self, weighted_tokens):
+        """
+        Return (label, confident, scores).
+        """
+        scores = self.scores(weighted_tokens)
+        label = max(scores, key=scores.get)
+        top = scores[label]
+        total = sum(scores.values())
+        confident = total > 0 and top >= CLASSIFIER_MIN_SCORE and top / total >= CLASSIFIER_MIN_SHARE
+        return label, confident, scores
+
+
+def context_digest(context, window=CLASSIFIER_CACHE_WINDOW):
+    """
+    Digest of the newest `window` tokenized items; tokenizing already drops
+    case, punctuation and whitespace differences.
+    """
+    recent = itertools.islice(context, max(0, len(context) - window), None)
+    return hashlib.blake2b("\x1e".join(" ".join(tokens) for tokens in recent).encode(), digest_size=16).digest()
+
+
+class ResultCache:
+    """
+    LRU cache with a per-entry TTL and an approximate memory budget.
+    """
+
+    # Rough per-entry cost of the OrderedDict slot and value tuple
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, ttl=CLASSIFIER_CACHE_TTL, max_bytes=CLASSIFIER_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if key in self.entries:
+            self._drop(key)
+        size = sys.getsizeof(key) + sys.getsizeof(value) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        self.bytes -= self.entries.pop(key)[2]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            # Every hit answered an escalation without a model response
+            "upstream_calls_avoided": self.hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ClassificationService:
+    """
+    Per-conversation context plus fast-path/escalation bookkeeping.
+    """
+
+    def __init__(self, model=None, cache=None):
+        self.model = model or KeywordClassifier()
+        self.cache = cache or ResultCache()
+        self.conversations = OrderedDict()
+        self.pending = OrderedDict()
+        self.local_answers = 0
+        self.escalations = 0
+        self.shadow_checks = 0
+        self.model_results = 0
+        self.agreements = 0
+        self.shadow_results = 0
+        self.shadow_agreements = 0
+        self.debounced_turns = 0
+        self.cancelled_responses = 0
+        self.stale_results = 0
+        self.local_seconds = 0.0
+        self.model_ms_total = 0.0
+
+    def _context(self, conversation):
+        context = self.conversations.get(conversation)
+        if context is None:
+            context = self.conversations[conversation] = deque(maxlen=CLASSIFIER_HISTORY)
+            while len(self.conversations) > CLASSIFIER_MAX_CONVERSATIONS:
+                self.conversations.popitem(last=False)
+        else:
+            self.conversations.move_to_end(conversation)
+        return context
+
+    def classify(self, payload):
+        """
+        Append new items to the conversation and classify it locally.
+        Raises ValueError on a malformed payload.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object")
+        conversation = payload.get("conversation")
+        items = payload.get("items")
+        if not isinstance(conversation, str) or not conversation or not isinstance(items, list):
+            raise ValueError("Expected 'conversation' and a list of 'items'")
+
+        merged = payload.get("merged", 0)
+        if isinstance(merged, int) and not isinstance(merged, bool) and merged > 0:
+            self.debounced_turns += min(merged, MAX_MERGED)
+
+        started = time.perf_counter()
+        context = self._context(conversation)
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("text"), str):
+                context.append(tokenize(item["text"][:MAX_TEXT]))
+
+        # Newest item weighs 1, older ones decay, mirroring "the whole
+        # conversation, not just the latest message".
+        newest = len(context) - 1
+        label, confident, scores = self.model.predict(
+            (tokens, CLASSIFIER_DECAY ** (newest - index)) for index, tokens in enumerate(context)
+        )
+        self.local_seconds += time.perf_counter() - started
+
+        shadow = confident and random.random() < CLASSIFIER_SHADOW_RATE
+        escalate = not confident
+        source = "local"
+        digest = None
+        if escalate:
+            digest = context_digest(context)
+            cached = self.cache.get(digest)
+            if cached is not None:
+                label, escalate, source = cached, False, "cache"
+        request_id = None
+        if escalate or shadow:
+            request_id = uuid.uuid4().hex[:16]
+            self.pending[request_id] = (label, confident, digest or context_digest(context))
+            while len(self.pending) > MAX_PENDING:
+                self.pending.popitem(last=False)
+        if escalate:
+            self.escalations += 1
+        elif source == "local":
+            self.local_answers += 1
+            self.shadow_checks += shadow
+
+        return {
+            "label": None if escalate else label,
+            "guess": label,
+            "source": None if escalate else source,
+            "escalate": escalate,
+            "verify": shadow,
+            "request_id": request_id,
+            "scores": {name: round(score, 3) for name, score in scores.items()},
+        }
+
+    def feedback(self, payload):
+        """
+        Record the model's label (or its cancellation) for an escalated or
+        shadow-checked request. Returns a result dict, or None if the id is unknown.
+        Raises ValueError on a malformed payload, before anything is counted.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object")
+        request_id = payload.get("request_id")
+        if not isinstance(request_id, str):
+            raise ValueError("Expected a string 'request_id'")
+        pending = self.pending.pop(request_id, None)
+        if pending is None:
+            return None
+        if payload.get("cancelled") is True:
+            self.cancelled_responses += 1
+            return {"cancelled": True}
+        guess, confident, digest = pending
+        label = str(payload.get("label", "")).strip().strip(".").lower()
+        agreed = label == guess
+        if label in LABELS:
+            self.cache.put(digest, label)
+
+        self.model_results += 1
+        self.agreements += agreed
+        if confident:
+            self.shadow_results += 1
+            self.shadow_agreements += agreed
+        model_ms = payload.get("ms")
+        if isinstance(model_ms, (int, float)) and 0 <= model_ms < 600000:
+            self.model_ms_total += model_ms
+        if payload.get("stale") is True:
+            self.stale_results += 1
+        return {"agreed": agreed}
+
+    def stats(self):
+        answered = self.local_answers + self.cache.hits
+        classified = answered + self.escalations
+        model_ms_avg = self.model_ms_total / self.model_results if self.model_results else 0.0
+        local_ms_avg = self.local_seconds * 1000 / classified if classified else 0.0
+        return {
+            "local_answers": self.local_answers,
+            "escalations": self.escalations,
+            "cache_answers": self.cache.hits,
+            "fast_path_ratio": round(answered / classified, 4) if classified else 0.0,
+            "shadow_checks": self.shadow_checks,
+            "model_results": self.model_results,
+            "agreement_rate": round(self.agreements / self.model_results, 4) if self.model_results else 0.0,
+            "shadow_agreement_rate": (
+                round(self.shadow_agreements / self.shadow_results, 4) if self.shadow_results else 0.0
+            ),
+            "local_latency_us": round(local_ms_avg * 1000, 2),
+            "model_latency_ms": round(model_ms_avg, 2),
+            # Every local or cached answer skipped one model round trip (shadow checks still show the local label first).
+            "latency_saved_ms": round(answered * max(0.0, model_ms_avg - local_ms_avg), 1),
+            "debounced_turns": self.debounced_turns,
+            "cancelled_responses": self.cancelled_responses,
+            "stale_results": self.stale_results,
+            # Cancelled responses were already created upstream, so only debounced turns count as avoided
+            "responses_avoided": self.debounced_turns,
+            "conversations": len(self.conversations),
+            "cache": self.cache.stats(),
+        }
+
+
+service = ClassificationService()
@@ -0,0 +1,76 @@
+// Connection-setup helpers shared by the chat pages.
+
+// Records how long each connection phase took, relative to the click on Connect.
+class ConnectTimer {
+    constructor(mode) {
+        this.mode = mode;
+        this.start = performance.now();
+        this.phases = {};
+    }
+
+    // Each phase is recorded (and reported to /telemetry) only the first time.
+    mark(phase) {
+        if (!(phase in this.phases)) {
+            this.phases[phase] = Math.round(performance.now() - this.start);
+            Telemetry.record(phase, this.phases[phase], { mode: this.mode });
+        }
+        return this.phases[phase];
+    }
+
+    async track(phase, promise) {
+        const result = await promise;
+        this.mark(phase);
+        return result;
+    }
+
+    summary() {
+        const parts = Object.entries(this.phases).map(([phase, ms]) => `${phase}=${ms}ms`);
+        return `${this.mode} connect: ${parts.join(" ")}`;
+    }
+}
+
+// Resolve with the local SDP once ICE gathering is done.
+// Without a deadline this waits for "complete" (classic behaviour). With one,
+// it also resolves as soon as a server-reflexive/relay candidate shows up, or
+// once the deadline has passed and at least one candidate is in the SDP.
+function waitForIceGathering(pc, deadlineMs) {
+    return new Promise((resolve) => {
+        let haveCandidate = false;
+        let deadlinePassed = false;
+        let timer = null;
+
+        const finish = () => {
+            clearTimeout(timer);
+            pc.removeEventListener("icecandidate", onCandidate);
+            pc.removeEventListener("icegatheringstatechange", onState);
+            resolve(pc.localDescription.sdp);
+        };
+        const onState = () => {
+            if (pc.iceGatheringState === "complete") finish();
+        };
+        const onCandidate = (evt) => {
+            if (!evt.candidate) {
+                finish();
+                return;
+            }
+            haveCandidate = true;
+            const type = evt.candidate.type;
+            if (deadlineMs !== undefined && (deadlinePassed || type === "srflx" || type === "relay")) {
+                finish();
+            }
+        };
+
+        pc.addEventListener("icecandidate", onCandidate);
+        pc.addEventListener("icegatheringstatechange", onState);
+        if (pc.iceGatheringState === "complete") {
+            finish();
+            return;
+        }
+        if (deadlineMs !== undefined) {
+            timer = setTimeout(() => {
+                deadlinePassed = true;
+                if (haveCandidate) finish();
+            }, deadlineMs);
+        }
+    });
+}
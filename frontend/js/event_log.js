@@ -0,0 +1,145 @@
+// Bounded, virtualized conversation log.
+
+// Verbosity levels, selectable at runtime:
+//   quiet   log messages only
+//   events  messages plus one summary line per server event
+//   debug   messages plus each server event as single-line JSON
+const LOG_LEVELS = ["quiet", "events", "debug"];
+
+// Keeps the newest `capacity` entries in a ring buffer and renders only the
+// rows inside the scroll viewport, once per animation frame. Consecutive
+// *.delta events for the same item are collapsed into one row with a count.
+class EventLog {
+    constructor(container, { capacity = 2000, rowHeight = 20, level = "events" } = {}) {
+        this.container = container;
+        this.capacity = capacity;
+        this.rowHeight = rowHeight;
+        this.level = LOG_LEVELS.includes(level) ? level : "events";
+        this.filter = "";
+        this.entries = [];
+        this.head = 0;
+        this.dropped = 0;
+        this.visible = [];
+        this.dirty = false;
+        this.frame = null;
+
+        container.style.position = "relative";
+        this.spacer = document.createElement("div");
+        this.rows = document.createElement("div");
+        this.rows.style.position = "absolute";
+        const padding = getComputedStyle(container);
+        this.rows.style.left = padding.paddingLeft;
+        this.rows.style.right = padding.paddingRight;
+        container.append(this.spacer, this.rows);
+        container.addEventListener("scroll", () => this.schedule());
+    }
+
+    message(text) {
+        console.log(text);
+        this.push({ kind: "message", type: "", text: String(text).replace(/\s*\n\s*/g, " "), count: 1 });
+    }
+
+    event(serverEvent) {
+        if (this.level === "debug") console.log(serverEvent);
+        const type = serverEvent.type || "unknown";
+        const last = this.newest();
+        if (type.endsWith(".delta") && last && last.kind === "event" && last.type === type &&
+            last.key === EventLog.key(serverEvent)) {
+            last.event = serverEvent;
+            last.count++;
+            this.dirty = true;
+            this.schedule();
+            return;
+        }
+        this.push({ kind: "event", type, key: EventLog.key(serverEvent), event: serverEvent, count: 1 });
+    }
+
+    static key(serverEvent) {
+        return serverEvent.item_id || serverEvent.response_id || "";
+    }
+
+    setLevel(level) {
+        if (!LOG_LEVELS.includes(level)) return;
+        this.level = level;
+        this.dirty = true;
+        this.schedule();
+    }
+
+    setFilter(text) {
+        this.filter = text.trim().toLowerCase();
+        this.dirty = true;
+        this.schedule();
+    }
+
+    newest() {
+        if (!this.entries.length) return null;
+        return this.entries[(this.head - 1 + this.entries.length) % this.entries.length];
+    }
+
+    push(entry) {
+        if (this.entries.length < this.capacity) {
+            this.entries.push(entry);
+        } else {
+            this.entries[this.head] = entry;
+            this.dropped++;
+        }
+        this.head = (this.head + 1) % this.capacity;
+        this.dirty = true;
+        this.schedule();
+    }
+
+    schedule() {
+        if (this.frame === null) this.frame = requestAnimationFrame(() => this.render());
+    }
+
+    matches(entry) {
+        if (entry.kind === "event" && this.level === "quiet") return false;
+        if (!this.filter) return true;
+        return (entry.kind === "event" ? entry.type : entry.text).toLowerCase().includes(this.filter);
+    }
+
+    text(entry) {
+        if (entry.kind === "message") return entry.text;
+        const count = entry.count > 1 ? ` (x${entry.count})` : "";
+        if (this.level === "debug") return "[SERVER EVENT] " + JSON.stringify(entry.event) + count;
+        const event = entry.event;
+        const details = [event.item?.role, entry.key || event.response?.id, event.response?.status]
+            .filter(Boolean)
+            .join(" ");
+        return `[SERVER EVENT] ${entry.type}${details ? " " + details : ""}${count}`;
+    }
+
+    render() {
+        this.frame = null;
+        const container = this.container;
+        const atBottom = container.scrollTop + container.clientHeight >= container.scrollHeight - this.rowHeight;
+
+        if (this.dirty) {
+            this.dirty = false;
+            this.visible = [];
+            const start = this.entries.length < this.capacity ? 0 : this.head;
+            for (let i = 0; i < this.entries.length; i++) {
+                const entry = this.entries[(start + i) % this.entries.length];
+                if (this.matches(entry)) this.visible.push(entry);
+            }
+            this.spacer.style.height = this.visible.length * this.rowHeight + "px";
+            if (atBottom) container.scrollTop = container.scrollHeight;
+        }
+
+        const overscan = 5;
+        const first = Math.max(0, Math.floor(container.scrollTop / this.rowHeight) - overscan);
+        const last = Math.min(this.visible.length, first + Math.ceil(container.clientHeight / this.rowHeight) + 2 * overscan);
+        const fragment = document.createDocumentFragment();
+        for (let i = first; i < last; i++) {
+            const row = document.createElement("div");
+            row.textContent = this.text(this.visible[i]);
+            row.style.height = row.style.lineHeight = this.rowHeight + "px";
+            row.style.whiteSpace = "pre";
+            row.style.overflow = "hidden";
+            row.style.textOverflow = "ellipsis";
+            fragment.appendChild(row);
+        }
+        this.rows.style.top = first * this.rowHeight + "px";
+        this.rows.replaceChildren(fragment);
+    }
+}
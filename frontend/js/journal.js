@@ -0,0 +1,85 @@
+// Session event journal: selected data channel events (both directions) are
+// kept in a bounded buffer, oldest dropped first, and POSTed to /journal in
+// batches, with a final sendBeacon flush when the page is hidden. The server
+// appends them to a per-session JSONL journal (journal.py).
+
+// Deltas and audio chunks are left out; these are enough to rebuild the
+// timeline of every turn when looking into a latency incident.
+const JOURNAL_EVENT_TYPES = new Set([
+    "session.created",
+    "session.updated",
+    "input_audio_buffer.speech_started",
+    "input_audio_buffer.speech_stopped",
+    "input_audio_buffer.committed",
+    "conversation.item.create",
+    "conversation.item.created",
+    "conversation.item.input_audio_transcription.completed",
+    "conversation.item.input_audio_transcription.failed",
+    "response.create",
+    "response.cancel",
+    "response.created",
+    "response.done",
+    "rate_limits.updated",
+    "error",
+]);
+
+const Journal = {
+    session: null,
+    enabled: new URLSearchParams(window.location.search).get("journal") !== "0",
+    queue: [],
+    dropped: 0,
+    maxQueue: 1000,
+    maxBatch: 100,
+    flushDelayMs: 2000,
+    timer: null,
+
+    // Events are journaled under `session` until the next start()
+    start(session) {
+        this.flush();
+        this.session = session;
+    },
+
+    record(dir, event) {
+        if (!this.enabled || !this.session || !JOURNAL_EVENT_TYPES.has(event.type)) return;
+        if (this.queue.length >= this.maxQueue) {
+            this.queue.shift();
+            this.dropped++;
+        }
+        this.queue.push({ session: this.session, dir, t: Date.now(), event });
+        if (this.queue.length >= this.maxBatch) {
+            this.flush();
+        } else if (!this.timer) {
+            this.timer = setTimeout(() => this.flush(), this.flushDelayMs);
+        }
+    },
+
+    flush(useBeacon = false) {
+        clearTimeout(this.timer);
+        this.timer = null;
+        while (this.queue.length) {
+            // A batch never spans two sessions
+            const session = this.queue[0].session;
+            let count = 0;
+            while (count < this.maxBatch && count < this.queue.length && this.queue[count].session === session) count++;
+            const events = this.queue.splice(0, count).map(({ dir, t, event }) => ({ dir, t, event }));
+            const body = JSON.stringify({ session, dropped: this.dropped, events });
+            this.dropped = 0;
+            const blob = new Blob([body], { type: "application/json" });
+            if (useBeacon && navigator.sendBeacon && navigator.sendBeacon("/journal", blob)) continue;
+            fetch("/journal", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body,
+                keepalive: true
+            })
+                .then((response) => response.json())
+                .then((result) => {
+                    // Journaling is switched off on the server: stop sending
+                    if (result.enabled === false) this.enabled = false;
+                })
+                .catch(() => {});
+        }
+    }
+};
+
+window.addEventListener("pagehide", () => Journal.flush(true));
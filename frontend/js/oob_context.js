@@ -0,0 +1,112 @@
+// Bounded context for out-of-band responses.
+
+// Rough token estimate for text; spoken items count as AUDIO_ITEM_TOKENS
+// until their transcript arrives.
+const CHARS_PER_TOKEN = 4;
+const AUDIO_ITEM_TOKENS = 100;
+
+// Tracks the main conversation's message items and builds an explicit
+// `input` for out-of-band responses: references to the newest items, capped
+// at maxItems and (if set) maxTokens, optionally preceded by a rolling summary
+// of everything older. maxItems = 0 means "whole conversation" (no input).
+class ContextWindow {
+    constructor({ maxItems = 8, maxTokens = 0, summaryEvery = 0 } = {}) {
+        this.maxItems = maxItems;
+        this.maxTokens = maxTokens;
+        this.summaryEvery = summaryEvery;
+        this.items = [];
+        this.summary = "";
+        this.summarizing = null;
+    }
+
+    add(item) {
+        if (item.type !== "message" || item.role === "system") return;
+        this.items.push({ id: item.id, tokens: ContextWindow.estimate(item) });
+        // Without a summary nothing outside the window is ever needed again
+        if (this.maxItems && !this.summaryEvery && this.items.length > this.maxItems) this.items.shift();
+    }
+
+    update(id, text) {
+        const entry = this.items.find((entry) => entry.id === id);
+        if (entry) entry.tokens = Math.ceil(text.length / CHARS_PER_TOKEN);
+    }
+
+    remove(id) {
+        this.items = this.items.filter((entry) => entry.id !== id);
+    }
+
+    static estimate(item) {
+        let tokens = 0;
+        for (const part of item.content || []) {
+            const text = part.text || part.transcript;
+            if (text) tokens += Math.ceil(text.length / CHARS_PER_TOKEN);
+            else if (part.type === "input_audio" || part.type === "audio") tokens += AUDIO_ITEM_TOKENS;
+        }
+        return tokens;
+    }
+
+    // Number of trailing items that fit the window (always at least one)
+    size() {
+        let count = 0;
+        let tokens = 0;
+        for (let i = this.items.length - 1; i >= 0 && count < this.maxItems; i--) {
+            tokens += this.items[i].tokens;
+            if (count > 0 && this.maxTokens && tokens > this.maxTokens) break;
+            count++;
+        }
+        return count;
+    }
+
+    // `input` for response.create, or undefined for the whole conversation
+    input() {
+        if (!this.maxItems) return undefined;
+        const refs = this.items
+            .slice(this.items.length - this.size())
+            .map((entry) => ({ type: "item_reference", id: entry.id }));
+        if (!this.summary) return refs;
+        const summaryItem = {
+            type: "message",
+            role: "system",
+            content: [{ type: "input_text", text: "Summary of the earlier conversation: " + this.summary }],
+        };
+        return [summaryItem, ...refs];
+    }
+
+    // Items that have left the window and are not yet folded into the summary.
+    // Returns null until at least summaryEvery of them have accumulated.
+    pendingSummary() {
+        if (!this.maxItems || !this.summaryEvery || this.summarizing) return null;
+        const outside = this.items.length - this.size();
+        if (outside < this.summaryEvery) return null;
+        this.summarizing = this.items.slice(0, outside);
+        const refs = this.summarizing.map((entry) => ({ type: "item_reference", id: entry.id }));
+        return this.summary
+            ? [{ type: "message", role: "system", content: [{ type: "input_text", text: "Summary so far: " + this.summary }] }, ...refs]
+            : refs;
+    }
+
+    // Follow the conversation into a new session (rollover): `idMap` maps old
+    // item ids to their seeded copies; items that were not carried over are
+    // dropped, and a summary in progress is abandoned
+    rebase(idMap) {
+        this.items = this.items
+            .filter((entry) => idMap.has(entry.id))
+            .map((entry) => ({ ...entry, id: idMap.get(entry.id) }));
+        this.summarizing = null;
+    }
+
+    // The summarized items are dropped so the window's bookkeeping stays bounded.
+    // When summarizing failed (no text), everything outside the window is
+    // dropped unsummarized, so repeated failures cannot grow the list.
+    summaryDone(text) {
+        if (!this.summarizing) return;
+        if (text) {
+            const folded = new Set(this.summarizing.map((entry) => entry.id));
+            this.items = this.items.filter((entry) => !folded.has(entry.id));
+            this.summary = text;
+        } else {
+            this.items = this.items.slice(this.items.length - this.size());
+        }
+        this.summarizing = null;
+    }
+}
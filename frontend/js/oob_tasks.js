@@ -0,0 +1,225 @@
+// Out-of-band task pipeline.
+
+// Tasks below NORMAL are deferred while a main response is streaming and
+// cancelled when the user starts speaking.
+const OOB_PRIORITY = { LOW: 0, NORMAL: 1, HIGH: 2 };
+
+// A sent request still without its response.done after this long is dropped
+const OOB_TIMEOUT_MS = 30000;
+
+// Registry and scheduler for out-of-band responses. Each task is registered with
+//   type           its metadata.type, used to route response.done to onDone
+//   instructions   the response.create instructions
+//   priority       OOB_PRIORITY value (default NORMAL)
+//   maxConcurrent  responses of this type in flight at once (default 1)
+//   timeoutMs      how long a sent request may run before it is dropped
+//                  (default OOB_TIMEOUT_MS)
+//   triggers       server event types that request the task automatically
+//   when(event)    optional filter for those triggers
+//   input()        optional explicit input, evaluated when the request is sent
+//   onDone(response, request)  called for completed and cancelled responses
+//   onDropped(request)         called when a request is discarded: cancelled while
+//                              queued, not sent, rejected by an error event or
+//                              timed out
+// send(event) returns whether the event went out on the data channel.
+class OobPipeline {
+    constructor(send) {
+        this.send = send;
+        this.tasks = {};
+        this.running = {};
+        this.queue = [];
+        this.mainResponses = new Set();
+        this.taskResponses = new Set();
+        this.nextKey = 0;
+        this.stats = {};
+    }
+
+    register(task) {
+        this.tasks[task.type] = {
+            priority: OOB_PRIORITY.NORMAL,
+            maxConcurrent: 1,
+            timeoutMs: OOB_TIMEOUT_MS,
+            triggers: [],
+            ...task,
+        };
+        this.running[task.type] = [];
+        this.stats[task.type] = { requested: 0, sent: 0, deferred: 0, cancelled: 0, dropped: 0, done: 0 };
+        return this;
+    }
+
+    // options: { metadata, input, ...anything the task's handlers need }
+    request(type, options = {}) {
+        if (!this.tasks[type]) return null;
+        const request = { type, key: String(++this.nextKey), options, responseId: null, cancelled: false };
+        this.stats[type].requested++;
+        this.queue.push(request);
+        this.drain();
+        return request;
+    }
+
+    drain() {
+        const streaming = this.mainResponses.size > 0;
+        const waiting = [];
+        this.queue.sort((a, b) => this.tasks[b.type].priority - this.tasks[a.type].priority);
+        for (const request of this.queue) {
+            const task = this.tasks[request.type];
+            const defer = streaming && task.priority < OOB_PRIORITY.NORMAL;
+            if (defer && !request.deferred) {
+                request.deferred = true;
+                this.stats[request.type].deferred++;
+            }
+            if (defer || this.running[request.type].length >= task.maxConcurrent) {
+                waiting.push(request);
+            } else {
+                this.dispatch(request, task);
+            }
+        }
+        this.queue = waiting;
+    }
+
+    dispatch(request, task) {
+        // The event id comes back on an error event for this response.create
+        request.eventId = "oob_" + request.key;
+        const sent = this.send({
+            type: "response.create",
+            event_id: request.eventId,
+            response: {
+                conversation: "none",
+                metadata: { ...request.options.metadata, type: task.type, oob_key: request.key },
+                modalities: ["text"],
+                input: request.options.input ?? task.input?.(),
+                instructions: task.instructions,
+            }
+        });
+        if (!sent) {
+            this.drop(request);
+            return;
+        }
+        request.started = performance.now();
+        request.timer = setTimeout(() => this.expire(request), task.timeoutMs);
+        this.running[request.type].push(request);
+        this.stats[request.type].sent++;
+    }
+
+    drop(request) {
+        this.stats[request.type].dropped++;
+        this.tasks[request.type].onDropped?.(request);
+    }
+
+    // Take a request off its task's running list; false when it was not there
+    finish(request) {
+        clearTimeout(request.timer);
+        const requests = this.running[request.type];
+        const index = requests.indexOf(request);
+        if (index < 0) return false;
+        requests.splice(index, 1);
+        return true;
+    }
+
+    // No response.done in time: free the slot and cancel the response upstream.
+    // Its response id stays owned so a late response.done is still swallowed.
+    expire(request) {
+        if (!this.finish(request)) return;
+        if (request.responseId) this.send({ type: "response.cancel", response_id: request.responseId });
+        this.drop(request);
+        this.drain();
+    }
+
+    // Drop queued and cancel in-flight requests matching `filter`
+    cancel(filter) {
+        this.queue = this.queue.filter((request) => {
+            if (!filter(request)) return true;
+            this.drop(request);
+            return false;
+        });
+        for (const requests of Object.values(this.running)) {
+            for (const request of requests) {
+                if (request.cancelled || !filter(request)) continue;
+                request.cancelled = true;
+                this.stats[request.type].cancelled++;
+                // Not created upstream yet: cancelled on response.created instead
+                if (request.responseId) this.send({ type: "response.cancel", response_id: request.responseId });
+            }
+        }
+    }
+
+    // Feed every server event through here. Returns true when the event was an
+    // out-of-band task's response.done and has been handled.
+    handle(event) {
+        const response = event.response;
+        const task = this.tasks[response?.metadata?.type];
+        if (event.type === "response.created") {
+            if (task) {
+                this.taskResponses.add(response.id);
+                const request = this.running[task.type].find((r) => r.key === response.metadata.oob_key);
+                if (request) {
+                    request.responseId = response.id;
+                    if (request.cancelled) this.send({ type: "response.cancel", response_id: response.id });
+                }
+            } else {
+                this.mainResponses.add(response.id);
+            }
+        } else if (event.type === "response.done") {
+            if (task) {
+                this.taskResponses.delete(response.id);
+                const request = this.running[task.type].find((r) => r.key === response.metadata.oob_key);
+                // Not running any more: it timed out and has been reported as dropped
+                if (request) {
+                    this.finish(request);
+                    this.stats[task.type].done++;
+                    task.onDone?.(response, request);
+                }
+                this.drain();
+                return true;
+            }
+            this.mainResponses.delete(response.id);
+            this.drain();
+        } else if (event.type === "error") {
+            // A rejected response.create never gets a response.done
+            const eventId = event.error?.event_id;
+            for (const requests of Object.values(this.running)) {
+                const request = requests.find((r) => r.eventId === eventId);
+                if (!request) continue;
+                this.finish(request);
+                this.drop(request);
+                this.drain();
+                break;
+            }
+        } else if (event.type === "input_audio_buffer.speech_started") {
+            this.cancel((request) => this.tasks[request.type].priority < OOB_PRIORITY.NORMAL);
+        }
+
+        // A request already waiting reads its input when sent, so it covers this event too
+        for (const candidate of Object.values(this.tasks)) {
+            if (!candidate.triggers.includes(event.type) || (candidate.when && !candidate.when(event))) continue;
+            if (!this.queue.some((request) => request.type === candidate.type)) this.request(candidate.type);
+        }
+        return false;
+    }
+
+    // The session these responses lived in is gone (rollover): forget what was
+    // in flight and report it as dropped; queued requests stay queued
+    abandon() {
+        for (const requests of Object.values(this.running)) {
+            for (const request of requests.splice(0)) {
+                clearTimeout(request.timer);
+                this.drop(request);
+            }
+        }
+        this.mainResponses.clear();
+        this.taskResponses.clear();
+        this.drain();
+    }
+
+    // Whether a response id belongs to an out-of-band task in progress
+    owns(responseId) {
+        return this.taskResponses.has(responseId);
+    }
+
+    summary() {
+        return Object.entries(this.stats)
+            .filter(([, s]) => s.requested)
+            .map(([type, s]) => `${type}: ${s.sent} sent, ${s.deferred} deferred, ${s.cancelled} cancelled, ${s.dropped} dropped`)
+            .join("; ");
+    }
+}
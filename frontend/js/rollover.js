@@ -0,0 +1,366 @@
+// Seamless handover to a fresh Realtime session before the 30-minute limit.
+//
+// Some time before the live session expires, a standby peer connection is
+// negotiated in the background (same connect mode as the page, with the
+// server letting the successor in past the capacity caps), and the new
+// session is seeded with the recent conversation as text items, preceded by
+// the page's rolling summary when it has one. Once the standby is ready, the
+// microphone and the page's event handling move over at the next quiet
+// moment (nobody speaking, no response streaming or playing) and the old
+// connection is closed. If no quiet moment comes before the deadline, the
+// switch happens anyway.
+//
+// Preparing a standby gets at most retryMs (less when the live session's
+// limit is closer); failing or running out of time drops it and tries again
+// retryMs later, or once right away when the deadline has already passed.
+//
+// Spoken user turns are only carried over when the session transcribes input.
+const ROLLOVER_DEFAULTS = {
+    afterMs: 27 * 60 * 1000,
+    deadlineMs: 29.5 * 60 * 1000,
+    quietMs: 600,
+    seedItems: 12,
+    seedChars: 6000,
+    iceDeadlineMs: 300,
+    retryMs: 30 * 1000,
+    limitMs: 30 * 60 * 1000,
+    tokenUrl: "/session",
+};
+
+class SessionRollover {
+    // options: ROLLOVER_DEFAULTS plus
+    //   mode         the page's connect mode (server, fast, classic)
+    //   tokenUrl     where the direct modes get a token (the page's /session with its preset)
+    //   sendOffer    the page's sendOffer({ key, url, sdp }, headers) -> Response
+    //   live()       the current { pc, dc }
+    //   summary()    optional text summary of the conversation before the seeded items
+    //   onSwitch(pc, dc, idMap)  adopt the new connection; idMap maps old item ids to seeded ones
+    //   log(line)    log sink
+    constructor(options) {
+        Object.assign(this, ROLLOVER_DEFAULTS, options);
+        this.history = [];
+        this.transcripts = new TranscriptAssembler();
+        this.responses = new Set();
+        this.speaking = false;
+        this.playing = false;
+        this.lastActivity = performance.now();
+        this.standby = null;
+        this.state = "idle";
+        this.overdue = false;
+        this.retriedOverdue = false;
+        this.armedAt = performance.now();
+        this.timers = [];
+        this.stats = { rollovers: 0, forced: 0, failed: 0 };
+    }
+
+    // Start counting towards the next rollover (at connect and after each switch)
+    arm() {
+        this.clearTimers();
+        this.state = "armed";
+        this.overdue = false;
+        this.retriedOverdue = false;
+        this.armedAt = performance.now();
+        this.timers.push(setTimeout(() => this.prepare(), this.afterMs));
+        this.timers.push(setTimeout(() => this.force(), this.deadlineMs));
+    }
+
+    stop() {
+        this.clearTimers();
+        this.state = "idle";
+        this.dropStandby();
+    }
+
+    clearTimers() {
+        this.timers.forEach((timer) => clearTimeout(timer));
+        clearInterval(this.quietTimer);
+        this.timers = [];
+        this.quietTimer = null;
+    }
+
+    // Feed every event of the live session through here
+    observe(event) {
+        switch (event.type) {
+            case "conversation.item.created":
+                this.remember(event.item);
+                break;
+            case "conversation.item.deleted":
+                this.history = this.history.filter((entry) => entry.id !== event.item_id);
+                break;
+            case "input_audio_buffer.speech_started":
+                this.speaking = true;
+                break;
+            case "input_audio_buffer.speech_stopped":
+                this.speaking = false;
+                break;
+            case "response.created":
+                this.responses.add(event.response.id);
+                break;
+            case "response.done":
+                this.responses.delete(event.response.id);
+                break;
+            case "output_audio_buffer.started":
+                this.playing = true;
+                break;
+            case "output_audio_buffer.stopped":
+            case "output_audio_buffer.cleared":
+                this.playing = false;
+                break;
+            default:
+                for (const turn of this.transcripts.feed(event)) this.transcribed(turn);
+                return;
+        }
+        this.lastActivity = performance.now();
+    }
+
+    remember(item) {
+        if (item.type !== "message" || item.role === "system") return;
+        const text = (item.content || []).map((part) => part.text || part.transcript || "").join("");
+        this.history.push({ id: item.id, role: item.role, text });
+        // Only the newest items are ever seeded
+        if (this.history.length > this.seedItems * 2) this.history.shift();
+    }
+
+    // Fill in items whose text arrived as a transcript. Out-of-band outputs
+    // are not conversation items, so they never match an entry.
+    transcribed(turn) {
+        const entry = this.history.find((candidate) => candidate.id === turn.item_id);
+        if (entry && turn.text) entry.text = turn.text;
+    }
+
+    quiet() {
+        return !this.speaking && !this.playing && this.responses.size === 0 &&
+            performance.now() - this.lastActivity >= this.quietMs;
+    }
+
+    // Time left before the live session hits its limit
+    timeLeft() {
+        return this.limitMs - (performance.now() - this.armedAt);
+    }
+
+    // Negotiate and seed the standby session, then wait for a quiet moment
+    async prepare() {
+        if (this.state !== "armed") return;
+        this.state = "preparing";
+        const started = performance.now();
+        const pc = new RTCPeerConnection();
+        const dc = pc.createDataChannel("oai-events");
+        // Sends nothing until the switch, so the new session cannot hear the user early
+        const transceiver = pc.addTransceiver("audio", { direction: "sendrecv" });
+        pc.ontrack = (event) => {
+            const audioEl = document.createElement("audio");
+            audioEl.autoplay = true;
+            audioEl.srcObject = event.streams[0];
+        };
+        const standby = { pc, dc, sender: transceiver.sender, idMap: new Map(), pending: new Set() };
+        this.standby = standby;
+
+        const opened = new Promise((resolve, reject) => {
+            dc.addEventListener("open", resolve, { once: true });
+            pc.addEventListener("connectionstatechange", () => {
+                if (pc.connectionState !== "failed") return;
+                reject(new Error("standby connection failed"));
+                // Already seeded and waiting for a pause: give it up too
+                if (this.state === "ready" && this.standby === standby) this.failed("standby connection failed");
+            });
+        });
+        // Rejections after negotiate() failed, or once the standby is ready, are handled above
+        opened.catch(() => {});
+
+        const steps = (async () => {
+            await this.negotiate(pc);
+            await opened;
+            await this.seed(standby);
+        })();
+        // Still settles after a timeout, on the dropped standby
+        steps.catch(() => {});
+        const timeoutMs = Math.max(0, Math.min(this.retryMs, this.timeLeft()));
+        let timer = null;
+        const timeout = new Promise((resolve, reject) => {
+            timer = setTimeout(() => reject(new Error(`not ready within ${Math.round(timeoutMs)} ms`)), timeoutMs);
+        });
+        try {
+            await Promise.race([steps, timeout]);
+        } catch (err) {
+            // Stopped meanwhile (disconnect): nothing to report
+            if (this.state !== "preparing" || this.standby !== standby) return;
+            this.failed(err);
+            return;
+        } finally {
+            clearTimeout(timer);
+        }
+        if (this.state !== "preparing") return;
+        this.state = "ready";
+        const readyMs = Math.round(performance.now() - started);
+        Telemetry.record("rollover", readyMs, { mode: this.mode });
+        if (this.overdue) {
+            this.switchOver(true);
+            return;
+        }
+        this.log(`[INFO] Next session ready in ${readyMs} ms; switching at the next pause.`);
+        this.quietTimer = setInterval(() => {
+            if (this.quiet()) this.switchOver(false);
+        }, 100);
+    }
+
+    // Drop the standby, keep the live session and try again while there is
+    // time: after retryMs, or once right away past the deadline
+    failed(err) {
+        this.stats.failed++;
+        this.log("[WARN] Session rollover could not prepare the next session: " + err);
+        clearInterval(this.quietTimer);
+        this.quietTimer = null;
+        this.dropStandby();
+        this.state = "armed";
+        if (!this.overdue) {
+            this.timers.push(setTimeout(() => this.prepare(), this.retryMs));
+        } else if (!this.retriedOverdue && this.timeLeft() > 0) {
+            this.retriedOverdue = true;
+            this.log("[INFO] Past the rollover deadline: retrying once.");
+            this.timers.push(setTimeout(() => this.prepare(), 0));
+        }
+    }
+
+    async negotiate(pc) {
+        const offer = await pc.createOffer();
+        await pc.setLocalDescription(offer);
+        const sdp = await waitForIceGathering(pc, this.iceDeadlineMs);
+        const headers = { ...SessionLease.headers(), "X-Session-Replaces": SessionLease.lease || "" };
+
+        let key = null;
+        let url = null;
+        if (this.mode !== "server") {
+            const tokenResp = await fetch(this.tokenUrl, { headers });
+            const tokenData = await tokenResp.json();
+            if (!tokenResp.ok || tokenData.error) throw new Error(tokenData.error || `HTTP ${tokenResp.status}`);
+            this.holdLease(tokenData.lease_id);
+            key = tokenData.client_secret.value;
+            url = tokenData.realtime_url;
+        }
+        const sdpResponse = await this.sendOffer({ key, url, sdp }, headers);
+        if (!sdpResponse.ok) throw new Error(await sdpResponse.text());
+        if (this.mode === "server") this.holdLease(sdpResponse.headers.get("X-Session-Lease"));
+        await pc.setRemoteDescription({ type: "answer", sdp: await sdpResponse.text() });
+    }
+
+    // Renew the standby's lease with the live one, unless rollover was stopped meanwhile
+    holdLease(lease) {
+        if (this.state === "preparing") SessionLease.hold(lease);
+        else SessionLease.give(lease);
+    }
+
+    // Recreate the newest turns (and the summary) in the standby session
+    seed(standby) {
+        const dc = standby.dc;
+        const entries = [];
+        let chars = 0;
+        for (let i = this.history.length - 1; i >= 0 && entries.length < this.seedItems; i--) {
+            const entry = this.history[i];
+            if (!entry.text) continue;
+            chars += entry.text.length;
+            if (entries.length && chars > this.seedChars) break;
+            entries.unshift(entry);
+        }
+        const prefix = "seed_" + Date.now().toString(36) + "_";
+        const items = [];
+        const summary = this.summary?.();
+        if (summary) {
+            items.push({
+                id: prefix + "summary",
+                type: "message",
+                role: "system",
+                content: [{ type: "input_text", text: "Summary of the earlier conversation: " + summary }],
+            });
+        }
+        entries.forEach((entry, index) => {
+            const id = prefix + index;
+            standby.idMap.set(entry.id, id);
+            items.push({
+                id,
+                type: "message",
+                role: entry.role,
+                content: [{ type: entry.role === "user" ? "input_text" : "text", text: entry.text }],
+            });
+        });
+
+        const pending = standby.pending;
+        return new Promise((resolve, reject) => {
+            const onMessage = (e) => {
+                let event;
+                try {
+                    event = JSON.parse(e.data);
+                } catch {
+                    return;
+                }
+                Journal.record("in", event);
+                if (event.type === "conversation.item.created") pending.delete(event.item.id);
+                if (event.type === "error") {
+                    dc.removeEventListener("message", onMessage);
+                    reject(new Error(event.error?.message || "seeding failed"));
+                    return;
+                }
+                if (pending.size === 0) {
+                    dc.removeEventListener("message", onMessage);
+                    resolve();
+                }
+            };
+            dc.addEventListener("message", onMessage);
+            items.forEach((item) => {
+                pending.add(item.id);
+                const event = { type: "conversation.item.create", item };
+                dc.send(JSON.stringify(event));
+                Journal.record("out", event);
+            });
+            if (items.length === 0) {
+                dc.removeEventListener("message", onMessage);
+                resolve();
+            }
+        });
+    }
+
+    // Deadline reached: switch now, or as soon as the standby is ready
+    force() {
+        this.overdue = true;
+        if (this.state === "ready") {
+            this.switchOver(true);
+        } else if (this.state !== "preparing") {
+            this.log("[WARN] Session rollover deadline reached without a standby session.");
+        }
+    }
+
+    switchOver(forced) {
+        if (this.state !== "ready") return;
+        const { pc, dc, sender, idMap } = this.standby;
+        const old = this.live();
+        const oldSender = old.pc?.getSenders().find((candidate) => candidate.track && candidate.track.kind === "audio");
+        const mic = oldSender ? oldSender.track : null;
+
+        this.standby = null;
+        sender.replaceTrack(mic);
+        if (oldSender) oldSender.replaceTrack(null);
+        SessionLease.promote();
+        this.onSwitch(pc, dc, idMap);
+        if (old.dc) old.dc.close();
+        if (old.pc) old.pc.close();
+
+        // The new session starts out with only the seeded items
+        this.history = this.history.filter((entry) => idMap.has(entry.id))
+            .map((entry) => ({ ...entry, id: idMap.get(entry.id) }));
+        this.transcripts = new TranscriptAssembler();
+        this.responses.clear();
+        this.speaking = false;
+        this.playing = false;
+        this.stats.rollovers++;
+        if (forced) this.stats.forced++;
+        this.log(`[INFO] Switched to a fresh session${forced ? " at the deadline" : " during a pause"} ` +
+            `(${idMap.size} items carried over).`);
+        this.arm();
+    }
+
+    dropStandby() {
+        if (!this.standby) return;
+        this.standby.dc.close();
+        this.standby.pc.close();
+        this.standby = null;
+        SessionLease.release();
+    }
+}
@@ -0,0 +1,117 @@
+// Session lease kept with the server's session registry (sessions.py).
+// /session and /connect hand out a lease id with every session; while the
+// call is up it is renewed with a heartbeat, and it is given back with a
+// beacon on disconnect or when the tab goes away. When the server is at
+// capacity it answers with a queue ticket, which is sent along on the retry
+// to keep the page's place in line. During a session rollover (rollover.js)
+// the next session's lease is held as a standby and renewed alongside.
+const SessionLease = {
+    userId: null,
+    lease: null,
+    standby: null,
+    ticket: null,
+    heartbeatMs: 15000,
+    timer: null,
+
+    // A stable random id per browser, used for the per-user session cap
+    user() {
+        if (!this.userId) {
+            try {
+                this.userId = localStorage.getItem("realtime_user_id");
+                if (!this.userId) {
+                    this.userId = crypto.randomUUID();
+                    localStorage.setItem("realtime_user_id", this.userId);
+                }
+            } catch {
+                this.userId = crypto.randomUUID();
+            }
+        }
+        return this.userId;
+    },
+
+    headers() {
+        const headers = { "X-User-Id": this.user() };
+        if (this.ticket) headers["X-Session-Ticket"] = this.ticket;
+        return headers;
+    },
+
+    // Remember a queue ticket from a rejected request; returns a status line
+    queued(errData) {
+        if (!errData.queued) return "Server busy, retrying shortly...";
+        this.ticket = errData.ticket;
+        const seconds = Math.ceil(errData.estimated_wait_ms / 1000);
+        return `Waiting for a free session: position ${errData.position}, about ${seconds} s`;
+    },
+
+    // Hold `lease` and renew it while alive() says the call is still up
+    open(lease, alive) {
+        this.close();
+        this.ticket = null;
+        if (!lease) return;
+        this.lease = lease;
+        this.timer = setInterval(() => {
+            if (!alive()) {
+                this.close();
+                return;
+            }
+            if (this.lease) this.heartbeat(this.lease);
+            if (this.standby) this.heartbeat(this.standby);
+        }, this.heartbeatMs);
+    },
+
+    heartbeat(lease) {
+        fetch("/session/heartbeat", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ lease }),
+        })
+            .then((response) => {
+                // Reaped or closed server-side: nothing left to renew
+                if (response.status !== 404) return;
+                if (lease === this.lease) this.lease = null;
+                else if (lease === this.standby) this.standby = null;
+            })
+            .catch(() => {});
+    },
+
+    // Renew the next session's lease too until it takes over
+    hold(lease) {
+        this.release();
+        this.standby = lease;
+    },
+
+    // The standby session took over: return the old lease, keep renewing the new one
+    promote() {
+        const old = this.lease;
+        this.lease = this.standby;
+        this.standby = null;
+        this.give(old);
+    },
+
+    release() {
+        this.give(this.standby);
+        this.standby = null;
+    },
+
+    give(lease) {
+        if (!lease) return;
+        const body = new Blob([JSON.stringify({ lease })], { type: "application/json" });
+        if (!navigator.sendBeacon || !navigator.sendBeacon("/session/close", body)) {
+            fetch("/session/close", { method: "POST", body, keepalive: true }).catch(() => {});
+        }
+    },
+
+    stop() {
+        clearInterval(this.timer);
+        this.timer = null;
+        this.lease = null;
+    },
+
+    close() {
+        this.give(this.lease);
+        this.release();
+        this.stop();
+    }
+};
+
+window.addEventListener("pagehide", () => SessionLease.close());
@@ -0,0 +1,94 @@
+// Batched client telemetry: timings are queued and POSTed to /telemetry in
+// batches, with a final sendBeacon flush when the page is hidden.
+const Telemetry = {
+    queue: [],
+    maxQueue: 200,
+    maxBatch: 50,
+    flushDelayMs: 5000,
+    timer: null,
+
+    record(phase, ms, labels = {}) {
+        if (this.queue.length >= this.maxQueue) this.queue.shift();
+        this.queue.push({ phase, ms, ...labels });
+        if (this.queue.length >= this.maxBatch) {
+            this.flush();
+        } else if (!this.timer) {
+            this.timer = setTimeout(() => this.flush(), this.flushDelayMs);
+        }
+    },
+
+    flush(useBeacon = false) {
+        clearTimeout(this.timer);
+        this.timer = null;
+        while (this.queue.length) {
+            const body = JSON.stringify({ events: this.queue.splice(0, this.maxBatch) });
+            if (useBeacon && navigator.sendBeacon) {
+                navigator.sendBeacon("/telemetry", new Blob([body], { type: "application/json" }));
+            } else {
+                fetch("/telemetry", {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body,
+                    keepalive: true
+                }).catch(() => {});
+            }
+        }
+    }
+};
+
+window.addEventListener("pagehide", () => Telemetry.flush(true));
+
+
+// End-of-turn to first-output latency, labelled with the session preset
+// (presets.py). A spoken turn ends when the user stops talking: the server
+// reports speech_stopped only after the VAD silence window, so that window is
+// taken back off. A typed turn ends when it is sent. The turn is timed to the
+// first model audio played back, or to the first text delta in text-only
+// sessions.
+const TurnLatency = {
+    mode: "server",
+    preset: "",
+    silenceMs: 0,
+    endedAt: null,
+    seen: new Set(),
+
+    start(mode, preset) {
+        this.mode = mode;
+        this.preset = preset;
+        this.silenceMs = 0;
+        this.endedAt = null;
+    },
+
+    turnEnded(offsetMs = 0) {
+        this.endedAt = performance.now() - offsetMs;
+        this.seen.clear();
+    },
+
+    // own: false for events of out-of-band responses, which are not the reply
+    observe(event, own = true) {
+        switch (event.type) {
+            case "session.created":
+            case "session.updated":
+                this.silenceMs = event.session?.turn_detection?.silence_duration_ms || 0;
+                return;
+            case "input_audio_buffer.speech_stopped":
+                this.turnEnded(this.silenceMs);
+                return;
+        }
+        if (this.endedAt === null || !own) return;
+        if (event.type === "output_audio_buffer.started") {
+            this.first("turn_first_audio");
+        } else if (event.type === "response.text.delta") {
+            this.first("turn_first_text");
+        } else if (event.type === "response.done") {
+            this.endedAt = null;
+        }
+    },
+
+    first(phase) {
+        if (this.seen.has(phase)) return;
+        this.seen.add(phase);
+        const ms = Math.max(0, Math.round(performance.now() - this.endedAt));
+        Telemetry.record(phase, ms, { mode: this.mode, preset: this.preset });
+    }
+};
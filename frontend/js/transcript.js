@@ -0,0 +1,81 @@
+// Incremental transcript assembly from streaming delta events (see transcript.py).
+
+// Event type prefix -> [role, kind, field holding the final text on *.done]
+const TRANSCRIPT_STREAMS = {
+    "response.audio_transcript": ["assistant", "audio_transcript", "transcript"],
+    "response.output_audio_transcript": ["assistant", "audio_transcript", "transcript"],
+    "response.text": ["assistant", "text", "text"],
+    "response.output_text": ["assistant", "text", "text"],
+    "conversation.item.input_audio_transcription": ["user", "input_transcription", "transcript"],
+};
+
+// Deltas are appended to per-(item_id, content_index) chunk arrays and joined
+// once on *.done / *.completed, so a turn costs O(total length) with no
+// repeated string concatenation. feed() returns the turns an event completed.
+class TranscriptAssembler {
+    constructor() {
+        this.buffers = new Map();
+    }
+
+    static key(event) {
+        return `${event.item_id}:${event.content_index || 0}`;
+    }
+
+    feed(event) {
+        const type = event.type || "";
+        if (type === "response.done") return this.abandon(event.response || {});
+        const dot = type.lastIndexOf(".");
+        const stream = TRANSCRIPT_STREAMS[type.slice(0, dot)];
+        if (!stream) return [];
+        const suffix = type.slice(dot + 1);
+        const key = TranscriptAssembler.key(event);
+
+        if (suffix === "delta") {
+            let buffer = this.buffers.get(key);
+            if (!buffer) {
+                buffer = { chunks: [], stream, event };
+                this.buffers.set(key, buffer);
+            }
+            buffer.chunks.push(event.delta || "");
+            return [];
+        }
+        if (suffix === "done" || suffix === "completed") {
+            const buffer = this.buffers.get(key);
+            this.buffers.delete(key);
+            const text = event[stream[2]] ?? (buffer ? buffer.chunks.join("") : "");
+            return [TranscriptAssembler.turn(event, stream, text, "completed")];
+        }
+        if (suffix === "failed") this.buffers.delete(key);
+        return [];
+    }
+
+    // Streams of a response that ended (e.g. cancelled because the user started
+    // speaking) before their *.done arrived are emitted as incomplete turns
+    abandon(response) {
+        const turns = [];
+        for (const [key, buffer] of this.buffers) {
+            if (buffer.event.response_id !== response.id) continue;
+            this.buffers.delete(key);
+            turns.push(TranscriptAssembler.turn(buffer.event, buffer.stream, buffer.chunks.join(""), "incomplete"));
+        }
+        return turns;
+    }
+
+    static turn(event, [role, kind], text, status) {
+        return {
+            item_id: event.item_id,
+            content_index: event.content_index || 0,
+            role,
+            kind,
+            text,
+            response_id: event.response_id || null,
+            status,
+        };
+    }
+
+    // Live text of a stream still in progress ("" if unknown)
+    partial(itemId, contentIndex = 0) {
+        const buffer = this.buffers.get(`${itemId}:${contentIndex}`);
+        return buffer ? buffer.chunks.join("") : "";
+    }
+}
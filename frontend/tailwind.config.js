@@ -0,0 +1,13 @@
+// Scans the inline page templates (and shared page scripts) so only the
+// utility classes and DaisyUI components actually used end up in the bundle.
+module.exports = {
+  content: {
+    relative: true,
+    files: ["../*.py", "./js/**/*.js"],
+  },
+  plugins: [require("daisyui")],
+  daisyui: {
+    themes: ["dark"],
+    logs: false,
+  },
+};
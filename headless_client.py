@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Headless asyncio Realtime client for synthetic load on the out-of-band flow.
+
+Mirrors the page logic in 2_out_of_band_responses.py without a browser:
+    1. GET /session from our server for an ephemeral key,
+    2. open the Realtime event channel (WebSocket transport),
+    3. per turn send conversation.item.create + response.create, or stream a
+       PCM16 file through input_audio_buffer.append/commit,
+    4. on conversation.item.created (role "user") classify through our local
+       /classify fast path and fire the out-of-band classification
+       response.create only on escalation, exactly like the page does.
+
+Audio files are read once and streamed as memoryview slices, so chunking never
+copies the sample data. Many sessions run concurrently in one process and every
+turn records time to first delta, to the main response.done and to the
+classification result.
+
+    python headless_client.py --server http://127.0.0.1:8000 --sessions 200 --concurrency 50 --turns 3
+    python headless_client.py --audio speech_24khz_mono.wav --sessions 20
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+import uuid
+import wave
+
+import httpx
+import websockets
+from termcolor import colored
+
+from transcript import TranscriptAssembler
+
+DEFAULT_MODEL = "gpt-4o-realtime-preview-2024-12-17"
+CLASSIFICATION_INSTRUCTIONS = (
+    'Analyze the conversation so far and classify it into exactly one of these categories: "general", '
+    '"philosophical", "math", or "technology". Consider the overall theme and context of the entire '
+    "conversation, not just the latest message. Output only the category name, nothing else. Do not respond "
+    "like normal conversation or with question but only and only the category name."
+)
+DEFAULT_PROMPTS = [
+    "What is the sum of the first ten prime numbers?",
+    "Is free will compatible with a deterministic universe?",
+    "How does a computer compile Python code?",
+    "Tell me something nice about the weekend.",
+]
+# PCM16 mono at 24 kHz, the Realtime API's default input format.
+SAMPLE_RATE = 24000
+BYTES_PER_SAMPLE = 2
+
+
+def load_pcm16(path):
+    """
+    Read a .wav (PCM16) or raw .pcm file once and return a memoryview over it.
+    """
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != BYTES_PER_SAMPLE:
+                raise ValueError(f"{path} is not 16-bit PCM")
+            return memoryview(wav.readframes(wav.getnframes()))
+    with open(path, "rb") as f:
+        return memoryview(f.read())
+
+
+def pcm16_chunks(audio, chunk_ms):
+    """
+    Yield zero-copy memoryview slices of `chunk_ms` milliseconds each.
+    """
+    step = SAMPLE_RATE * BYTES_PER_SAMPLE * chunk_ms // 1000
+    for start in range(0, len(audio), step):
+        yield audio[start:start + step]
+
+
+def realtime_ws_url(api_base, model):
+    base = api_base.rstrip("/")
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    return f"{base}/realtime?model={model}"
+
+
+class Turn:
+    """
+    Timing for one user turn.
+    """
+
+    def __init__(self, index=0):
+        self.index = index
+        self.started = time.perf_counter()
+        self.first_delta = None
+        self.response_done = None
+        self.classified = None
+        self.label = None
+        self.source = None
+        self.classification_tokens = None
+        self.reply = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class SyntheticSession:
+    """
+    One simulated page: token fetch, event channel, turns and OOB classification.
+    """
+
+    def __init__(self, http, ws_url, audio=None, chunk_ms=100, realtime_pace=False, timeout=30, oob_window=8):
+        self.http = http
+        self.ws_url = ws_url
+        self.audio = audio
+        self.chunk_ms = chunk_ms
+        self.realtime_pace = realtime_pace
+        self.oob_window = oob_window
+        self.item_ids = []
+        self.timeout = timeout
+        self.ws = None
+        self.conversation = uuid.uuid4().hex
+        # Its own user, so the server's per-user session cap counts each session once
+        self.user = uuid.uuid4().hex
+        self.lease = None
+        self.pending = {}
+        self.transcripts = TranscriptAssembler()
+        self.oob_responses = set()
+        self.turn = None
+        self.turn_done = None
+        self.classification_done = None
+
+    async def send(self, event):
+        await self.ws.send(json.dumps(event))
+
+    async def open(self):
+        resp = await self.http.get("/session", headers={"X-User-Id": self.user})
+        data = resp.json()
+        if resp.status_code != 200 or "error" in data:
+            raise RuntimeError(f"/session failed: {data}")
+        self.lease = data.get("lease_id")
+        key = data["client_secret"]["value"]
+        self.ws = await websockets.connect(
+            self.ws_url,
+            additional_headers={"Authorization": f"Bearer {key}", "OpenAI-Beta": "realtime=v1"},
+            max_size=None,
+        )
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self.lease is not None:
+            # Give the slot back as the page's disconnect beacon does
+            try:
+                await self.http.post("/session/close", json={"lease": self.lease})
+            except httpx.HTTPError:
+                pass
+            self.lease = None
+
+    async def listen(self):
+        async for raw in self.ws:
+            event = json.loads(raw)
+            kind = event.get("type")
+            turn = self.turn
+            if turn is None:
+                continue
+            response = event.get("response") or {}
+            if kind == "response.created" and (response.get("metadata") or {}).get("type"):
+                self.oob_responses.add(response.get("id"))
+            if event.get("response_id", response.get("id")) not in self.oob_responses:
+                for completed in self.transcripts.feed(event):
+                    if completed["role"] == "assistant":
+                        turn.reply = completed["text"]
+            if kind in ("response.text.delta", "response.audio.delta", "response.audio_transcript.delta"):
+                if turn.first_delta is None:
+                    turn.first_delta = turn.elapsed()
+            elif kind == "conversation.item.created":
+                item = event.get("item", {})
+                if item.get("type") == "message" and self.oob_window:
+                    self.item_ids.append(item["id"])
+                    del self.item_ids[:-self.oob_window]
+                if item.get("role") == "user":
+                    await self.classify(turn, item)
+            elif kind == "response.done":
+                self.oob_responses.discard(response.get("id"))
+                metadata = response.get("metadata") or {}
+                if metadata.get("type") == "classification":
+                    try:
+                        label = response["output"][0]["content"][0]["text"].strip()
+                    except (KeyError, IndexError):
+                        label = None
+                    # A shadow check may finish after the next turn started
+                    owner = self.pending.pop(metadata.get("request_id", ""), turn)
+                    if metadata.get("request_id"):
+                        await self.http.post("/classify/feedback", json={
+                            "request_id": metadata["request_id"],
+                            "label": label or "",
+                            "ms": round(owner.elapsed() * 1000),
+                        })
+                    if owner.classified is None:
+                        owner.classified = owner.elapsed()
+                        owner.label = label
+                        owner.source = "model"
+                        owner.classification_tokens = (response.get("usage") or {}).get("input_tokens")
+                        if owner is turn:
+                            self.classification_done.set()
+                else:
+                    turn.response_done = turn.elapsed()
+                    self.turn_done.set()
+
+    async def classify(self, turn, item):
+        """
+        Same order as the page: local /classify first, the model out-of-band
+        response only on escalation or a shadow check.
+        """
+        text = " ".join(
+            part.get("text") or part.get("transcript") or "" for part in item.get("content", [])
+        ).strip()
+        local = None
+        if text:
+            resp = await self.http.post("/classify", json={
+                "conversation": self.conversation,
+                "items": [{"role": "user", "text": text}],
+            })
+            if resp.status_code == 200:
+                local = resp.json()
+        if local is not None and local["label"]:
+            turn.classified = turn.elapsed()
+            turn.label = local["label"]
+            turn.source = local.get("source", "local")
+            self.classification_done.set()
+        if local is None or local["escalate"] or local["verify"]:
+            request_id = local["request_id"] if local else ""
+            self.pending[request_id] = turn
+            await self.send({
+                "type": "response.create",
+                "response": {
+                    "conversation": "none",
+                    "metadata": {"type": "classification", "request_id": request_id},
+                    "modalities": ["text"],
+                    "instructions": CLASSIFICATION_INSTRUCTIONS,
+                    **self.window_input(),
+                },
+            })
+
+    def window_input(self):
+        """
+        Same bounded context as the page's ContextWindow (item count only).
+        """
+        if not self.oob_window:
+            return {}
+        return {"input": [{"type": "item_reference", "id": item_id} for item_id in self.item_ids[-self.oob_window:]]}
+
+    async def stream_audio(self):
+        for chunk in pcm16_chunks(self.audio, self.chunk_ms):
+            # b64encode reads the memoryview slice directly; no intermediate copy
+            await self.send({"type": "input_audio_buffer.append", "audio": base64.b64encode(chunk).decode("ascii")})
+            if self.realtime_pace:
+                await asyncio.sleep(self.chunk_ms / 1000)
+        await self.send({"type": "input_audio_buffer.commit"})
+
+    async def run_turn(self, prompt, index=0):
+        self.turn = Turn(index)
+        self.turn_done = asyncio.Event()
+        self.classification_done = asyncio.Event()
+        if self.audio is not None:
+            await self.stream_audio()
+        else:
+            await self.send({
+                "type": "conversation.item.create",
+                "item": {"type": "message", "role": "user", "content": [{"type": "input_text", "text": prompt}]},
+            })
+        await self.send({"type": "response.create", "response": {"modalities": ["text"]}})
+        await asyncio.wait_for(
+            asyncio.gather(self.turn_done.wait(), self.classification_done.wait()),
+            self.timeout,
+        )
+        return self.turn
+
+
+async def run_session(http, ws_url, turns, results, **options):
+    session = SyntheticSession(http, ws_url, **options)
+    connect_started = time.perf_counter()
+    try:
+        await session.open()
+        results["connect"].append(time.perf_counter() - connect_started)
+        listener = asyncio.create_task(session.listen())
+        try:
+            for index in range(turns):
+                turn = await session.run_turn(DEFAULT_PROMPTS[index % len(DEFAULT_PROMPTS)], index)
+                results["turns"].append(turn)
+        finally:
+            listener.cancel()
+    except Exception as e:
+        results["errors"].append(f"{type(e).__name__}: {e}")
+    finally:
+        await session.close()
+
+
+def _percentiles(values):
+    ordered = sorted(v for v in values if v is not None)
+    if not ordered:
+        return "n/a"
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000  # noqa: E731
+    return f"p50={pick(0.5):.1f}ms p95={pick(0.95):.1f}ms p99={pick(0.99):.1f}ms (n={len(ordered)})"
+
+
+async def run_load(server, ws_url, sessions, concurrency, turns, **options):
+    """
+    Run `sessions` synthetic sessions, at most `concurrency` at a time.
+    """
+    results = {"connect": [], "turns": [], "errors": []}
+    gate = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=server, limits=limits, timeout=30) as http:
+        async def one():
+            async with gate:
+                await run_session(http, ws_url, turns, results, **options)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(sessions)))
+        results["elapsed"] = time.perf_counter() - started
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic Realtime sessions against the chat server.")
+    parser.add_argument("--server", default="http://127.0.0.1:8000", help="chat server serving /session")
+    parser.add_argument("--api-base", default=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"))
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--audio", help="PCM16 24 kHz mono .wav or raw .pcm to stream per turn")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--realtime-pace", action="store_true", help="send audio no faster than real time")
+    parser.add_argument("--oob-window", type=int, default=8, help="items of context per classification (0 = all)")
+    args = parser.parse_args()
+
+    audio = load_pcm16(args.audio) if args.audio else None
+    ws_url = realtime_ws_url(args.api_base, args.model)
+    print(colored(f"[INFO] {args.sessions} sessions x {args.turns} turns, {args.concurrency} concurrent -> {ws_url}", "cyan"))
+    results = asyncio.run(run_load(
+        args.server, ws_url, args.sessions, args.concurrency, args.turns,
+        audio=audio, chunk_ms=args.chunk_ms, realtime_pace=args.realtime_pace, oob_window=args.oob_window,
+    ))
+
+    turns = results["turns"]
+    print(colored(f"[SUCCESS] {len(turns)} turns in {results['elapsed']:.1f}s", "green"))
+    print(f"  connect (token + channel): {_percentiles(results['connect'])}")
+    print(f"  first delta:               {_percentiles(t.first_delta for t in turns)}")
+    print(f"  response.done:             {_percentiles(t.response_done for t in turns)}")
+    print(f"  classification:            {_percentiles(t.classified for t in turns)}")
+    local = sum(1 for t in turns if t.source == "local")
+    cached = sum(1 for t in turns if t.source == "cache")
+    print(f"  classified locally:        {local}/{len(turns)} (+{cached} from cache)")
+    if results["errors"]:
+        print(colored(f"[ERROR] {len(results['errors'])} sessions failed, e.g. {results['errors'][0]}", "red"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Append-only per-session event journal.
+
+The page forwards selected data channel events to POST /journal in batches
+(frontend/js/journal.js). submit() only validates them and puts them on a
+bounded in-memory queue, so the request path never waits on the disk. A single
+writer task drains the queue and, in a worker thread, serializes the records
+to JSON lines and appends them to the session's open segment through a
+buffered file. A segment is rotated once it grows past a size limit or gets
+older than an age limit; rotated segments are compressed (zstd when the
+`zstandard` package is installed, gzip otherwise) on the same thread.
+
+Journaling is off unless JOURNAL_DIR is set, since the journal holds
+conversation transcripts. A relative JOURNAL_DIR is taken from the repository
+root, not the working directory.
+
+Layout: JOURNAL_DIR/<session>/<opened at>.jsonl while a segment is open, then
+<opened at>.jsonl.zst (or .jsonl.gz) once it has been rotated.
+
+Tunables are read from the environment:
+    JOURNAL_DIR             root directory, e.g. "journal"; empty disables journaling (default empty)
+    JOURNAL_ROTATE_BYTES    segment size that triggers rotation (default 8 MiB)
+    JOURNAL_ROTATE_SECONDS  segment age that triggers rotation (default 300)
+    JOURNAL_COMPRESSION     zstd, gzip or none (default zstd, gzip without zstandard)
+    JOURNAL_QUEUE_MAX       records held in memory before new ones are dropped (default 10000)
+    JOURNAL_FLUSH_INTERVAL  seconds between flushes of buffered writes (default 1)
+    JOURNAL_MAX_OPEN        open segments before the least recently written is rotated (default 256)
+"""
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import asynccontextmanager
+
+import logs
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIRECTORY = os.getenv("JOURNAL_DIR", "")
+if DIRECTORY:
+    DIRECTORY = os.path.join(ROOT, DIRECTORY)
+ROTATE_BYTES = int(os.getenv("JOURNAL_ROTATE_BYTES", str(8 * 1024 * 1024)))
+ROTATE_SECONDS = float(os.getenv("JOURNAL_ROTATE_SECONDS", "300"))
+QUEUE_MAX = int(os.getenv("JOURNAL_QUEUE_MAX", "10000"))
+FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "1"))
+MAX_OPEN = int(os.getenv("JOURNAL_MAX_OPEN", "256"))
+
+# Session ids become directory names, so only a safe alphabet is accepted.
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+DIRECTIONS = {"in", "out"}
+MAX_BATCH = 500
+WRITE_BUFFER = 64 * 1024
+EXTENSIONS = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+
+
+def compression_method(requested=None):
+    """
+    The configured compression, downgraded to gzip when zstandard is missing.
+    """
+    method = (requested or os.getenv("JOURNAL_COMPRESSION", "zstd")).lower()
+    if method not in EXTENSIONS:
+        method = "gzip"
+    if method == "zstd" and zstandard is None:
+        method = "gzip"
+    return method
+
+
+def compress_segment(path, method):
+    """
+    Compress a closed segment next to itself and remove the original.
+    Returns the path of the file that remains.
+    """
+    if method == "none":
+        return path
+    target = path + EXTENSIONS[method]
+    with open(path, "rb") as source:
+        if method == "zstd":
+            with open(target, "wb") as sink:
+                zstandard.ZstdCompressor().copy_stream(source, sink)
+        else:
+            with gzip.open(target, "wb") as sink:
+                shutil.copyfileobj(source, sink)
+    os.remove(path)
+    return target
+
+
+class _Segment:
+    """
+    The open, append-only file currently receiving one session's records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab", buffering=WRITE_BUFFER)
+        self.opened = time.monotonic()
+        self.last_write = self.opened
+        self.bytes = 0
+
+
+class Journal:
+    """
+    Bounded queue in front of a single background writer.
+    """
+
+    def __init__(self, directory=DIRECTORY, compression=None):
+        self.directory = directory
+        self.compression = compression_method(compression)
+        self.queue = asyncio.Queue(maxsize=QUEUE_MAX)
+        self._segments = {}
+        self._task = None
+        self._busy = None
+        self._last_flush = time.monotonic()
+
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.client_dropped = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.segments_opened = 0
+        self.segments_rotated = 0
+        self.write_seconds_total = 0.0
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def submit(self, payload):
+        """
+        Validate and enqueue one /journal batch without touching the disk;
+        returns how many events were accepted. Raises ValueError for a
+        malformed batch.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("expected a JSON object")
+        session = payload.get("session")
+        if not isinstance(session, str) or not SESSION_ID.match(session):
+            raise ValueError("session must be 1-64 characters of [A-Za-z0-9_-]")
+        events = payload.get("events")
+        if not isinstance(events, list):
+            raise ValueError("events must be a list")
+        if not self.enabled:
+            return 0
+
+        received_at = time.time()
+        records = []
+        # Gaps the page had to make in its own bounded buffer stay visible
+        client_dropped = payload.get("dropped")
+        if type(client_dropped) is int and client_dropped > 0:
+            self.client_dropped += client_dropped
+            records.append({"received_at": received_at, "session": session, "dropped": client_dropped})
+        for entry in events[:MAX_BATCH]:
+            event = entry.get("event") if isinstance(entry, dict) else None
+            if (not isinstance(event, dict) or not isinstance(event.get("type"), str)
+                    or entry.get("dir", "in") not in DIRECTIONS):
+                self.rejected += 1
+                continue
+            records.append({
+                "received_at": received_at,
+                "session": session,
+                "dir": entry.get("dir", "in"),
+                "t": entry.get("t"),
+                "event": event,
+            })
+        self.rejected += max(0, len(events) - MAX_BATCH)
+
+        accepted = 0
+        for record in records:
+            try:
+                self.queue.put_nowait(record)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                continue
+            if "event" in record:
+                accepted += 1
+        self.accepted += accepted
+        return accepted
+
+    def _segment(self, session):
+        segment = self._segments.get(session)
+        if segment is not None:
+            return segment
+        if len(self._segments) >= MAX_OPEN:
+            self._rotate(min(self._segments, key=lambda s: self._segments[s].last_write))
+        folder = os.path.join(self.directory, session)
+        os.makedirs(folder, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f".{int(now * 1000) % 1000:03d}Z"
+        path = os.path.join(folder, stamp + ".jsonl")
+        serial = 0
+        while any(os.path.exists(path + ext) for ext in EXTENSIONS.values()):
+            serial += 1
+            path = os.path.join(folder, f"{stamp}-{serial}.jsonl")
+        segment = self._segments[session] = _Segment(path)
+        self.segments_opened += 1
+        return segment
+
+    def _rotate(self, session):
+        segment = self._segments.pop(session)
+        segment.file.close()
+        try:
+            compress_segment(segment.path, self.compression)
+        except OSError as e:
+            logs.error(f"Journal compression failed for {segment.path}: {str(e)}")
+        self.segments_rotated += 1
+
+    def _write(self, records, final=False):
+        """
+        Append records to their sessions' segments, then flush and rotate as
+        due. Runs on a worker thread; only the writer task calls it.
+        """
+        started = time.perf_counter()
+        lines = {}
+        for record in records:
+            line = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+            lines.setdefault(record["session"], []).append(line)
+        now = time.monotonic()
+        for session, chunk in lines.items():
+            segment = self._segment(session)
+            data = b"".join(chunk)
+            segment.file.write(data)
+            segment.bytes += len(data)
+            segment.last_write = now
+            self.written += len(chunk)
+            self.bytes_written += len(data)
+            if segment.bytes >= ROTATE_BYTES:
+                self._rotate(session)
+
+        if final or now - self._last_flush >= FLUSH_INTERVAL:
+            self._last_flush = now
+            for session, segment in list(self._segments.items()):
+                if final or now - segment.opened >= ROTATE_SECONDS:
+                    self._rotate(session)
+                else:
+                    segment.file.flush()
+        self.write_seconds_total += time.perf_counter() - started
+
+    def _drain(self):
+        records = []
+        while not self.queue.empty():
+            records.append(self.queue.get_nowait())
+        return records
+
+    async def _run(self):
+        while True:
+            try:
+                records = [await asyncio.wait_for(self.queue.get(), FLUSH_INTERVAL)]
+            except asyncio.TimeoutError:
+                records = []
+            records += self._drain()
+            # Shielded so a cancelled writer never leaves a half-done write behind
+            self._busy = asyncio.ensure_future(asyncio.to_thread(self._write, records))
+            try:
+                await asyncio.shield(self._busy)
+            except Exception as e:
+                logs.error(f"Journal write failed: {str(e)}")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the writer, write out whatever is still queued and rotate every
+        open segment.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._busy is not None:
+            try:
+                await self._busy
+            except Exception:
+                pass
+        await asyncio.to_thread(self._write, self._drain(), True)
+
+    def stats(self):
+        """
+        Counters for journal throughput and loss.
+        """
+        return {
+            "enabled": self.enabled,
+            "compression": self.compression,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "client_dropped": self.client_dropped,
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "queue_depth": self.queue.qsize(),
+            "open_segments": len(self._segments),
+            "segments_opened": self.segments_opened,
+            "segments_rotated": self.segments_rotated,
+            "write_seconds_total": round(self.write_seconds_total, 6),
+        }
+
+
+store = Journal()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Run the writer task for the app's lifetime and close the journal on exit.
+    """
+    store.start()
+    try:
+        yield
+    finally:
+        await store.stop()
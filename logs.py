@@ -0,0 +1,307 @@
+"""
+Non-blocking structured logging for the app servers.
+
+info(), success(), warning() and error() only build a record and put it on a
+bounded in-memory queue; a writer thread drains the queue and writes the lines
+to stdout in batches, so a slow terminal or a full pipe never stalls the event
+loop. When the queue is full, records are dropped and counted rather than
+waited for.
+
+install(app) gives every request an id (the caller's X-Request-Id when it is
+well formed, a fresh one otherwise, echoed back in the response), attaches it
+to every record logged while the request is handled, and emits one access
+record per request with the route, status, duration and the time spent in
+upstream calls (reported by upstream.py through annotate()). Access records
+for high-volume routes can be sampled; server errors are always kept, and
+sampled records carry their sample rate so counts can be scaled back up.
+
+Records are JSON lines, or the familiar colored [INFO] lines for interactive
+development:
+    {"ts": 1760000000.123, "level": "info", "msg": "request", "request_id": "...",
+     "method": "GET", "route": "/session", "status": 200, "duration_ms": 41.2,
+     "upstream_ms": 38.7, "upstream_status": 200}
+
+Tunables are read from the environment:
+    LOG_FORMAT     json, color, or auto: color on a terminal, json otherwise (default auto)
+    LOG_LEVEL      info, warning or error (default info)
+    LOG_ACCESS     1 to emit a record per request (default 1)
+    LOG_SAMPLE     route=rate pairs for access records
+                   (default "/static/{name}=0.01,/telemetry=0.1,/journal=0.1,/session/heartbeat=0.1,/metrics=0.1")
+    LOG_QUEUE_MAX  records held in memory before new ones are dropped (default 10000)
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from termcolor import colored
+
+DEFAULT_SAMPLE = "/static/{name}=0.01,/telemetry=0.1,/journal=0.1,/session/heartbeat=0.1,/metrics=0.1"
+LEVELS = {"info": 20, "success": 20, "warning": 30, "error": 40}
+# Tag and color of each level in color mode, as the apps printed them before.
+STYLES = {
+    "info": ("INFO", "cyan"),
+    "success": ("SUCCESS", "green"),
+    "warning": ("WARN", "yellow"),
+    "error": ("ERROR", "red"),
+}
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+MAX_BATCH = 1000
+
+
+def parse_sample(spec):
+    """
+    Parse "route=rate,..." into {route: rate}; malformed pairs are skipped.
+    """
+    rates = {}
+    for pair in spec.split(","):
+        route, _, rate = pair.strip().rpartition("=")
+        try:
+            rates[route] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    rates.pop("", None)
+    return rates
+
+
+def _format():
+    requested = os.getenv("LOG_FORMAT", "auto").lower()
+    if requested in ("json", "color"):
+        return requested
+    return "color" if sys.stdout.isatty() else "json"
+
+
+# The current request's id and access-record fields, set by the middleware.
+_request = contextvars.ContextVar("request", default=None)
+
+
+class Logger:
+    """
+    Bounded queue in front of a single stdout writer thread.
+    """
+
+    def __init__(self, stream=None, fmt=None, level=None, queue_max=None):
+        self.stream = stream
+        self.format = fmt or _format()
+        self.level = LEVELS.get((level or os.getenv("LOG_LEVEL", "info")).lower(), LEVELS["info"])
+        self.access = os.getenv("LOG_ACCESS", "1") == "1"
+        self.sample = parse_sample(os.getenv("LOG_SAMPLE", DEFAULT_SAMPLE))
+        self.queue = queue.Queue(maxsize=queue_max or int(os.getenv("LOG_QUEUE_MAX", "10000")))
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def log(self, level, message, **fields):
+        """
+        Queue one record; never blocks. Extra keyword arguments become
+        fields of the JSON record.
+        """
+        if LEVELS[level] < self.level:
+            return
+        record = {"ts": time.time(), "level": level, "msg": message}
+        current = _request.get()
+        if current is not None:
+            record["request_id"] = current["id"]
+        record.update(fields)
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.emitted += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def render(self, record):
+        """
+        One output line (without the newline) for a record.
+        """
+        if self.format == "json":
+            return json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str)
+        tag, color = STYLES[record["level"]]
+        if record["msg"] == "request":
+            text = f"{record['method']} {record['route']} {record['status']} {record['duration_ms']} ms"
+            if "upstream_ms" in record:
+                text += f" (upstream {record['upstream_ms']} ms)"
+        else:
+            text = record["msg"]
+        if "request_id" in record:
+            text += f" [{record['request_id']}]"
+        return colored(f"[{tag}] {text}", color)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            records = [self.queue.get()]
+            while len(records) < MAX_BATCH:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if records[-1] is None:
+                stopping = True
+                records.pop()
+            lines = []
+            for record in records:
+                try:
+                    lines.append(self.render(record) + "\n")
+                except Exception:
+                    self.dropped += 1
+            stream = self.stream or sys.stdout
+            try:
+                stream.write("".join(lines))
+                stream.flush()
+            except (OSError, ValueError):
+                self.dropped += len(lines)
+                continue
+            self.written += len(lines)
+
+    def close(self, timeout=2.0):
+        """
+        Write out what is queued and stop the writer thread.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """
+        Counters for logging throughput and loss.
+        """
+        return {
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "queue_depth": self.queue.qsize(),
+        }
+
+
+logger = Logger()
+
+
+def info(message, **fields):
+    logger.log("info", message, **fields)
+
+
+def success(message, **fields):
+    logger.log("success", message, **fields)
+
+
+def warning(message, **fields):
+    logger.log("warning", message, **fields)
+
+
+def error(message, **fields):
+    logger.log("error", message, **fields)
+
+
+def annotate(**fields):
+    """
+    Add fields to the current request's access record; no-op outside a request.
+    """
+    current = _request.get()
+    if current is not None:
+        current["fields"].update(fields)
+
+
+def request_id():
+    """
+    The id of the request being handled, or None.
+    """
+    current = _request.get()
+    return current["id"] if current is not None else None
+
+
+class RequestLogMiddleware:
+    """
+    Plain ASGI middleware, so the per-request cost stays a few microseconds
+    (FastAPI's @app.middleware("http") runs each request in an extra task).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = ""
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                incoming = value.decode("latin-1")
+                break
+        current = {
+            "id": incoming if REQUEST_ID.match(incoming) else uuid.uuid4().hex[:16],
+            "fields": {},
+        }
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (REQUEST_ID_HEADER, current["id"].encode())]
+            await send(message)
+
+        token = _request.set(current)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if logger.access:
+                _access(scope, current, status, time.perf_counter() - started)
+            _request.reset(token)
+
+
+def install(app):
+    """
+    Assign request ids and emit (sampled) access records.
+    """
+    app.add_middleware(RequestLogMiddleware)
+
+
+def _access(scope, current, status, seconds):
+    # The matched route template keeps /static/{name} one route, not one per file
+    route = getattr(scope.get("route"), "path", None) or scope["path"]
+    rate = logger.sample.get(route, 1.0)
+    if status < 500 and rate < 1.0:
+        if random.random() >= rate:
+            logger.sampled_out += 1
+            return
+    fields = {
+        "method": scope["method"],
+        "route": route,
+        "status": status,
+        "duration_ms": round(seconds * 1000, 2),
+        **current["fields"],
+    }
+    if status < 500 and rate < 1.0:
+        fields["sample_rate"] = rate
+    level = "error" if status >= 500 else "warning" if status >= 400 else "info"
+    logger.log(level, "request", **fields)
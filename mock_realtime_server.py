@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI Realtime API, for offline load and latency tests.
+
+Implements:
+    POST /v1/realtime/sessions   ephemeral session with client_secret/expires_at
+    POST /v1/realtime?model=...  canned SDP answer (signaling only, no media)
+    WS   /v1/realtime?model=...  the realtime event protocol: session.created,
+                                 session.update, conversation.item.create,
+                                 input_audio_buffer.append/commit/clear,
+                                 response.create (incl. conversation "none" +
+                                 metadata), response.cancel, response.done
+
+Latency and failures are injectable through the environment or CLI flags:
+    MOCK_LATENCY_MS      mean added latency per REST call / response (default 50)
+    MOCK_JITTER_MS       uniform +/- jitter on that latency (default 20)
+    MOCK_ERROR_RATE      fraction of REST calls answered with a 500 (default 0)
+    MOCK_RATE_LIMIT_RATE fraction of REST calls answered with a 429 (default 0)
+    MOCK_TOKEN_TTL       seconds until an ephemeral key expires (default 60)
+    MOCK_PREFILL_US_PER_TOKEN
+                         extra response latency per input token (default 0),
+                         so cost grows with the context a response sees
+
+Point the app at it with:
+    python mock_realtime_server.py --port 8001
+    OPENAI_API_BASE=http://127.0.0.1:8001/v1 OPENAI_API_KEY=test python 2_out_of_band_responses.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+import uvicorn
+from termcolor import colored
+
+
+class MockConfig:
+    latency_ms = float(os.getenv("MOCK_LATENCY_MS", "50"))
+    jitter_ms = float(os.getenv("MOCK_JITTER_MS", "20"))
+    error_rate = float(os.getenv("MOCK_ERROR_RATE", "0"))
+    rate_limit_rate = float(os.getenv("MOCK_RATE_LIMIT_RATE", "0"))
+    token_ttl = int(os.getenv("MOCK_TOKEN_TTL", "60"))
+    prefill_us_per_token = float(os.getenv("MOCK_PREFILL_US_PER_TOKEN", "0"))
+
+
+CATEGORY_KEYWORDS = {
+    "math": ("math", "equation", "integral", "prime", "number", "algebra", "calculate", "sum"),
+    "technology": ("computer", "software", "code", "python", "artificial intelligence", "internet", "phone", "robot"),
+    "philosophical": ("meaning", "life", "conscious", "free will", "ethics", "exist", "truth", "moral"),
+}
+
+SDP_ANSWER = (
+    "v=0\r\n"
+    "o=- 0 0 IN IP4 127.0.0.1\r\n"
+    "s=mock-realtime\r\n"
+    "t=0 0\r\n"
+    "a=ice-lite\r\n"
+    "m=audio 9 UDP/TLS/RTP/SAVPF 111\r\n"
+    "c=IN IP4 127.0.0.1\r\n"
+    "a=rtpmap:111 opus/48000/2\r\n"
+    "a=setup:passive\r\n"
+    "a=mid:0\r\n"
+    "a=sendrecv\r\n"
+)
+
+app = FastAPI()
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+def _id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:20]}"
+
+
+async def _delay():
+    jitter = random.uniform(-MockConfig.jitter_ms, MockConfig.jitter_ms)
+    await asyncio.sleep(max(0.0, MockConfig.latency_ms + jitter) / 1000)
+
+
+def _injected_failure():
+    roll = random.random()
+    if roll < MockConfig.rate_limit_rate:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"type": "rate_limit_exceeded", "message": "Mock rate limit"}},
+            headers={"Retry-After": "1"},
+        )
+    if roll < MockConfig.rate_limit_rate + MockConfig.error_rate:
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"type": "server_error", "message": "Mock injected failure"}},
+        )
+    return None
+
+
+def _unauthorized(request):
+    auth = request.headers.get("authorization", "")
+    if not auth.startswith("Bearer ") or len(auth) <= len("Bearer "):
+        return JSONResponse(status_code=401, content={"error": {"message": "Missing bearer token"}})
+    return None
+
+
+def session_object(config):
+    """
+    A realistic /v1/realtime/sessions payload for the given request body.
+    """
+    return {
+        "id": _id("sess"),
+        "object": "realtime.session",
+        "model": config.get("model", "gpt-4o-realtime-preview-2024-12-17"),
+        "modalities": config.get("modalities", ["text", "audio"]),
+        "instructions": config.get("instructions", ""),
+        "voice": config.get("voice", "alloy"),
+        "input_audio_format": config.get("input_audio_format", "pcm16"),
+        "output_audio_format": config.get("output_audio_format", "pcm16"),
+        "input_audio_transcription": config.get("input_audio_transcription"),
+        "turn_detection": config.get("turn_detection", {
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 200,
+        }),
+        "tools": config.get("tools", []),
+        "tool_choice": config.get("tool_choice", "auto"),
+        "temperature": config.get("temperature", 0.8),
+        "max_response_output_tokens": config.get("max_response_output_tokens", "inf"),
+        "client_secret": {
+            "value": _id("ek"),
+            "expires_at": int(time.time()) + MockConfig.token_ttl,
+        },
+    }
+
+
+@app.post("/v1/realtime/sessions")
+async def create_session(request: Request):
+    """
+    Mint a mock ephemeral session.
+    """
+    denied = _unauthorized(request)
+    if denied is not None:
+        return denied
+    await _delay()
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    try:
+        config = await request.json()
+    except ValueError:
+        config = {}
+    return session_object(config if isinstance(config, dict) else {})
+
+
+@app.post("/v1/realtime")
+async def exchange_sdp(request: Request):
+    """
+    Accept an SDP offer and return a canned answer (no media is exchanged).
+    """
+    denied = _unauthorized(request)
+    if denied is not None:
+        return denied
+    await _delay()
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    return Response(status_code=201, content=SDP_ANSWER, media_type="application/sdp")
+
+
+def classify(text):
+    lowered = text.lower()
+    scores = {
+        category: sum(lowered.count(word) for word in words)
+        for category, words in CATEGORY_KEYWORDS.items()
+    }
+    best = max(scores, key=scores.get)
+    return best if scores[best] else "general"
+
+
+def item_text(item):
+    parts = []
+    for content in item.get("content", []):
+        parts.append(content.get("text") or content.get("transcript") or "")
+    return " ".join(part for part in parts if part)
+
+
+class MockRealtimeSession:
+    """
+    Event-protocol state for one WebSocket connection.
+    """
+
+    def __init__(self, websocket, model):
+        self.ws = websocket
+        self.session = session_object({"model": model})
+        self.items = []
+        self.audio_bytes = 0
+        self.active = {}
+        self.closed = False
+
+    async def send(self, event):
+        if self.closed:
+            return
+        event.setdefault("event_id", _id("event"))
+        await self.ws.send_text(json.dumps(event))
+
+    async def error(self, message, client_event_id=None):
+        await self.send({
+            "type": "error",
+            "error": {"type": "invalid_request_error", "message": message, "event_id": client_event_id},
+        })
+
+    async def add_item(self, item):
+        item = dict(item)
+        item.setdefault("id", _id("item"))
+        item.setdefault("object", "realtime.item")
+        item.setdefault("status", "completed")
+        previous = self.items[-1]["id"] if self.items else None
+        self.items.append(item)
+        await self.send({"type": "conversation.item.created", "previous_item_id": previous, "item": item})
+        return item
+
+    async def handle(self, event):
+        kind = event.get("type")
+        if kind == "session.update":
+            self.session.update(event.get("session", {}))
+            await self.send({"type": "session.updated", "session": self.session})
+        elif kind == "conversation.item.create":
+            await self.add_item(event.get("item", {}))
+        elif kind == "input_audio_buffer.append":
+            self.audio_bytes += len(event.get("audio", "")) * 3 // 4
+        elif kind == "input_audio_buffer.clear":
+            self.audio_bytes = 0
+            await self.send({"type": "input_audio_buffer.cleared"})
+        elif kind == "input_audio_buffer.commit":
+            item_id = _id("item")
+            await self.send({"type": "input_audio_buffer.committed", "item_id": item_id})
+            await self.add_item({
+                "id": item_id,
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_audio", "transcript": f"<{self.audio_bytes} bytes of audio>"}],
+            })
+            self.audio_bytes = 0
+        elif kind == "response.create":
+            response_id = _id("resp")
+            task = asyncio.create_task(self.respond(response_id, event.get("response") or {}))
+            self.active[response_id] = task
+            task.add_done_callback(lambda _: self.active.pop(response_id, None))
+        elif kind == "response.cancel":
+            response_id = event.get("response_id")
+            if response_id is None:
+                targets = list(self.active.values())
+            elif response_id in self.active:
+                targets = [self.active[response_id]]
+            else:
+                await self.error(f"Response {response_id} is not in progress", event.get("event_id"))
+                return
+            for task in targets:
+                task.cancel()
+        else:
+            await self.error(f"Unsupported event type: {kind}", event.get("event_id"))
+
+    async def respond(self, response_id, params):
+        out_of_band = params.get("conversation") == "none"
+        input_items = params.get("input")
+        if input_items is None:
+            context = self.items
+        else:
+            by_id = {item["id"]: item for item in self.items}
+            context = [
+                by_id.get(item.get("id"), {}) if item.get("type") == "item_reference" else item
+                for item in input_items
+            ]
+        response = {
+            "id": response_id,
+            "object": "realtime.response",
+            "status": "in_progress",
+            "metadata": params.get("metadata"),
+            "conversation_id": None if out_of_band else "conv_mock",
+            "output": [],
+            "usage": None,
+        }
+        await self.send({"type": "response.created", "response": dict(response)})
+        try:
+            await _delay()
+            conversation_text = " ".join(item_text(item) for item in context)
+            input_tokens = len(conversation_text.split())
+            if MockConfig.prefill_us_per_token:
+                await asyncio.sleep(input_tokens * MockConfig.prefill_us_per_token / 1e6)
+            task_type = (params.get("metadata") or {}).get("type", "classification")
+            if out_of_band and task_type == "classification":
+                text = classify(conversation_text)
+            elif out_of_band:
+                text = f"Mock {task_type} of: {conversation_text[-80:] or 'nothing yet'}"
+            else:
+                text = f"Mock reply to: {conversation_text[-80:] or 'nothing yet'}"
+            item = {
+                "id": _id("item"),
+                "object": "realtime.item",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "text", "text": text}],
+            }
+            if not out_of_band:
+                await self.add_item(item)
+            for start in range(0, len(text), 16):
+                await self.send({
+                    "type": "response.text.delta",
+                    "response_id": response_id,
+                    "item_id": item["id"],
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": text[start:start + 16],
+                })
+            await self.send({
+                "type": "response.text.done",
+                "response_id": response_id,
+                "item_id": item["id"],
+                "output_index": 0,
+                "content_index": 0,
+                "text": text,
+            })
+            response.update(status="completed", output=[item], usage={
+                "total_tokens": input_tokens + len(text.split()),
+                "input_tokens": input_tokens,
+                "output_tokens": len(text.split()),
+            })
+        except asyncio.CancelledError:
+            response.update(status="cancelled", status_details={"type": "cancelled", "reason": "client_cancelled"})
+        await self.send({"type": "response.done", "response": response})
+
+
+@app.websocket("/v1/realtime")
+async def realtime_events(websocket: WebSocket, model: str = "gpt-4o-realtime-preview-2024-12-17"):
+    """
+    Realtime event protocol over WebSocket.
+    """
+    await websocket.accept()
+    session = MockRealtimeSession(websocket, model)
+    await session.send({"type": "session.created", "session": session.session})
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                event = json.loads(raw)
+            except ValueError:
+                await session.error("Invalid JSON")
+                continue
+            await session.handle(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.closed = True
+        for task in list(session.active.values()):
+            task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=MockConfig.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=MockConfig.rate_limit_rate)
+    parser.add_argument("--token-ttl", type=int, default=MockConfig.token_ttl)
+    parser.add_argument("--prefill-us-per-token", type=float, default=MockConfig.prefill_us_per_token)
+    args = parser.parse_args()
+
+    MockConfig.latency_ms = args.latency_ms
+    MockConfig.jitter_ms = args.jitter_ms
+    MockConfig.error_rate = args.error_rate
+    MockConfig.rate_limit_rate = args.rate_limit_rate
+    MockConfig.token_ttl = args.token_ttl
+    MockConfig.prefill_us_per_token = args.prefill_us_per_token
+
+    print(colored(f"[INFO] Mock Realtime API on http://{args.host}:{args.port}/v1", "cyan"))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
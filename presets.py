@@ -0,0 +1,147 @@
+"""
+Named session configuration presets for /session and /connect.
+
+Each preset trades response latency against turn-taking robustness and output:
+    low-latency  server VAD that ends the turn after 250 ms of silence, with
+                 less leading audio, and replies capped at 512 tokens
+    balanced     the Realtime API defaults: 500 ms of silence ends a turn,
+                 replies are not capped
+    text-only    text in and text out, no turn detection or transcription,
+                 replies capped at 1024 tokens
+
+Presets are merged over each app's base config (model, voice, ...) and
+validated once at import, so a bad preset fails at startup rather than on
+the first request. Every preset is kept as its ready-to-send JSON body and
+its token pool key, so picking one costs a dict lookup per request. Keys an
+app pins (the out-of-band app's input transcription, which its classifier
+needs) are kept from the base config whatever the preset says.
+
+The page picks a preset with ?preset=<name> on /session and /connect (it
+forwards its own ?preset= query parameter); unknown names get a 400 listing
+the available ones. The page reports end-of-turn-to-first-output latency per
+preset to /telemetry, see realtime_turn_latency_seconds on /metrics.
+
+Tunables are read from the environment:
+    SESSION_PRESET  preset used when the request names none (default balanced)
+"""
+import json
+import os
+
+from fastapi.responses import JSONResponse
+
+import logs
+import token_pool
+
+QUERY_PARAM = "preset"
+MODALITIES = ({"text"}, {"audio", "text"})
+MAX_OUTPUT_TOKENS = 4096
+
+PRESETS = {
+    "low-latency": {
+        "modalities": ["audio", "text"],
+        "turn_detection": {
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 200,
+            "silence_duration_ms": 250,
+        },
+        "max_response_output_tokens": 512,
+        "input_audio_transcription": None,
+    },
+    "balanced": {
+        "modalities": ["audio", "text"],
+        "turn_detection": {
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 500,
+        },
+        "max_response_output_tokens": "inf",
+    },
+    "text-only": {
+        "modalities": ["text"],
+        "turn_detection": None,
+        "max_response_output_tokens": 1024,
+        "input_audio_transcription": None,
+    },
+}
+DEFAULT = os.getenv("SESSION_PRESET", "balanced")
+
+
+class Preset(dict):
+    """
+    A session request body, with its serialized form and pool key precomputed.
+    """
+
+    def __init__(self, name, config):
+        super().__init__(config)
+        self.name = name
+        self.body = json.dumps(config, separators=(",", ":")).encode()
+        self.key = token_pool.pool_key(config)
+
+
+def validate(name, config):
+    """
+    Raise ValueError when a merged preset is not a valid session request body.
+    """
+    if not isinstance(config.get("model"), str):
+        raise ValueError(f"Preset {name}: model is required")
+    modalities = config.get("modalities", ["audio", "text"])
+    if set(modalities) not in MODALITIES or len(modalities) != len(set(modalities)):
+        raise ValueError(f"Preset {name}: modalities must be ['text'] or ['audio', 'text']")
+
+    turn_detection = config.get("turn_detection")
+    if turn_detection is not None:
+        if turn_detection.get("type") != "server_vad":
+            raise ValueError(f"Preset {name}: only server_vad turn detection is supported")
+        if not 0.0 <= turn_detection.get("threshold", 0.5) <= 1.0:
+            raise ValueError(f"Preset {name}: VAD threshold must be between 0 and 1")
+        for field in ("prefix_padding_ms", "silence_duration_ms"):
+            value = turn_detection.get(field, 0)
+            if not isinstance(value, int) or value < 0:
+                raise ValueError(f"Preset {name}: {field} must be a non-negative integer")
+
+    tokens = config.get("max_response_output_tokens", "inf")
+    if tokens != "inf" and not (isinstance(tokens, int) and 1 <= tokens <= MAX_OUTPUT_TOKENS):
+        raise ValueError(f"Preset {name}: max_response_output_tokens must be 1-{MAX_OUTPUT_TOKENS} or 'inf'")
+
+    transcription = config.get("input_audio_transcription")
+    if transcription is not None and not isinstance(transcription.get("model"), str):
+        raise ValueError(f"Preset {name}: input_audio_transcription needs a model")
+
+
+def build(base, pinned=()):
+    """
+    Merge every preset over `base` and validate it; returns {name: Preset}.
+    Keys in `pinned` always keep their value from `base`.
+    """
+    built = {}
+    for name, fields in PRESETS.items():
+        config = {**base, **fields}
+        config.update({key: base[key] for key in pinned if key in base})
+        validate(name, config)
+        built[name] = Preset(name, config)
+    if DEFAULT not in built:
+        raise ValueError(f"SESSION_PRESET={DEFAULT} is not one of {', '.join(built)}")
+    return built
+
+
+def select(built, request):
+    """
+    The preset named by the request's ?preset=, the default one when it names
+    none, or None for an unknown name. The choice goes on the access record.
+    """
+    preset = built.get(request.query_params.get(QUERY_PARAM) or DEFAULT)
+    if preset is not None:
+        logs.annotate(preset=preset.name)
+    return preset
+
+
+def unknown_response(built):
+    """
+    400 for a ?preset= that names no preset.
+    """
+    return JSONResponse(
+        status_code=400,
+        content={"error": "Unknown session preset", "presets": list(built)},
+    )
@@ -0,0 +1,270 @@
+"""
+Tail-latency and failure handling for the upstream sessions API.
+
+mint() is the single path every session mint takes (on-demand /session calls
+and pool refills alike):
+    - a circuit breaker trips after consecutive failures/timeouts and, while
+      open, fails fast so /session only serves pooled sessions or a quick error,
+    - the call is admitted through admission.gate,
+    - foreground calls are hedged: if the first request has not answered by the
+      observed p95, a second one is fired and whichever wins is used. The
+      second request spends an admission rate token like any other call and
+      is skipped when none is free. The loser is cancelled, or, when a spare
+      sink is set (token_pool sets one), left to finish so a session it still
+      mints goes to the pool instead of being thrown away.
+
+Tunables are read from the environment:
+    HEDGE_ENABLED            1 to hedge foreground mints (default 1)
+    HEDGE_MIN_SAMPLES        latency samples needed before hedging (default 20)
+    HEDGE_MIN_DELAY          lower bound on the hedge delay in seconds (default 0.05)
+    BREAKER_FAILURE_THRESHOLD consecutive failures that open the breaker (default 5)
+    BREAKER_COOLDOWN         seconds the breaker stays open before probing (default 10)
+"""
+import asyncio
+import os
+import time
+from collections import Counter, deque
+
+import httpx
+
+import admission
+import logs
+import upstream
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "10"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _is_failure(resp):
+    return resp.status_code >= 500
+
+
+def _discard(task):
+    """
+    Cancel an attempt nobody waits for any more (a no-op once it is done);
+    its outcome is consumed when it finishes, so a failure is not reported
+    as never retrieved.
+    """
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+class LatencyWindow:
+    """
+    Rolling window of recent latencies with percentile lookups.
+    """
+
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "count": len(self.samples),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker with a single half-open probe.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.transitions = Counter()
+
+    def _move(self, state):
+        if state != self.state:
+            self.transitions[f"{self.state}->{state}"] += 1
+            level = "error" if state == OPEN else "warning" if state == HALF_OPEN else "success"
+            logs.logger.log(level, f"Upstream sessions circuit {self.state} -> {state}", breaker_from=self.state, breaker_to=state)
+            self.state = state
+
+    def before_call(self):
+        """
+        Raise admission.Rejected when calls should fail fast.
+        """
+        if self.state == OPEN:
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                raise admission.Rejected("Upstream sessions API unavailable", remaining * 1000, status_code=503)
+            self._move(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                raise admission.Rejected("Upstream sessions API recovering", self.cooldown * 1000, status_code=503)
+            self.probing = True
+
+    def record_success(self):
+        self.probing = False
+        self.failures = 0
+        self._move(CLOSED)
+
+    def record_failure(self):
+        self.probing = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self._move(OPEN)
+
+    def release(self):
+        """
+        The call never reached upstream (e.g. not admitted); free the probe.
+        """
+        self.probing = False
+
+
+class UpstreamGuard:
+    """
+    Breaker + admission + hedging around upstream.create_session.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.attempt_latency = LatencyWindow()
+        self.mint_latency = LatencyWindow()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+        # spare(data, session) takes a hedge loser's session when it succeeded too
+        self.spare = None
+
+    def hedge_delay(self):
+        if not HEDGE_ENABLED or len(self.attempt_latency.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.attempt_latency.percentile(0.95))
+
+    async def _attempt(self, call):
+        started = time.perf_counter()
+        try:
+            return await call()
+        finally:
+            # A cancelled hedge loser still records how long it had been
+            # waiting, so the "before" tail is not hidden by hedging.
+            self.attempt_latency.add(time.perf_counter() - started)
+
+    def _keep(self, task, data):
+        """
+        Hand a losing attempt's session to the spare sink once it finishes,
+        or cancel it when there is no sink.
+        """
+        if self.spare is None:
+            _discard(task)
+            return
+
+        def done(task):
+            if task.cancelled() or task.exception() is not None or task.result().status_code != 200:
+                return
+            self.spare(data, task.result().json())
+
+        task.add_done_callback(done)
+
+    async def _hedged(self, call, data):
+        delay = self.hedge_delay()
+        first = asyncio.create_task(self._attempt(call))
+        if delay is None:
+            return await first
+        # Whatever is still pending when we leave (winner found, or the caller
+        # was cancelled while waiting) is cancelled rather than left running.
+        pending, done = {first}, set()
+        outcome = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+            if not admission.gate.try_reserve():
+                self.hedges_skipped += 1
+                return await first
+
+            self.hedges_fired += 1
+            second = asyncio.create_task(self._attempt(call))
+            pending.add(second)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outcome = task
+                    if task.exception() is None and not _is_failure(task.result()):
+                        if task is second:
+                            self.hedges_won += 1
+                        loser = first if task is second else second
+                        pending.discard(loser)
+                        done.discard(loser)
+                        self._keep(loser, data)
+                        return task.result()
+            # Both attempts failed; surface the last one.
+            return outcome.result()
+        finally:
+            for task in pending | done:
+                _discard(task)
+
+    async def mint(self, api_key, data, background=False):
+        """
+        Mint one ephemeral session. Raises admission.Rejected when the call is
+        shed (breaker open, queue full, rate limited).
+        """
+        self.breaker.before_call()
+
+        def call():
+            return upstream.create_session(api_key, data)
+
+        started = time.perf_counter()
+        try:
+            if background:
+                resp = await admission.gate.run(lambda: self._attempt(call), background=True)
+            else:
+                resp = await admission.gate.run(lambda: self._hedged(call, data))
+        except admission.Rejected:
+            self.breaker.release()
+            raise
+        except (httpx.TransportError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        if _is_failure(resp):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            if not background:
+                self.mint_latency.add(time.perf_counter() - started)
+        return resp
+
+    def stats(self):
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_transitions": dict(self.breaker.transitions),
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_delay": self.hedge_delay(),
+            # Single upstream attempts ("before") vs. what callers saw ("after").
+            "attempt_latency": self.attempt_latency.summary(),
+            "mint_latency": self.mint_latency.summary(),
+        }
+
+
+guard = UpstreamGuard()
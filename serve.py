@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Production launcher and app factory for both chat variants.
+
+    python serve.py --app oob --host 0.0.0.0 --port 8000 --workers 4
+    APP_VARIANT=basic uvicorn serve:create_app --factory --workers 4
+
+create_app() imports only the selected variant, so a worker never pays for the
+other one, and reports how long the import took (FastAPI itself, the app
+modules and the precompressed page) against STARTUP_BUDGET_MS. Each worker is
+a separate process with its own token pool, admission gate, classifier and
+journal writer; limits such as ADMISSION_MAX_CONCURRENCY apply per worker.
+
+uvicorn's own access log is turned off while the apps emit structured access
+records (LOG_ACCESS, see logs.py).
+
+The entry modules' own __main__ blocks go through main() as well, with
+auto-reload on for development.
+
+Settings come from flags, falling back to the environment:
+    APP_VARIANT        basic or oob (default oob)
+    HOST               bind address (default 127.0.0.1)
+    PORT               bind port (default 8000)
+    WEB_CONCURRENCY    worker processes (default 1)
+    UVICORN_LOOP       auto, uvloop or asyncio (default auto)
+    UVICORN_HTTP       auto, httptools or h11 (default auto)
+    GRACEFUL_TIMEOUT   seconds in-flight requests get to finish on shutdown (default 30)
+    STARTUP_BUDGET_MS  per-worker import budget (default 1000)
+"""
+import argparse
+import importlib
+import importlib.util
+import os
+import time
+
+import uvicorn
+
+import logs
+
+VARIANTS = {
+    "basic": "1_basic_voice_text_chat",
+    "oob": "2_out_of_band_responses",
+}
+DEFAULT_VARIANT = "oob"
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+
+# choice -> (optional module it needs, uvicorn value used without it)
+LOOPS = {"uvloop": ("uvloop", "asyncio"), "asyncio": (None, "asyncio")}
+HTTP_PROTOCOLS = {"httptools": ("httptools", "h11"), "h11": (None, "h11")}
+
+
+def create_app(variant=None):
+    """
+    Import one variant and return its ASGI app (APP_VARIANT when not given).
+    """
+    variant = variant or os.getenv("APP_VARIANT", DEFAULT_VARIANT)
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown app variant {variant!r}; expected one of {', '.join(VARIANTS)}")
+    started = time.perf_counter()
+    app = importlib.import_module(VARIANTS[variant]).app
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms > STARTUP_BUDGET_MS:
+        logs.warning(f"{variant} app imported in {elapsed_ms:.0f} ms, over the {STARTUP_BUDGET_MS:.0f} ms budget",
+                     variant=variant, import_ms=round(elapsed_ms, 1))
+    else:
+        logs.info(f"{variant} app imported in {elapsed_ms:.0f} ms (pid {os.getpid()})",
+                  variant=variant, import_ms=round(elapsed_ms, 1), pid=os.getpid())
+    return app
+
+
+def resolve(choice, implementations, kind):
+    """
+    Map auto/explicit loop or HTTP choices to what is actually installed.
+    """
+    if choice == "auto":
+        choice = next(iter(implementations))
+        module, fallback = implementations[choice]
+        return choice if importlib.util.find_spec(module) else fallback
+    module, fallback = implementations[choice]
+    if module and not importlib.util.find_spec(module):
+        logs.warning(f"{kind} {choice} requested but {module} is not installed; using {fallback}")
+        return fallback
+    return choice
+
+
+def parse_args(argv=None, variant=None, reload=False):
+    parser = argparse.ArgumentParser(description="Serve a chat variant with uvicorn.")
+    parser.add_argument("--app", choices=sorted(VARIANTS), default=variant or os.getenv("APP_VARIANT", DEFAULT_VARIANT))
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--loop", choices=["auto", *LOOPS], default=os.getenv("UVICORN_LOOP", "auto"))
+    parser.add_argument("--http", choices=["auto", *HTTP_PROTOCOLS], default=os.getenv("UVICORN_HTTP", "auto"))
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--reload", action=argparse.BooleanOptionalAction, default=reload,
+                        help="restart on code changes (development; forces one worker)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, variant=None, reload=False):
+    """
+    Launch uvicorn. `variant` and `reload` set the defaults for an entry module.
+    """
+    args = parse_args(argv, variant, reload)
+    loop = resolve(args.loop, LOOPS, "loop")
+    http = resolve(args.http, HTTP_PROTOCOLS, "HTTP protocol")
+    workers = 1 if args.reload else max(1, args.workers)
+    # Worker and reloader processes call create_app() with no arguments
+    os.environ["APP_VARIANT"] = args.app
+
+    mode = "reload" if args.reload else f"{workers} worker{'s' if workers > 1 else ''}"
+    logs.info(f"Starting {args.app} on {args.host}:{args.port} ({mode}, loop={loop}, http={http})")
+    uvicorn.run(
+        "serve:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=args.reload,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        # logs.install() writes its own (structured, sampled) access records
+        access_log=not logs.logger.access,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Registry of live Realtime sessions with global and per-user capacity limits.
+
+Every session handed out by /session or /connect holds a lease in the registry
+from the moment it is minted. The page keeps its lease alive with
+POST /session/heartbeat while connected and gives it back with a
+POST /session/close beacon from disconnectChat() (or when the tab goes away);
+a reaper task closes leases whose heartbeats stopped, so capacity held by
+crashed or closed tabs is returned within SESSIONS_HEARTBEAT_TIMEOUT.
+
+When all SESSIONS_MAX_ACTIVE slots are taken, callers get a queue ticket with
+their position and an estimated wait instead of a session. The page retries
+with the ticket (X-Session-Ticket) and is admitted in FIFO order as leases
+close; a ticket that is not presented again within SESSIONS_TICKET_TTL loses
+its place. Wait estimates assume each active session lasts as long as the
+average closed one.
+
+A page rolling its call over to a fresh session before the Realtime session
+limit (frontend/js/rollover.js) names the lease being replaced in
+X-Session-Replaces. The successor takes over its predecessor's slot, so it is
+admitted past the caps and the queue; each lease can have one successor at a
+time, and the predecessor is closed once the page has switched.
+
+Users are identified by the X-User-Id header the page sends (a random id kept
+in localStorage), falling back to the client address. The registry lives in
+one process: with several workers, each enforces its own share of the caps.
+
+Tunables are read from the environment:
+    SESSIONS_MAX_ACTIVE        concurrent sessions across all users (default 100)
+    SESSIONS_MAX_PER_USER      concurrent sessions per user (default 2)
+    SESSIONS_MAX_QUEUED        clients allowed to wait for a slot (default 500)
+    SESSIONS_HEARTBEAT_TIMEOUT seconds without a heartbeat before a lease is reaped (default 45)
+    SESSIONS_TICKET_TTL        seconds a queue ticket survives without a retry (default 30)
+    SESSIONS_MAX_SECONDS       hard lease lifetime, the Realtime session limit plus slack (default 1860)
+    SESSIONS_POLL_INTERVAL     longest the page is told to wait between queue retries (default 5)
+    SESSIONS_REAP_INTERVAL     seconds between reaper passes (default 5)
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import admission
+import logs
+
+MAX_ACTIVE = int(os.getenv("SESSIONS_MAX_ACTIVE", "100"))
+MAX_PER_USER = int(os.getenv("SESSIONS_MAX_PER_USER", "2"))
+MAX_QUEUED = int(os.getenv("SESSIONS_MAX_QUEUED", "500"))
+HEARTBEAT_TIMEOUT = float(os.getenv("SESSIONS_HEARTBEAT_TIMEOUT", "45"))
+TICKET_TTL = float(os.getenv("SESSIONS_TICKET_TTL", "30"))
+MAX_SECONDS = float(os.getenv("SESSIONS_MAX_SECONDS", "1860"))
+POLL_INTERVAL = float(os.getenv("SESSIONS_POLL_INTERVAL", "5"))
+REAP_INTERVAL = float(os.getenv("SESSIONS_REAP_INTERVAL", "5"))
+
+USER_HEADER = "x-user-id"
+TICKET_HEADER = "x-session-ticket"
+REPLACES_HEADER = "x-session-replaces"
+LEASE_HEADER = "X-Session-Lease"
+MAX_USER_ID = 64
+# Weight of the latest closed session when averaging session length.
+DURATION_SMOOTHING = 0.2
+
+
+def user_key(request):
+    """
+    The page's X-User-Id, or the client address when it sends none.
+    """
+    user = (request.headers.get(USER_HEADER) or "").strip()[:MAX_USER_ID]
+    if user:
+        return "id:" + user
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+class Lease:
+    """
+    One live session and when its page was last heard from.
+    """
+
+    def __init__(self, user, predecessor=None):
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.opened = time.monotonic()
+        self.last_seen = self.opened
+        self.predecessor = predecessor
+        self.successor = None
+
+
+class SessionRegistry:
+    """
+    Active leases, the FIFO waiting queue and the reaper task.
+    """
+
+    def __init__(self):
+        self.leases = {}
+        self.by_user = {}
+        # ticket -> last time it was presented, in arrival order
+        self.queue = OrderedDict()
+        self.avg_session_seconds = 120.0
+        self._task = None
+
+        self.opened = 0
+        self.admitted_from_queue = 0
+        self.rollovers = 0
+        self.queued = 0
+        self.rejected_user_cap = 0
+        self.rejected_queue_full = 0
+        self.closed = {"client": 0, "reaped": 0, "expired": 0, "failed": 0}
+
+    def admit(self, request):
+        """
+        acquire() for a request, with its user, queue ticket and the lease it replaces.
+        """
+        return self.acquire(
+            user_key(request),
+            request.headers.get(TICKET_HEADER),
+            request.headers.get(REPLACES_HEADER),
+        )
+
+    def acquire(self, user, ticket=None, replaces=None):
+        """
+        Open a lease for `user`, or raise admission.Rejected: 429 over the
+        per-user cap, 503 with a queue ticket when every slot is taken.
+        A rollover successor of one of the user's live leases is always admitted.
+        """
+        now = time.monotonic()
+        self._expire_tickets(now)
+        predecessor = self.leases.get(replaces) if isinstance(replaces, str) else None
+        if predecessor is not None and predecessor.user == user and predecessor.successor is None:
+            lease = self._open(user, predecessor.id)
+            predecessor.successor = lease.id
+            self.rollovers += 1
+            return lease
+        held = self.by_user.get(user, 0)
+        if held >= MAX_PER_USER:
+            self.rejected_user_cap += 1
+            raise admission.Rejected(
+                f"At most {MAX_PER_USER} concurrent sessions per user",
+                HEARTBEAT_TIMEOUT * 1000,
+            )
+
+        queued = ticket in self.queue
+        position = list(self.queue).index(ticket) if queued else len(self.queue)
+        free = MAX_ACTIVE - len(self.leases)
+        if position < free:
+            if queued:
+                del self.queue[ticket]
+                self.admitted_from_queue += 1
+            return self._open(user)
+
+        if not queued:
+            if len(self.queue) >= MAX_QUEUED:
+                self.rejected_queue_full += 1
+                raise admission.Rejected("Session queue is full", self.estimate_wait(position) * 1000, status_code=503)
+            ticket = uuid.uuid4().hex
+            self.queued += 1
+        self.queue[ticket] = now
+        wait = self.estimate_wait(position)
+        # Retry often enough to keep the ticket alive even when the wait is long
+        raise admission.Rejected(
+            "All session slots are in use; queued",
+            min(wait, POLL_INTERVAL, TICKET_TTL / 2) * 1000,
+            status_code=503,
+            details={
+                "queued": True,
+                "ticket": ticket,
+                "position": position + 1,
+                "estimated_wait_ms": int(wait * 1000),
+            },
+        )
+
+    def _open(self, user, predecessor=None):
+        lease = Lease(user, predecessor)
+        self.leases[lease.id] = lease
+        self.by_user[user] = self.by_user.get(user, 0) + 1
+        self.opened += 1
+        return lease
+
+    def _expire_tickets(self, now):
+        for ticket in [t for t, seen in self.queue.items() if now - seen > TICKET_TTL]:
+            del self.queue[ticket]
+
+    def estimate_wait(self, position):
+        """
+        Seconds until queue position `position` (0-based) gets a slot,
+        assuming every session lasts avg_session_seconds.
+        """
+        needed = position - (MAX_ACTIVE - len(self.leases))
+        if needed < 0:
+            return 0.0
+        now = time.monotonic()
+        average = self.avg_session_seconds
+        # Sessions already past the average are assumed to end soon (half a heartbeat timeout)
+        ends = sorted(
+            max(lease.opened + average, now + min(average, HEARTBEAT_TIMEOUT) / 2) - now
+            for lease in self.leases.values()
+        )
+        if not ends:
+            return average
+        rounds, index = divmod(needed, len(ends))
+        return ends[index] + rounds * average
+
+    def heartbeat(self, lease_id):
+        """
+        Mark a lease alive; False when it is unknown (closed or reaped).
+        """
+        lease = self.leases.get(lease_id) if isinstance(lease_id, str) else None
+        if lease is None:
+            return False
+        lease.last_seen = time.monotonic()
+        return True
+
+    def close(self, lease_id, reason="client"):
+        """
+        Give a lease's slot back; False when it was already closed.
+        """
+        lease = self.leases.pop(lease_id, None) if isinstance(lease_id, str) else None
+        if lease is None:
+            return False
+        held = self.by_user[lease.user] - 1
+        if held:
+            self.by_user[lease.user] = held
+        else:
+            del self.by_user[lease.user]
+        # A successor that never took over frees its predecessor for another attempt
+        predecessor = self.leases.get(lease.predecessor)
+        if predecessor is not None and predecessor.successor == lease.id:
+            predecessor.successor = None
+        self.closed[reason] += 1
+        if reason == "client":
+            duration = time.monotonic() - lease.opened
+            self.avg_session_seconds += DURATION_SMOOTHING * (duration - self.avg_session_seconds)
+        return True
+
+    def reap(self):
+        """
+        Close leases whose heartbeats stopped or that outlived MAX_SECONDS.
+        """
+        now = time.monotonic()
+        reaped = 0
+        for lease in list(self.leases.values()):
+            if now - lease.opened > MAX_SECONDS:
+                self.close(lease.id, "expired")
+            elif now - lease.last_seen > HEARTBEAT_TIMEOUT:
+                self.close(lease.id, "reaped")
+            else:
+                continue
+            reaped += 1
+        self._expire_tickets(now)
+        return reaped
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            try:
+                reaped = self.reap()
+                if reaped:
+                    logs.info(f"Reaped {reaped} sessions without a heartbeat", reaped=reaped)
+            except Exception as e:
+                logs.error(f"Session reaper failed: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        """
+        Occupancy, queue and lease turnover counters.
+        """
+        return {
+            "active": len(self.leases),
+            "capacity": MAX_ACTIVE,
+            "users": len(self.by_user),
+            "queue_length": len(self.queue),
+            "opened": self.opened,
+            "queued": self.queued,
+            "admitted_from_queue": self.admitted_from_queue,
+            "rollovers": self.rollovers,
+            "rejected_user_cap": self.rejected_user_cap,
+            "rejected_queue_full": self.rejected_queue_full,
+            "closed": dict(self.closed),
+            "avg_session_seconds": round(self.avg_session_seconds, 1),
+        }
+
+
+registry = SessionRegistry()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Run the reaper for the app's lifetime.
+    """
+    registry.start()
+    try:
+        yield
+    finally:
+        await registry.stop()
@@ -0,0 +1,53 @@
+"""
+Server-side WebRTC signaling.
+
+negotiate() takes the browser's SDP offer, obtains an ephemeral session (a
+pre-minted one from the pool when available, otherwise minted through
+resilience.guard) and exchanges the offer with the Realtime API over the
+shared upstream client. The browser gets the answer SDP back in a single round
+trip and never sees the ephemeral key.
+"""
+import httpx
+
+import resilience
+import token_pool
+import upstream
+
+
+class NegotiationError(Exception):
+    """
+    Minting the session or exchanging SDP upstream failed.
+    """
+
+    def __init__(self, message, status_code=502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def negotiate(api_key, data, offer_sdp):
+    """
+    Return the answer SDP for `offer_sdp` on a session created from `data`.
+    Raises admission.Rejected when minting is shed and NegotiationError when
+    upstream refuses or cannot be reached.
+    """
+    if not offer_sdp.strip():
+        raise NegotiationError("Empty SDP offer", status_code=400)
+
+    session = token_pool.pool.take(data)
+    if session is None:
+        try:
+            resp = await resilience.guard.mint(api_key, data)
+        except httpx.TransportError as e:
+            raise NegotiationError(f"Could not reach the sessions API: {str(e)}") from e
+        if resp.status_code != 200:
+            raise NegotiationError(f"Could not create ephemeral session: {resp.text}")
+        session = resp.json()
+
+    ephemeral_key = session["client_secret"]["value"]
+    try:
+        resp = await upstream.exchange_sdp(ephemeral_key, data["model"], offer_sdp)
+    except httpx.TransportError as e:
+        raise NegotiationError(f"Could not reach the Realtime API: {str(e)}") from e
+    if resp.status_code not in (200, 201):
+        raise NegotiationError(f"Realtime API rejected the SDP offer: {resp.text}")
+    return resp.text
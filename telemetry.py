@@ -0,0 +1,255 @@
+"""
+Connection-phase telemetry and Prometheus metrics.
+
+The page batches its connection-phase timings (token fetch, mic grant, offer,
+ICE, SDP answer, data channel open, first remote track, first response.done)
+to POST /telemetry, together with the time from the end of each user turn to
+the model's first audio (or first text, in text-only sessions) labelled with
+the session preset. They are aggregated here into fixed-bucket histograms
+alongside server-side request timings for /session and /connect, and rendered
+in the Prometheus text exposition format for GET /metrics.
+"""
+import bisect
+import math
+import time
+
+from fastapi import Request
+
+import admission
+import classifier
+import journal
+import logs
+import presets
+import resilience
+import sessions
+import token_pool
+
+# Upper bounds in seconds; +Inf is implicit.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Only known phases/modes are accepted so page input cannot blow up cardinality.
+CLIENT_PHASES = {
+    "token",
+    "mic",
+    "offer",
+    "ice",
+    "answer",
+    "datachannel_open",
+    "remote_track",
+    "first_response_done",
+    "rollover",
+}
+TURN_PHASES = {"turn_first_audio", "turn_first_text"}
+CLIENT_MODES = {"server", "fast", "classic"}
+TIMED_ROUTES = {"/session", "/connect"}
+# Server stats that only ever grow, exported as counters with a _total suffix.
+# Every other stat (sizes, rates, rolling-window latencies) is a gauge.
+COUNTER_STATS = frozenset((
+    "realtime_token_pool_hits",
+    "realtime_token_pool_misses",
+    "realtime_token_pool_minted",
+    "realtime_token_pool_mint_failures",
+    "realtime_token_pool_wasted",
+    "realtime_token_pool_spares",
+    "realtime_token_pool_refill_count",
+    "realtime_token_pool_refill_seconds_total",
+    "realtime_admission_admitted",
+    "realtime_admission_rejected",
+    "realtime_admission_retries",
+    "realtime_resilience_hedges_fired",
+    "realtime_resilience_hedges_won",
+    "realtime_resilience_hedges_skipped",
+    "realtime_classifier_local_answers",
+    "realtime_classifier_escalations",
+    "realtime_classifier_cache_answers",
+    "realtime_classifier_shadow_checks",
+    "realtime_classifier_model_results",
+    "realtime_classifier_debounced_turns",
+    "realtime_classifier_cancelled_responses",
+    "realtime_classifier_stale_results",
+    "realtime_classifier_responses_avoided",
+    "realtime_classifier_cache_hits",
+    "realtime_classifier_cache_misses",
+    "realtime_classifier_cache_upstream_calls_avoided",
+    "realtime_classifier_cache_evictions",
+    "realtime_classifier_cache_expirations",
+    "realtime_journal_accepted",
+    "realtime_journal_rejected",
+    "realtime_journal_dropped",
+    "realtime_journal_client_dropped",
+    "realtime_journal_written",
+    "realtime_journal_bytes_written",
+    "realtime_journal_segments_opened",
+    "realtime_journal_segments_rotated",
+    "realtime_journal_write_seconds_total",
+    "realtime_sessions_opened",
+    "realtime_sessions_queued",
+    "realtime_sessions_admitted_from_queue",
+    "realtime_sessions_rollovers",
+    "realtime_sessions_rejected_user_cap",
+    "realtime_sessions_rejected_queue_full",
+    "realtime_logs_emitted",
+    "realtime_logs_written",
+    "realtime_logs_dropped",
+    "realtime_logs_sampled_out",
+))
+# Counter families whose members are only known at runtime.
+COUNTER_PREFIXES = ("realtime_breaker_transitions_", "realtime_sessions_closed_")
+MAX_BATCH = 100
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram keyed by a sorted tuple of label pairs.
+    """
+
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            # Per-bucket counts (last slot is +Inf), sum, count
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    inner = ",".join(f'{name}="{str(value)}"' for name, value in pairs)
+    return "{" + inner + "}"
+
+
+connect_phase = Histogram(
+    "realtime_connect_phase_seconds",
+    "Client-reported time from clicking Connect to each connection phase.",
+)
+turn_latency = Histogram(
+    "realtime_turn_latency_seconds",
+    "Client-reported time from the end of a user turn to the first model output, per session preset.",
+)
+http_request = Histogram(
+    "realtime_http_request_seconds",
+    "Server-side latency of session/connect requests.",
+)
+telemetry_dropped = 0
+
+
+def record_client_events(payload):
+    """
+    Fold one /telemetry batch into the histograms; returns how many were kept.
+    """
+    global telemetry_dropped
+    events = payload.get("events") if isinstance(payload, dict) else None
+    if not isinstance(events, list):
+        return 0
+    kept = 0
+    for event in events[:MAX_BATCH]:
+        if not isinstance(event, dict):
+            telemetry_dropped += 1
+            continue
+        phase = event.get("phase")
+        mode = event.get("mode", "server")
+        ms = event.get("ms")
+        preset = event.get("preset") or presets.DEFAULT
+        valid = mode in CLIENT_MODES and isinstance(ms, (int, float)) and math.isfinite(ms) and ms >= 0
+        if valid and phase in CLIENT_PHASES:
+            connect_phase.observe(ms / 1000, phase=phase, mode=mode)
+        elif valid and phase in TURN_PHASES and isinstance(preset, str) and preset in presets.PRESETS:
+            turn_latency.observe(ms / 1000, phase=phase, mode=mode, preset=preset)
+        else:
+            telemetry_dropped += 1
+            continue
+        kept += 1
+    telemetry_dropped += max(0, len(events) - MAX_BATCH)
+    return kept
+
+
+def install(app):
+    """
+    Time TIMED_ROUTES server-side.
+    """
+
+    @app.middleware("http")
+    async def time_requests(request: Request, call_next):
+        if request.url.path not in TIMED_ROUTES:
+            return await call_next(request)
+        started = time.perf_counter()
+        response = await call_next(request)
+        http_request.observe(
+            time.perf_counter() - started,
+            route=request.url.path,
+            status=str(response.status_code),
+        )
+        return response
+
+
+def _flatten(prefix, stats, out):
+    for name, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            out[f"{prefix}_{name}"] = value
+        elif isinstance(value, dict):
+            _flatten(f"{prefix}_{name}", value, out)
+    return out
+
+
+def server_gauges():
+    """
+    Pool, admission, resilience, classifier, journal, session registry and
+    logging stats as flat numeric values, keyed by metric name.
+    """
+    gauges = {}
+    _flatten("realtime_token_pool", token_pool.pool.stats(), gauges)
+    _flatten("realtime_admission", admission.gate.stats(), gauges)
+    resilience_stats = resilience.guard.stats()
+    gauges["realtime_breaker_open"] = int(resilience_stats.pop("breaker_state") != resilience.CLOSED)
+    # Transition names like "closed->open" are not valid metric names.
+    transitions = resilience_stats.pop("breaker_transitions")
+    for transition, count in transitions.items():
+        gauges["realtime_breaker_transitions_" + transition.replace("->", "_to_")] = count
+    _flatten("realtime_resilience", resilience_stats, gauges)
+    _flatten("realtime_classifier", classifier.service.stats(), gauges)
+    _flatten("realtime_journal", journal.store.stats(), gauges)
+    _flatten("realtime_sessions", sessions.registry.stats(), gauges)
+    _flatten("realtime_logs", logs.logger.stats(), gauges)
+    return gauges
+
+
+def render_metrics():
+    """
+    Prometheus text exposition of all histograms plus server stats, as
+    counters (COUNTER_STATS, COUNTER_PREFIXES) or gauges.
+    """
+    lines = connect_phase.render() + turn_latency.render() + http_request.render()
+    lines.append("# TYPE realtime_telemetry_dropped_total counter")
+    lines.append(f"realtime_telemetry_dropped_total {telemetry_dropped}")
+    for name, value in server_gauges().items():
+        if name in COUNTER_STATS or name.startswith(COUNTER_PREFIXES):
+            if not name.endswith("_total"):
+                name += "_total"
+            lines.append(f"# TYPE {name} counter")
+        else:
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
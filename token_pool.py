@@ -0,0 +1,269 @@
+"""
+Pool of pre-minted ephemeral Realtime sessions.
+
+/session hands out a ready session from the pool when one is available and
+falls back to minting on demand when it is empty. A background task keeps each
+pool topped up, sized from the request rate it has observed, and evicts entries
+before their client_secret.expires_at so clients never receive a dead key.
+
+Tunables are read from the environment:
+    TOKEN_POOL_MIN_SIZE        sessions kept per config even when idle (default 1)
+    TOKEN_POOL_MAX_SIZE        upper bound per config, 0 disables the pool (default 10)
+    TOKEN_POOL_REFILL_INTERVAL seconds between refill passes (default 2)
+    TOKEN_POOL_EXPIRY_MARGIN   seconds before expires_at an entry is evicted (default 20)
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import admission
+import logs
+import resilience
+
+MIN_SIZE = int(os.getenv("TOKEN_POOL_MIN_SIZE", "1"))
+MAX_SIZE = int(os.getenv("TOKEN_POOL_MAX_SIZE", "10"))
+REFILL_INTERVAL = float(os.getenv("TOKEN_POOL_REFILL_INTERVAL", "2"))
+EXPIRY_MARGIN = float(os.getenv("TOKEN_POOL_EXPIRY_MARGIN", "20"))
+
+# Weight given to the latest rate sample when smoothing the request rate.
+RATE_SMOOTHING = 0.3
+
+
+def pool_key(data):
+    """
+    Stable key for a session request body (model + voice + session config);
+    presets carry theirs precomputed.
+    """
+    key = getattr(data, "key", None)
+    if key is not None:
+        return key
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+def expires_at(session):
+    """
+    Unix timestamp at which the session's ephemeral key stops working.
+    """
+    try:
+        return float(session["client_secret"]["expires_at"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+class _Bucket:
+    """
+    Ready sessions and request-rate bookkeeping for one session config.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.ready = deque()
+        self.requests = 0
+        self.rate = 0.0
+        self.last_sample = time.monotonic()
+        self.refilling = False
+
+    def target_size(self):
+        # Enough sessions to cover the requests expected before the next refill,
+        # with headroom for bursts.
+        wanted = math.ceil(self.rate * REFILL_INTERVAL * 2)
+        return max(MIN_SIZE, min(MAX_SIZE, wanted))
+
+
+class TokenPool:
+    """
+    Per-config pools of pre-minted sessions with a background refill task.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.minted = 0
+        self.mint_failures = 0
+        self.wasted = 0
+        self.spares = 0
+        self.refill_seconds_total = 0.0
+        self.refill_count = 0
+        self.last_refill_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return MAX_SIZE > 0
+
+    def watch(self, data):
+        """
+        Start keeping a pool for this session config.
+        """
+        key = pool_key(data)
+        if key not in self._buckets:
+            self._buckets[key] = _Bucket(data)
+        return self._buckets[key]
+
+    def take(self, data):
+        """
+        Pop a ready session for this config, or return None on a miss.
+        """
+        if not self.enabled:
+            return None
+        bucket = self.watch(data)
+        bucket.requests += 1
+        self._evict(bucket)
+        if bucket.ready:
+            self.hits += 1
+            return bucket.ready.popleft()
+        self.misses += 1
+        return None
+
+    def offer(self, data, session):
+        """
+        Keep a session minted elsewhere (a hedged mint's loser) for this config.
+        """
+        if not self.enabled:
+            return
+        bucket = self.watch(data)
+        if len(bucket.ready) >= MAX_SIZE:
+            self.wasted += 1
+            return
+        bucket.ready.append(session)
+        # Keep the deque ordered by expiry so eviction only looks at the head.
+        bucket.ready = deque(sorted(bucket.ready, key=expires_at))
+        self.spares += 1
+
+    def _evict(self, bucket):
+        deadline = time.time() + EXPIRY_MARGIN
+        while bucket.ready and expires_at(bucket.ready[0]) <= deadline:
+            bucket.ready.popleft()
+            self.wasted += 1
+
+    def _sample_rate(self, bucket):
+        now = time.monotonic()
+        elapsed = now - bucket.last_sample
+        if elapsed <= 0:
+            return
+        sample = bucket.requests / elapsed
+        bucket.rate = RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * bucket.rate
+        bucket.requests = 0
+        bucket.last_sample = now
+
+    async def _mint(self, api_key, data):
+        # Refills run as background admissions so they never queue ahead of
+        # (or take rate budget from) a waiting /session request.
+        resp = await resilience.guard.mint(api_key, data, background=True)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Could not create ephemeral session: {resp.text}")
+        return resp.json()
+
+    async def _refill(self, api_key, bucket):
+        missing = bucket.target_size() - len(bucket.ready)
+        if missing <= 0:
+            return
+        bucket.refilling = True
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(
+                *(self._mint(api_key, bucket.data) for _ in range(missing)),
+                return_exceptions=True,
+            )
+        finally:
+            bucket.refilling = False
+        elapsed = time.perf_counter() - started
+        self.refill_seconds_total += elapsed
+        self.refill_count += 1
+        self.last_refill_seconds = elapsed
+
+        fresh = []
+        for result in results:
+            if isinstance(result, admission.Rejected):
+                missing -= 1
+                continue
+            if isinstance(result, Exception):
+                self.mint_failures += 1
+                continue
+            self.minted += 1
+            fresh.append(result)
+        # Keep the deque ordered by expiry so eviction only looks at the head.
+        fresh.sort(key=expires_at)
+        bucket.ready.extend(fresh)
+        if len(fresh) < missing:
+            logs.warning(f"Token pool refill minted {len(fresh)}/{missing} sessions", minted=len(fresh), requested=missing)
+
+    async def refill_once(self):
+        """
+        Run one eviction + refill pass over every watched config.
+        """
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key or not self.enabled:
+            return
+        passes = []
+        for bucket in list(self._buckets.values()):
+            self._sample_rate(bucket)
+            self._evict(bucket)
+            if not bucket.refilling:
+                passes.append(self._refill(api_key, bucket))
+        await asyncio.gather(*passes)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refill_once()
+            except Exception as e:
+                logs.error(f"Token pool refill failed: {str(e)}")
+            await asyncio.sleep(REFILL_INTERVAL)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        """
+        Counters for pool effectiveness.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "minted": self.minted,
+            "mint_failures": self.mint_failures,
+            "wasted": self.wasted,
+            "spares": self.spares,
+            "refill_count": self.refill_count,
+            "refill_seconds_total": round(self.refill_seconds_total, 6),
+            "last_refill_seconds": round(self.last_refill_seconds, 6),
+            "ready": sum(len(b.ready) for b in self._buckets.values()),
+        }
+
+
+pool = TokenPool()
+
+
+@asynccontextmanager
+async def lifespan(app, *configs):
+    """
+    Run the refill task for the app's lifetime, warming the given configs.
+    """
+    for data in configs:
+        pool.watch(data)
+    # Hedged mints that lose the race but still succeed refill the pool
+    resilience.guard.spare = pool.offer
+    pool.start()
+    try:
+        yield
+    finally:
+        await pool.stop()
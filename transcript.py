@@ -0,0 +1,95 @@
+"""
+Incremental transcript assembly from Realtime streaming events.
+
+Mirrors frontend/js/transcript.js for server-side consumers of forwarded
+events. Deltas are appended to per-(item_id, content_index) chunk lists and
+joined once when the stream's *.done / *.completed event arrives, so building
+a turn is O(total length) with no repeated string concatenation. Partial text
+of streams still in progress is available at any time.
+
+    assembler = TranscriptAssembler()
+    for event in events:
+        for turn in assembler.feed(event):
+            print(turn["role"], turn["text"])
+"""
+
+# Event type prefix -> (role, kind, field holding the final text on *.done)
+STREAMS = {
+    "response.audio_transcript": ("assistant", "audio_transcript", "transcript"),
+    "response.output_audio_transcript": ("assistant", "audio_transcript", "transcript"),
+    "response.text": ("assistant", "text", "text"),
+    "response.output_text": ("assistant", "text", "text"),
+    "conversation.item.input_audio_transcription": ("user", "input_transcription", "transcript"),
+}
+DONE_SUFFIXES = {"done", "completed"}
+
+
+class TranscriptAssembler:
+    """
+    Per-(item_id, content_index) append buffers that emit completed turns.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def feed(self, event):
+        """
+        Consume one server event; returns the list of turns it completed
+        (usually empty). Unrelated events are ignored.
+        """
+        kind = event.get("type", "")
+        if kind == "response.done":
+            return self._abandon(event.get("response") or {})
+        prefix, _, suffix = kind.rpartition(".")
+        stream = STREAMS.get(prefix)
+        if stream is None:
+            return []
+        key = (event.get("item_id"), event.get("content_index", 0))
+
+        if suffix == "delta":
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = self.buffers[key] = {"chunks": [], "stream": stream, "response_id": event.get("response_id")}
+            buffer["chunks"].append(event.get("delta") or "")
+            return []
+        if suffix in DONE_SUFFIXES:
+            buffer = self.buffers.pop(key, None)
+            text = event.get(stream[2])
+            if text is None:
+                text = "".join(buffer["chunks"]) if buffer else ""
+            return [self._turn(key, stream, text, event.get("response_id"), "completed")]
+        if suffix == "failed":
+            self.buffers.pop(key, None)
+        return []
+
+    def _abandon(self, response):
+        """
+        Streams of a response that ended (for example cancelled by the user
+        speaking) before their *.done arrived are emitted as incomplete turns.
+        """
+        response_id = response.get("id")
+        keys = [key for key, buffer in self.buffers.items() if buffer["response_id"] == response_id]
+        turns = []
+        for key in keys:
+            buffer = self.buffers.pop(key)
+            turns.append(self._turn(key, buffer["stream"], "".join(buffer["chunks"]), response_id, "incomplete"))
+        return turns
+
+    def _turn(self, key, stream, text, response_id, status):
+        role, kind, _ = stream
+        return {
+            "item_id": key[0],
+            "content_index": key[1],
+            "role": role,
+            "kind": kind,
+            "text": text,
+            "response_id": response_id,
+            "status": status,
+        }
+
+    def partial(self, item_id, content_index=0):
+        """
+        Live text of a stream still in progress ("" if unknown).
+        """
+        buffer = self.buffers.get((item_id, content_index))
+        return "".join(buffer["chunks"]) if buffer else ""
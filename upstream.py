@@ -0,0 +1,168 @@
+"""
+Shared async HTTP client for the OpenAI Realtime REST endpoints.
+
+One long-lived httpx.AsyncClient is opened when the app starts and closed when
+it shuts down, so every /session call reuses pooled keep-alive connections
+(HTTP/2 when the optional `h2` package is installed) instead of blocking the
+event loop on a fresh TCP+TLS handshake. Building the client (TLS context,
+HTTP/2 machinery) takes a few hundred milliseconds, so it happens on a worker
+thread while the server starts accepting requests; the first upstream call
+waits for it if it is not ready yet. Each call's latency and status are added
+to the calling request's access record (logs.annotate).
+
+Tunables are read from the environment:
+    OPENAI_API_BASE            API base URL, e.g. a local mock (default https://api.openai.com/v1)
+    UPSTREAM_CONNECT_TIMEOUT   seconds to establish a connection (default 5)
+    UPSTREAM_READ_TIMEOUT      seconds to wait for a response (default 20)
+    UPSTREAM_MAX_CONNECTIONS   total pooled connections (default 100)
+    UPSTREAM_MAX_KEEPALIVE     idle connections kept open (default 20)
+    UPSTREAM_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 30)
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+import httpx
+
+import logs
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", DEFAULT_API_BASE).rstrip("/")
+
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "20"))
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client = None
+_opening = None
+
+
+def _build_client():
+    return httpx.AsyncClient(
+            base_url=OPENAI_API_BASE,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+
+
+def start_client():
+    """
+    Start building the shared client in the background (once).
+    """
+    global _opening
+    if _opening is None:
+        _opening = asyncio.ensure_future(asyncio.to_thread(_build_client))
+    return _opening
+
+
+async def close_client():
+    """
+    Close the shared client and release its pooled connections.
+    """
+    global _client, _opening
+    if _client is None and _opening is not None:
+        _client = await _opening
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _opening = None
+
+
+async def get_client():
+    """
+    Return the shared client, waiting for it to be built if necessary.
+    Only valid between startup and shutdown.
+    """
+    global _client
+    if _client is None:
+        if _opening is None:
+            raise RuntimeError("Upstream client is not open; is the app lifespan running?")
+        _client = await _opening
+    return _client
+
+
+def realtime_url(model):
+    """
+    Where a page holding an ephemeral key for `model` posts its SDP offer.
+    """
+    return f"{OPENAI_API_BASE}/realtime?model={quote(model)}"
+
+
+async def create_session(api_key, data):
+    """
+    POST to /realtime/sessions and return the raw httpx.Response. A preset
+    is sent as its pre-serialized body.
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    client = await get_client()
+    started = time.perf_counter()
+    body = getattr(data, "body", None)
+    if body is not None:
+        resp = await client.post("/realtime/sessions", headers=headers, content=body)
+    else:
+        resp = await client.post("/realtime/sessions", headers=headers, json=data)
+    _annotate(started, resp)
+    return resp
+
+
+async def exchange_sdp(ephemeral_key, model, offer_sdp):
+    """
+    POST a WebRTC SDP offer to /realtime and return the raw httpx.Response
+    (the answer SDP on success).
+    """
+    headers = {
+        "Authorization": f"Bearer {ephemeral_key}",
+        "Content-Type": "application/sdp",
+    }
+    client = await get_client()
+    started = time.perf_counter()
+    resp = await client.post(
+        "/realtime", params={"model": model}, headers=headers, content=offer_sdp
+    )
+    _annotate(started, resp)
+    return resp
+
+
+def _annotate(started, resp):
+    # Upstream latency and status go on the calling request's access record
+    logs.annotate(
+        upstream_ms=round((time.perf_counter() - started) * 1000, 2),
+        upstream_status=resp.status_code,
+    )
+
+
+def rebase_urls(text):
+    """
+    Point hard-coded API URLs (e.g. in the page template) at OPENAI_API_BASE.
+    """
+    return text.replace(DEFAULT_API_BASE, OPENAI_API_BASE)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    FastAPI lifespan that owns the shared upstream client.
+    """
+    start_client()
+    try:
+        yield
+    finally:
+        await close_client()